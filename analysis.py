@@ -3,9 +3,14 @@ import pandas as pd
 import os
 from show import Show
 from log_utils import log
+from data_store import DataStore
+from perf import Perf
 
 KBYTES_PER_MB = 1024
 class Analysis():
+    # 是否按增长斜率排序疑似泄漏的进程, 由ramut.py的-s选项开启
+    rank_by_slope = False
+
     @staticmethod
     def get_abnormal_excel_path(dir):
         keyword = os.path.basename(dir)
@@ -19,48 +24,84 @@ class Analysis():
         return file_path
 
     @staticmethod
-    # coefficient of variation
-    def calculate_cov(data_list):
-        if data_list.empty:
-            raise ValueError("The input list is empty.")
-    
-        if not all(isinstance(x, (int, float)) for x in data_list):
-            raise TypeError("All elements in the input list must be numeric.")
+    def get_time_axis_hours(dataframe:pd.DataFrame):
+        # 以第一列的时间(小时)作为斜率的横轴, 第一列不是时间类型时使用采样序号
+        time_col = dataframe.iloc[:, 0]
+        if pd.api.types.is_datetime64_any_dtype(time_col):
+            seconds = (time_col - time_col.min()).dt.total_seconds().to_numpy(dtype=float)
+            return seconds / 3600
+        return np.arange(len(dataframe), dtype=float)
+
+    @staticmethod
+    def compute_column_stats(dataframe:pd.DataFrame):
+        """
+        一次NumPy矩阵运算计算所有进程列(第一列为时间)的统计量:
+        CoV, min, max, 首个/最后一个有效值, 以及按最小二乘法拟合的增长斜率(KB/小时)
+        """
+        columns = list(dataframe.columns[1:])
+        values = dataframe[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        hours = Analysis.get_time_axis_hours(dataframe)
+
+        mask = ~np.isnan(values) & ~np.isnan(hours)[:, None]
+        count = mask.sum(axis=0)
+        valid = count > 0
+        values_zero = np.where(mask, values, 0.0)
+        hours_matrix = np.where(mask, hours[:, None], 0.0)
+        row_index = np.arange(len(dataframe))[:, None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = values_zero.sum(axis=0) / count
+            std = np.sqrt((np.where(mask, values - mean, 0.0) ** 2).sum(axis=0) / count)
+            cov = std / mean
+
+            hours_mean = hours_matrix.sum(axis=0) / count
+            hours_delta = np.where(mask, hours[:, None] - hours_mean, 0.0)
+            slope = (hours_delta * np.where(mask, values - mean, 0.0)).sum(axis=0) / (hours_delta ** 2).sum(axis=0)
+
+        first_index = np.where(mask, row_index, len(dataframe)).min(axis=0)
+        last_index = np.where(mask, row_index, -1).max(axis=0)
+        column_index = np.arange(len(columns))
+
+        stats = pd.DataFrame({
+            'process': columns,
+            'count': count,
+            'cov': cov,
+            'min': np.where(mask, values, np.inf).min(axis=0),
+            'max': np.where(mask, values, -np.inf).max(axis=0),
+            'first': values[np.minimum(first_index, len(dataframe) - 1), column_index],
+            'last': values[np.maximum(last_index, 0), column_index],
+            'slope': slope,
+        })
+        return stats[valid]
 
-        mean_value = np.mean(data_list)
-        if mean_value == 0:
-            raise ZeroDivisionError("The mean value is zero, leading to division by zero.")
-        
-        standard_deviation = np.std(data_list)
-        cov = standard_deviation/mean_value
-        return cov
-    
     @staticmethod
-    def detect_abnormal_data(dataframe:pd.DataFrame, ref_cov, ref_diff):
+    def detect_abnormal_data(dataframe:pd.DataFrame, ref_cov, ref_diff, rank_by_slope=None):
+        if rank_by_slope is None:
+            rank_by_slope = Analysis.rank_by_slope
         dataframe = Analysis.clean_data(dataframe)
+        log.info(f"detect_abnormal_data: ref_cov={ref_cov}, ref_diff={ref_diff}, rank_by_slope={rank_by_slope}")
+        if dataframe.shape[1] <= 1 or dataframe.empty:
+            return []
+
+        with Perf.stage('detect_abnormal'):
+            stats = Analysis.compute_column_stats(dataframe)
+        abnormal = stats[(stats['cov'] > ref_cov) & (stats['last'] - stats['first'] > ref_diff)]
+        if rank_by_slope:
+            # 按增长斜率从大到小排列, 疑似泄漏最严重的进程排在最前
+            abnormal = abnormal.sort_values(by='slope', ascending=False, kind='stable')
+
         abnormal_data_list = []
-        columns = list(dataframe.columns)
-        log.info(f"detect_abnormal_data: ref_cov={ref_cov}, ref_diff={ref_diff}")
-        for col in columns[1:]:
-            df_col = dataframe[col].dropna()
-            if df_col.empty:
-                continue
-            cov = Analysis.calculate_cov(df_col)
-            if cov > ref_cov:
-                val_min = np.min(df_col)
-                val_max = np.max(df_col)
-                val_initial = df_col.iloc[0]
-                val_end = df_col.iloc[-1]
-                val_diff = val_end-val_initial
-                if val_diff > ref_diff:
-                    data = {}
-                    data['process'] = col
-                    data['cov'] = cov
-                    data['min_mB'] = val_min//KBYTES_PER_MB
-                    data['max_mB'] = val_max//KBYTES_PER_MB
-                    data['initial_mB'] = val_initial//KBYTES_PER_MB
-                    data['end_mB'] = val_end//KBYTES_PER_MB
-                    abnormal_data_list.append(data)
+        for row in abnormal.itertuples(index=False):
+            data = {}
+            data['process'] = row.process
+            data['cov'] = row.cov
+            data['min_mB'] = int(row.min//KBYTES_PER_MB)
+            data['max_mB'] = int(row.max//KBYTES_PER_MB)
+            data['initial_mB'] = int(row.first//KBYTES_PER_MB)
+            data['end_mB'] = int(row.last//KBYTES_PER_MB)
+            if rank_by_slope:
+                data['slope_mB_per_hour'] = row.slope/KBYTES_PER_MB
+            abnormal_data_list.append(data)
         return abnormal_data_list
     
     @staticmethod
@@ -97,21 +138,22 @@ class Analysis():
         return dataframe
         
     @staticmethod
-    def analyze(dir, input_excel_path, ref_cov, ref_diff):
+    def analyze(dir, data, ref_cov, ref_diff):
         try:
-            df_all = pd.read_excel(input_excel_path)
+            df_all = DataStore.get_dataframe(data)
         except FileNotFoundError:
-            log.info(f"analyze error: could not found: {input_excel_path}")
+            log.info(f"analyze error: could not found: {data}")
             return
 
         abnormal_data_list = Analysis.detect_abnormal_data(df_all, ref_cov, ref_diff)
         if abnormal_data_list:
             df_abnormal = pd.DataFrame(abnormal_data_list)
             excel_path = Analysis.get_abnormal_excel_path(dir)
-            df_abnormal.to_excel(excel_path, index=False)
+            DataStore.save(df_abnormal, excel_path)
             json_path = Analysis.get_abnormal_json_path(dir)
             df_abnormal.to_json(json_path, orient='records')
             Show.draw_abnormal_processes(dir, df_all, df_abnormal)
+        return abnormal_data_list
             
 if __name__ == '__main__':
     dir=os.getcwd()
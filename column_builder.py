@@ -0,0 +1,135 @@
+from array import array
+import numpy as np
+import pandas as pd
+
+# 列类型 -> array类型码及numpy类型; 'category'列保存字典编码(int32)
+COLUMN_TYPES = {
+    'int': ('q', np.int64),
+    'float': ('d', np.float64),
+    'category': ('i', np.int32),
+}
+
+
+class ColumnSlice():
+    """
+    ColumnBuilder中连续若干行的列数据, 用于增量解析清单的保存和读取:
+    数值列为array切片, 字典编码列为(切片中用到的取值列表, 按该列表的编码array),
+    不为每行创建元组, 序列化后也只是几段连续的字节
+    """
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+class ColumnBuilder():
+    """
+    按列累积提取结果: 整数和浮点列保存在array中, 包名, 进程名等重复字符串做字典编码,
+    每行只追加几个数值而不是一个dict; to_frame()直接基于缓冲区构造numpy数组,
+    字符串列转换为categorical
+
+    可作为提取器的data_list使用: len()和extend()与list一致, 切片返回ColumnSlice(用于增量解析清单),
+    extend()也接受ColumnSlice, 按列整段追加;
+    to_frame()返回的DataFrame与缓冲区共享内存, 在其释放之前不能再追加
+    """
+    def __init__(self, columns):
+        """
+        参数:
+            columns: [(列名, 类型)], 类型为'int', 'float'或'category'
+        """
+        self.names = [name for name, _ in columns]
+        self.kinds = [kind for _, kind in columns]
+        self.arrays = [array(COLUMN_TYPES[kind][0]) for kind in self.kinds]
+        # 字典编码列的 值->编码 和 编码->值
+        self.codes = [{} if kind == 'category' else None for kind in self.kinds]
+        self.categories = [[] if kind == 'category' else None for kind in self.kinds]
+        self._appenders = [self._get_appender(index) for index in range(len(columns))]
+
+    def _get_appender(self, index):
+        values = self.arrays[index]
+        if self.kinds[index] != 'category':
+            return values.append
+        codes = self.codes[index]
+        categories = self.categories[index]
+
+        def append_category(value):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(categories)
+                categories.append(value)
+            values.append(code)
+        return append_category
+
+    def __getstate__(self):
+        # 并发模式下提取器会被序列化到子进程, 追加函数在反序列化后重建
+        state = self.__dict__.copy()
+        del state['_appenders']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._appenders = [self._get_appender(index) for index in range(len(self.names))]
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def append(self, *row):
+        for appender, value in zip(self._appenders, row):
+            appender(value)
+
+    def extend(self, rows):
+        if isinstance(rows, ColumnSlice):
+            self.extend_columns(rows)
+            return
+        for row in rows:
+            self.append(*row)
+
+    def __getitem__(self, key):
+        # 只支持切片, 返回ColumnSlice
+        start, stop, _ = key.indices(len(self))
+        columns = []
+        for kind, values, categories in zip(self.kinds, self.arrays, self.categories):
+            values = values[start:stop]
+            if kind == 'category':
+                # 重新编码为切片内的取值, 读回时不依赖本次运行的字典
+                used, codes = np.unique(np.frombuffer(values, dtype=np.int32), return_inverse=True) if len(values) \
+                    else (np.array([], dtype=np.int32), np.array([], dtype=np.int32))
+                values = (
+                    [categories[code] for code in used],
+                    array(COLUMN_TYPES[kind][0], codes.astype(np.int32).tobytes()),
+                )
+            columns.append(values)
+        return ColumnSlice(columns, max(0, stop - start))
+
+    def extend_columns(self, column_slice: ColumnSlice):
+        for index, (kind, values) in enumerate(zip(self.kinds, column_slice.columns)):
+            if kind != 'category':
+                self.arrays[index].extend(values)
+                continue
+            used, codes = values
+            if not len(codes):
+                continue
+            # 切片内的编码 -> 本字典中的编码, 新取值追加到字典末尾
+            code_map = self.codes[index]
+            categories = self.categories[index]
+            mapping = np.empty(len(used), dtype=np.int32)
+            for local, value in enumerate(used):
+                code = code_map.get(value)
+                if code is None:
+                    code = code_map[value] = len(categories)
+                    categories.append(value)
+                mapping[local] = code
+            self.arrays[index].frombytes(mapping[np.frombuffer(codes, dtype=np.int32)].tobytes())
+
+    def to_frame(self):
+        data = {}
+        for name, kind, values, categories in zip(self.names, self.kinds, self.arrays, self.categories):
+            column = np.frombuffer(values, dtype=COLUMN_TYPES[kind][1]) if len(values) else \
+                np.array([], dtype=COLUMN_TYPES[kind][1])
+            if kind == 'category':
+                column = pd.Categorical.from_codes(column, categories=pd.Index(categories, dtype=object),
+                                                   validate=False)
+            data[name] = column
+        return pd.DataFrame(data, copy=False)
@@ -1,9 +1,45 @@
 import os
 import re
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from log_utils import log
-from show import Show
+from data_store import DataStore
+from log_scanner import LogExtractor, LogScanner
+from perf import Perf
+from event_store import EventStore
+
+# 总体CPU占用的分类, 在长表中与进程名并列
+CATEGORY_NAMES = ('total', 'user', 'kernel', 'iowait')
+BYTES_PER_MB = 1024 * 1024
+
+class CpuExtractor(LogExtractor):
+    file_keywords = ('Stream-s', 'system')
+    cache_key = 'cpu:long:v2'
+
+    # 08-11 23:48:36.443  1903  2548 I ActivityManager: 25% TOTAL: 12% user + 10% kernel + 0.2% iowait + 1.4% irq + 0.2% softirq
+    pattern1 = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+ActivityManager:\s+(\d+\.?\d?)% TOTAL:\s+(\d+\.?\d?)% user\s+\+\s+(\d+\.?\d?)% kernel\s+\+\s+(\d+\.?\d?)%\s+iowait")
+    # 09-15 13:41:42.204  2439  2857 I ActivityManager:   87% 9727/com.tencent.mm: 59% user + 27% kernel / faults: 32766 minor 5353 major
+    pattern2 = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+ActivityManager:\s+(\d+)% \d+/(\S+):")
+
+    def __init__(self):
+        # 长表格式的行: (epoch毫秒, 进程名, CPU百分比), total/user/kernel/iowait也作为进程名记录
+        self.data_list = []
+
+    def rules(self):
+        return [('TOTAL:', self.pattern1, self.on_total),
+                ('ActivityManager:', self.pattern2, self.on_process)]
+
+    def on_total(self, match1):
+        date_time = self.get_time(match1)
+        if date_time is None:
+            return
+        for index, category in enumerate(CATEGORY_NAMES, 2):
+            self.data_list.append((date_time, category, float(match1.group(index))))
+
+    def on_process(self, match2):
+        date_time = self.get_time(match2)
+        if date_time is not None:
+            self.data_list.append((date_time, match2.group(3), float(match2.group(2))))
 
 class CpuParser():
     @staticmethod
@@ -19,66 +55,66 @@ class CpuParser():
                 yield line
             
     @staticmethod
-    def parse_cpu_data(dir: str):
-            data_list = []
-            data = {}
-            # 08-11 23:48:36.443  1903  2548 I ActivityManager: 25% TOTAL: 12% user + 10% kernel + 0.2% iowait + 1.4% irq + 0.2% softirq
-            pattern1 = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+ActivityManager:\s+(\d+\.?\d?)% TOTAL:\s+(\d+\.?\d?)% user\s+\+\s+(\d+\.?\d?)% kernel\s+\+\s+(\d+\.?\d?)%\s+iowait")
-            # 09-15 13:41:42.204  2439  2857 I ActivityManager:   87% 9727/com.tencent.mm: 59% user + 27% kernel / faults: 32766 minor 5353 major
-            pattern2 = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+ActivityManager:\s+(\d+)% \d+/(\S+):")
-
-            for root, dirs, files in os.walk(dir):
-                for file in tqdm(files, desc="Processing files", unit="file"):
-                    if 'Stream-s' in file or 'system' in file:
-                        file_path = os.path.join(root, file)
-                        for line in tqdm(CpuParser.read_lines(file_path), desc=f"Reading {file}", unit="line"):
-                            match1 = pattern1.search(line)
-                            if match1:
-                                date_time = match1.group(1)
-                                total_percent = float(match1.group(2))
-                                user_percent = float(match1.group(3))
-                                kernel_percent = float(match1.group(4))
-                                iowait_percent = float(match1.group(5))
-                                if date_time not in data:
-                                    if data:
-                                        data_list.append(data)
-                                    data = {'date_time': date_time}
-                                data['total'] = total_percent
-                                data['user'] = user_percent
-                                data['kernel'] = kernel_percent
-                                data['iowait'] = iowait_percent
-                            match2 = pattern2.search(line)
-                            if match2:
-                                date_time = match2.group(1)
-                                cpu_percent = float(match2.group(2))
-                                process_name = match2.group(3)
-                                if date_time not in data:
-                                    if data:
-                                        data_list.append(data)
-                                    data = {'date_time': date_time}
-                                data[process_name] = cpu_percent
-
-            # 最后一个数据也要添加到列表中
-            if data!= {}:
-                data_list.append(data)
-            # 转换为DataFrame
-            df = pd.DataFrame(data_list)
+    def parse_cpu_data(dir: str, extractor=None):
+            if extractor is None:
+                extractor = LogScanner.scan_with(dir, CpuExtractor())
+            data_list = extractor.data_list
+
+            # 转换为长表格式的DataFrame, 进程名使用categorical类型
+            with Perf.stage('dataframe'):
+                df = pd.DataFrame(data_list, columns=['date_time', 'process', 'percent'])
+            Perf.count('rows', len(df))
             log.info(f"df = {df}")
             if df.empty:
                 log.warning("Not found any CPU data.")
                 return None
 
-            df['date_time'] = pd.to_datetime(df['date_time'], format='%m-%d %H:%M:%S')
-            # 保存到Excel文件
+            df['date_time'] = EventStore.to_datetime(df['date_time'].to_numpy(dtype='int64'))
+            df['process'] = df['process'].astype('category')
+            df['percent'] = df['percent'].astype('float32')
+            # 写入统一事件存储, 总体占用(total/user/kernel/iowait)的tag为system
+            tags = np.where(df['process'].isin(CATEGORY_NAMES), 'system', 'process')
+            EventStore.write(dir, 'cpu', EventStore.build('cpu', df['date_time'], df['process'], tags, percent=df['percent']))
+            CpuParser.log_memory_usage(df)
+            # 保存结果, Excel为可选导出
             excel_path = CpuParser.get_output_excel_path(dir)
-            log.info(f"Saving CPU data to {excel_path}")
-            df.to_excel(excel_path, index=False)
+            log.info(f"Saving CPU data to {DataStore.get_columnar_path(excel_path)}")
+            DataStore.save(df, excel_path)
             log.info("Saved")
-            return excel_path
+            return df
+
+    @staticmethod
+    def log_memory_usage(df: pd.DataFrame):
+        # 对比长表与等价的宽表(每个时间戳一行, 每个进程一列float64)的内存占用;
+        # 宽表只按大小估算, 构造全部进程的宽表正是长表要避免的开销
+        long_bytes = df.memory_usage(deep=True).sum()
+        timestamps = df['date_time'].nunique()
+        processes = df['process'].nunique()
+        wide_bytes = timestamps * (processes * 8 + 8)
+        log.info(f"CPU data: {len(df)} samples, {timestamps} timestamps, {processes} processes, "
+                 f"long format {long_bytes / BYTES_PER_MB:.2f} MB, wide format {wide_bytes / BYTES_PER_MB:.2f} MB")
+
+    @staticmethod
+    def pivot_processes(df: pd.DataFrame, processes):
+        """
+        只把要绘制的进程转换为宽表
+
+        参数:
+            df: parse_cpu_data返回的长表
+            processes: 要绘制的进程名列表
+
+        返回:
+            以时间戳为索引, 每个进程一列的DataFrame, 列顺序与processes一致
+        """
+        df = df[df['process'].isin(processes)]
+        df_wide = df.pivot_table(index='date_time', columns='process', values='percent', aggfunc='mean', observed=True)
+        return df_wide.reindex(columns=list(processes))
 
 if __name__ == "__main__":
+    from show import Show
     folder_path = "D:/github/ramct/downloads/NFNAX10114"
-    excel_path =CpuParser.parse_cpu_data(folder_path)
-    if excel_path:
+    df = CpuParser.parse_cpu_data(folder_path)
+    if df is not None:
         Show.draw_initial_report(folder_path, 'CPU_Test')
-        Show.draw_cpu_report(folder_path, excel_path)
\ No newline at end of file
+        Show.draw_cpu_report(folder_path, df)
+        Show.finish_report(folder_path)
\ No newline at end of file
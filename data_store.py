@@ -0,0 +1,75 @@
+import os
+import pandas as pd
+from log_utils import log
+from perf import Perf
+
+try:
+    import pyarrow  # noqa: F401
+    COLUMNAR_EXT = '.parquet'
+except ImportError:
+    # 没有安装pyarrow时退化为pickle, 仍然比openpyxl读写快得多
+    COLUMNAR_EXT = '.pkl'
+
+
+class DataStore():
+    """
+    解析结果的持久化: 默认保存为列式格式(Parquet)供后续复用, Excel仅作为可选导出
+    """
+    # 是否同时导出Excel, 由ramut.py的-x选项开启
+    export_excel = False
+
+    @staticmethod
+    def get_columnar_path(excel_path):
+        return os.path.splitext(excel_path)[0] + COLUMNAR_EXT
+
+    @staticmethod
+    def save(df: pd.DataFrame, excel_path, export_excel=None):
+        """
+        保存DataFrame, 列式文件与excel_path同名, 仅扩展名不同
+
+        参数:
+            df: 要保存的数据
+            excel_path: Excel导出路径, 同时决定列式文件的路径
+            export_excel: 是否导出Excel, 默认取DataStore.export_excel
+
+        返回:
+            列式文件路径
+        """
+        columnar_path = DataStore.get_columnar_path(excel_path)
+        with Perf.stage('save_columnar'):
+            if COLUMNAR_EXT == '.parquet':
+                df.to_parquet(columnar_path, index=False)
+            else:
+                df.to_pickle(columnar_path)
+
+        if export_excel is None:
+            export_excel = DataStore.export_excel
+        if export_excel:
+            log.info(f"Exporting to {excel_path}")
+            with Perf.stage('to_excel'):
+                df.to_excel(excel_path, index=False)
+        return columnar_path
+
+    @staticmethod
+    def load(path) -> pd.DataFrame:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.parquet':
+            return pd.read_parquet(path)
+        if ext == '.feather':
+            return pd.read_feather(path)
+        if ext == '.pkl':
+            return pd.read_pickle(path)
+        if ext in ('.xlsx', '.xls'):
+            # 优先读取同名的列式文件
+            columnar_path = DataStore.get_columnar_path(path)
+            if os.path.exists(columnar_path):
+                return DataStore.load(columnar_path)
+            return pd.read_excel(path)
+        raise ValueError(f"Unsupported data file: {path}")
+
+    @staticmethod
+    def get_dataframe(data) -> pd.DataFrame:
+        # 兼容传入DataFrame或数据文件路径两种方式
+        if isinstance(data, pd.DataFrame):
+            return data
+        return DataStore.load(data)
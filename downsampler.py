@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from log_utils import log
+
+
+class Downsampler():
+    """
+    绘图前的时间序列降采样, 限制每条曲线的点数, 避免mpld3/plotly把所有点写入HTML
+    支持LTTB(Largest-Triangle-Three-Buckets)和按桶取最小/最大值两种保形算法;
+    只影响报告中的图表, 导出的数据文件仍然是完整分辨率
+    """
+    # 每条曲线的最大点数, 0表示不降采样, 由ramut.py的-n选项设置
+    max_points = 2000
+    # 'lttb' 或 'minmax'
+    method = 'lttb'
+
+    @staticmethod
+    def to_numeric_axis(x: pd.Series):
+        # 时间戳转换为纳秒, 数值直接使用, 其他类型(字符串标签)使用序号
+        if pd.api.types.is_datetime64_any_dtype(x):
+            return x.astype('int64').to_numpy(dtype=float)
+        if pd.api.types.is_numeric_dtype(x):
+            return x.to_numpy(dtype=float)
+        return np.arange(len(x), dtype=float)
+
+    @staticmethod
+    def lttb_indices(x: np.ndarray, y: np.ndarray, max_points):
+        """
+        LTTB: 首尾两点保留, 中间分成max_points-2个桶,
+        每个桶中选取与前一个选中点, 下一个桶平均点构成三角形面积最大的点
+        """
+        count = len(x)
+        edges = np.linspace(1, count - 1, max_points - 1).astype(int)
+        indices = np.empty(max_points, dtype=int)
+        indices[0] = 0
+        indices[-1] = count - 1
+        selected = 0
+        for bucket in range(max_points - 2):
+            start, end = edges[bucket], edges[bucket + 1]
+            next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else count
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+            area = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected])
+                          - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+            selected = start + int(np.argmax(area))
+            indices[bucket + 1] = selected
+        return indices
+
+    @staticmethod
+    def minmax_indices(y: np.ndarray, max_points):
+        # 首尾两点保留, 中间每个桶保留最小值和最大值两个点, 峰值不会丢失
+        count = len(y)
+        buckets = max(0, (max_points - 2) // 2)
+        indices = [0, count - 1]
+        edges = np.linspace(1, count - 1, buckets + 1).astype(int)
+        for start, end in zip(edges[:-1], edges[1:]):
+            if start >= end:
+                continue
+            bucket = y[start:end]
+            indices.append(start + int(np.argmin(bucket)))
+            indices.append(start + int(np.argmax(bucket)))
+        return np.unique(indices)
+
+    @staticmethod
+    def downsample(x: pd.Series, y: pd.Series, max_points=None, method=None):
+        """
+        对一条曲线降采样
+
+        参数:
+            x: 横轴数据, 时间戳, 数值或标签
+            y: 纵轴数据
+            max_points: 最大点数, 默认取Downsampler.max_points
+            method: 'lttb'或'minmax', 默认取Downsampler.method
+
+        返回:
+            (x, y), 点数不超过max_points时原样返回
+        """
+        if max_points is None:
+            max_points = Downsampler.max_points
+        if method is None:
+            method = Downsampler.method
+        x = pd.Series(x).reset_index(drop=True)
+        y = pd.Series(y).reset_index(drop=True)
+        if not max_points or len(y) <= max_points:
+            return x, y
+
+        # 缺失值无法参与面积计算, 降采样前去掉
+        valid = y.notna().to_numpy()
+        x, y = x[valid].reset_index(drop=True), y[valid].reset_index(drop=True)
+        if len(y) <= max_points:
+            return x, y
+
+        y_values = y.to_numpy(dtype=float)
+        if method == 'minmax':
+            indices = Downsampler.minmax_indices(y_values, max(2, max_points))
+        else:
+            indices = Downsampler.lttb_indices(Downsampler.to_numeric_axis(x), y_values, max(3, max_points))
+        log.debug(f"downsample {y.name}: {len(y)} -> {len(indices)} points ({method})")
+        return x.iloc[indices], y.iloc[indices]
@@ -0,0 +1,187 @@
+import os
+import numpy as np
+import pandas as pd
+from log_utils import log
+from data_store import DataStore
+from perf import Perf
+
+# 各事件流的负载列及类型; 所有流共有time(int64, epoch毫秒), package和tag(categorical)三列
+STREAM_SCHEMAS = {
+    # am_kill的adj为-1, 其余lmkd字段整数为-1, 浮点为NaN
+    'kill': {'adj': 'int16', 'min_adj': 'int16', 'rss': 'int64', 'reason': 'int16', 'free': 'int64',
+             'swapfree': 'int64', 'mempsi_some': 'float32', 'mempsi_full': 'float32', 'iopsi_some': 'float32',
+             'iopsi_full': 'float32', 'cpupsi': 'float32'},
+    'launch': {'duration': 'int32'},
+    'cpu': {'percent': 'float32'},
+    'pss': {'pid': 'int32', 'uid': 'int32', 'pss': 'int64'},
+    # 前台应用切换, package为应用, tag为top状态
+    'top': {},
+}
+BASE_COLUMNS = ['time', 'package', 'tag']
+HOUR_MS = 3600 * 1000
+
+
+class EventStore():
+    """
+    统一的事件存储: kill, launch, cpu, pss等事件流使用相同的列式结构,
+    每个流按time排序, 支持按时间范围的二分查找和跨流的as-of关联;
+    各解析器把事件写入设备目录下的events_<stream>列式文件, Show和分析代码从中读取
+    """
+    def __init__(self, streams=None):
+        self.streams = dict(streams or {})
+
+    @staticmethod
+    def get_path(dir, stream):
+        return os.path.join(dir, f"events_{stream}.xlsx")
+
+    @staticmethod
+    def to_epoch_ms(times):
+        # datetime64或可被pandas解析的时间转换为epoch毫秒
+        times = pd.Series(times)
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times)
+        return times.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+
+    @staticmethod
+    def to_datetime(times):
+        return pd.to_datetime(np.asarray(times, dtype=np.int64), unit='ms')
+
+    @staticmethod
+    def build(stream, times, package=None, tag=None, **payload):
+        """
+        构造一个事件流的DataFrame
+
+        参数:
+            stream: 流名称, 决定负载列的类型
+            times: 时间, datetime64或epoch毫秒(int64)
+            package: 包名/进程名, 可为空
+            tag: 事件的分类标签, 可为空
+            payload: 负载列, 列名需在STREAM_SCHEMAS中
+
+        返回:
+            按time排序的DataFrame
+        """
+        times = np.asarray(times)
+        if not np.issubdtype(times.dtype, np.integer):
+            times = EventStore.to_epoch_ms(times)
+        count = len(times)
+        columns = {
+            'time': times.astype(np.int64),
+            'package': pd.Categorical(np.asarray(package, dtype=object) if package is not None else [None] * count),
+            'tag': pd.Categorical(np.asarray(tag, dtype=object) if tag is not None else [None] * count),
+        }
+        for name, dtype in STREAM_SCHEMAS[stream].items():
+            values = payload.get(name)
+            columns[name] = np.asarray(values).astype(dtype) if values is not None else np.zeros(count, dtype=dtype)
+        events = pd.DataFrame(columns)
+        # 稳定排序, 同一时间的事件保持日志中的顺序
+        order = np.argsort(events['time'].to_numpy(), kind='stable')
+        return events.take(order).reset_index(drop=True)
+
+    def add(self, stream, events: pd.DataFrame):
+        if stream in self.streams and not self.streams[stream].empty:
+            merged = pd.concat([self.streams[stream], events], ignore_index=True)
+            for column in ('package', 'tag'):
+                merged[column] = merged[column].astype('category')
+            order = np.argsort(merged['time'].to_numpy(), kind='stable')
+            events = merged.take(order).reset_index(drop=True)
+        self.streams[stream] = events
+        return events
+
+    def get(self, stream, start=None, end=None, packages=None, tags=None):
+        """
+        按时间范围[start, end)查询一个流, 时间为epoch毫秒或可被pandas解析的时间;
+        time已排序, 范围查找为二分查找, 不扫描整列
+        """
+        events = self.streams.get(stream)
+        if events is None:
+            return pd.DataFrame(columns=BASE_COLUMNS + list(STREAM_SCHEMAS.get(stream, {})))
+        times = events['time'].to_numpy()
+        left = 0 if start is None else np.searchsorted(times, EventStore.to_time_value(start), side='left')
+        right = len(times) if end is None else np.searchsorted(times, EventStore.to_time_value(end), side='left')
+        events = events.iloc[left:right]
+        if packages is not None:
+            events = events[events['package'].isin(packages)]
+        if tags is not None:
+            events = events[events['tag'].isin(tags)]
+        return events
+
+    @staticmethod
+    def to_time_value(value):
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return int(EventStore.to_epoch_ms([value])[0])
+
+    def asof(self, left, right, by=None, tolerance=None, direction='backward', suffixes=('', '_right')):
+        """
+        跨流的as-of关联: 左侧每个事件匹配右侧时间不晚于(direction='backward')它的最近事件
+
+        参数:
+            left, right: 流名称或get()返回的DataFrame
+            by: 需要相等的列, 例如'package'
+            tolerance: 最大时间差(毫秒)
+        """
+        left = self.streams.get(left, pd.DataFrame(columns=BASE_COLUMNS)) if isinstance(left, str) else left
+        right = self.streams.get(right, pd.DataFrame(columns=BASE_COLUMNS)) if isinstance(right, str) else right
+        with Perf.stage('events_asof'):
+            return pd.merge_asof(left, right, on='time', by=by, tolerance=tolerance, direction=direction,
+                                 suffixes=suffixes)
+
+    @staticmethod
+    def bucket(events: pd.DataFrame, column=None, func='count', interval_ms=HOUR_MS):
+        """
+        按固定时间间隔汇总事件, 返回以区间起始时间(datetime)为索引的Series
+
+        参数:
+            events: get()返回的事件
+            column: 汇总的负载列, func为'count'时不需要
+            func: 'count', 'mean', 'max'或'sum'
+        """
+        buckets = events['time'].to_numpy() // interval_ms * interval_ms
+        if func == 'count':
+            result = pd.Series(buckets).value_counts(sort=False).sort_index()
+        else:
+            result = pd.Series(events[column].to_numpy(dtype=float)).groupby(buckets).agg(func)
+        result.index = EventStore.to_datetime(result.index)
+        return result
+
+    @staticmethod
+    def write(dir, stream, events: pd.DataFrame):
+        # 单个流写入设备目录, 并发模式下各解析器在不同进程中分别写入
+        with Perf.stage('events_save'):
+            DataStore.save(events, EventStore.get_path(dir, stream), export_excel=False)
+        Perf.count(f"events.{stream}", len(events))
+
+    @staticmethod
+    def clear(dir):
+        # 每次运行开始时删除上次运行写入的事件流, 本次没有数据的流不会读到旧文件
+        for stream in STREAM_SCHEMAS:
+            path = DataStore.get_columnar_path(EventStore.get_path(dir, stream))
+            if os.path.exists(path):
+                os.remove(path)
+
+    def save(self, dir):
+        for stream, events in self.streams.items():
+            EventStore.write(dir, stream, events)
+
+    @staticmethod
+    def load(dir, streams=None):
+        """
+        读取设备目录下已写入的事件流
+
+        参数:
+            dir: 设备目录
+            streams: 要读取的流名称, 默认为全部
+        """
+        store = EventStore()
+        for stream in streams or STREAM_SCHEMAS:
+            path = DataStore.get_columnar_path(EventStore.get_path(dir, stream))
+            if os.path.exists(path):
+                events = DataStore.load(path)
+                # 全部为空的分类列在列式文件中没有类型信息, 读回后恢复为categorical
+                for column in ('package', 'tag'):
+                    if not isinstance(events[column].dtype, pd.CategoricalDtype):
+                        events[column] = events[column].astype(object).astype('category')
+                store.streams[stream] = events
+        log.info(f"Loaded events: { {stream: len(events) for stream, events in store.streams.items()} }")
+        return store
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from log_utils import log
+
+# 解码后保留的killinfo字段及类型, 布局中没有的字段整数记为-1, 浮点记为NaN
+KILLINFO_COLUMNS = [
+    ('pid', 'int32'),
+    ('uid', 'int32'),
+    ('killed_adj', 'int16'),
+    ('min_adj', 'int16'),
+    ('rss', 'int64'),
+    ('reason', 'int16'),
+    ('total', 'int64'),
+    ('free', 'int64'),
+    ('swaptotal', 'int64'),
+    ('swapfree', 'int64'),
+    ('mempsi_some', 'float32'),
+    ('mempsi_full', 'float32'),
+    ('iopsi_some', 'float32'),
+    ('iopsi_full', 'float32'),
+    ('cpupsi', 'float32'),
+]
+PSI_COLUMNS = ['mempsi_some', 'mempsi_full', 'iopsi_some', 'iopsi_full', 'cpupsi']
+
+# lmkd killinfo的字段顺序: 进程信息, /proc/meminfo, 唤醒信息, 之后各版本依次追加swap, gpu, thrashing和PSI
+AOSP_FIELDS = ['pid', 'uid', 'killed_adj', 'min_adj', 'rss', 'reason',
+               'free', 'cached', 'swapcached', 'buffers', 'shmem', 'unevictable', 'swaptotal', 'swapfree',
+               'active_anon', 'inactive_anon', 'active_file', 'inactive_file', 'sreclaimable', 'sunreclaim',
+               'kernel_stack', 'page_tables', 'ion_heap', 'ion_heap_pool', 'cma_free',
+               'ms_since_event', 'ms_since_prev_wakeup', 'wakeups_since_event', 'skipped_wakeups']
+
+
+def get_layout(fields):
+    # 字段名列表 -> {保留字段: 下标}
+    return {name: index for index, name in enumerate(fields) if name in dict(KILLINFO_COLUMNS)}
+
+
+# 各Android版本的killinfo布局, 以字段个数区分
+KILLINFO_LAYOUTS = {
+    # Android 11: 追加进程swap
+    30: ('android11', get_layout(AOSP_FIELDS + ['swap'])),
+    # Android 12: 追加gpu
+    31: ('android12', get_layout(AOSP_FIELDS + ['swap', 'gpu'])),
+    # Android 12 + PSI
+    36: ('android12_psi', get_layout(AOSP_FIELDS + ['swap', 'gpu'] + PSI_COLUMNS)),
+    # Android 13及以后: 追加thrashing, max_thrashing和PSI
+    38: ('android13', get_layout(AOSP_FIELDS + ['swap', 'gpu', 'thrashing', 'max_thrashing'] + PSI_COLUMNS)),
+    # A54(Android 14)
+    #12-18 14:53:40.936   458   458 I killinfo: [24979,10048,925,201,42392,3,5557988,140228,531180,509984,16688,784,20328,10212,409600,0,323752,85848,4194300,4,1866252,1797292,58816,98640,141188,140692,335728,44112,88460,30620,129140,0,924,396,12,29,0,36796,128832,7,7,17.830000,11.990000,8.250000,1.260000,47.490002,86]
+    47: ('a54', {'pid': 0, 'uid': 1, 'killed_adj': 2, 'min_adj': 3, 'rss': 4, 'reason': 5, 'total': 6, 'free': 7,
+                 'swapfree': 19, 'mempsi_some': 41, 'mempsi_full': 42, 'iopsi_some': 43, 'iopsi_full': 44,
+                 'cpupsi': 45}),
+}
+# 未知布局只解码各版本共有的进程信息
+DEFAULT_LAYOUT = ('unknown', get_layout(AOSP_FIELDS[:6]))
+
+
+class KillinfoDecoder():
+    """
+    killinfo行解码: 定位"killinfo: ["之后的负载, 按逗号切分,
+    再按字段个数对应的版本布局取出需要的字段, 不使用带几十个捕获组的正则
+    解码结果为(日期, 时间(含毫秒), 字段值...)元组, to_frame()把多行转换为带类型的列
+    """
+    @staticmethod
+    def get_plan(layout):
+        # 布局 -> [(结果中的下标, 负载中的下标, 转换函数)]
+        return [(index, layout[name], float if dtype.startswith('float') else int)
+                for index, (name, dtype) in enumerate(KILLINFO_COLUMNS) if name in layout]
+
+    @staticmethod
+    def get_empty_values(**values):
+        row = [np.nan if dtype.startswith('float') else -1 for _, dtype in KILLINFO_COLUMNS]
+        for index, (name, _) in enumerate(KILLINFO_COLUMNS):
+            if name in values:
+                row[index] = values[name]
+        return tuple(row)
+
+    @staticmethod
+    def warn_unknown_layout(count, line):
+        # 每种未知的字段个数只提示一次
+        if count in UNKNOWN_COUNTS:
+            return
+        UNKNOWN_COUNTS.add(count)
+        log.warning(f"Unknown killinfo layout with {count} fields, only {', '.join(DEFAULT_LAYOUT[1])} decoded: "
+                    f"{line.strip()}")
+
+    @staticmethod
+    def decode(line, start):
+        """
+        参数:
+            line: 日志行
+            start: 负载的起始位置, 即"killinfo: ["之后
+
+        返回:
+            (日期, 时间, 字段值...), 不是有效的killinfo时返回None
+        """
+        # 行首为"MM-DD HH:MM:SS.mmm pid tid I"
+        header = line[:start].split()
+        if len(header) < 7 or header[-3] != 'I' or len(header[-7]) != 5 or len(header[-6]) < 8:
+            return None
+        end = line.find(']', start)
+        if end < 0:
+            return None
+        fields = line[start:end].split(',')
+        if len(fields) < 6:
+            return None
+        plan = PLANS.get(len(fields))
+        if plan is None:
+            KillinfoDecoder.warn_unknown_layout(len(fields), line)
+            plan = DEFAULT_PLAN
+        row = list(EMPTY_VALUES)
+        try:
+            for index, field, convert in plan:
+                row[index] = convert(fields[field])
+        except ValueError:
+            return None
+        return (header[-7], header[-6], *row)
+
+    @staticmethod
+    def to_frame(rows, head_columns=(('time', 'int64'),)):
+        """
+        把解码后的行转换为DataFrame, killinfo字段为带类型的numpy列
+
+        参数:
+            rows: 元组列表, 前几项为head_columns, 其后为KILLINFO_COLUMNS
+            head_columns: 字段值之前的[(列名, 类型)]
+        """
+        columns = list(head_columns) + KILLINFO_COLUMNS
+        if not rows:
+            return pd.DataFrame({name: np.array([], dtype=dtype) for name, dtype in columns})
+        values = list(zip(*rows))
+        return pd.DataFrame({name: np.asarray(values[index], dtype=dtype)
+                             for index, (name, dtype) in enumerate(columns)})
+
+
+EMPTY_VALUES = KillinfoDecoder.get_empty_values()
+PLANS = {count: KillinfoDecoder.get_plan(layout) for count, (_, layout) in KILLINFO_LAYOUTS.items()}
+DEFAULT_PLAN = KillinfoDecoder.get_plan(DEFAULT_LAYOUT[1])
+# 已提示过的未知字段个数
+UNKNOWN_COUNTS = set()
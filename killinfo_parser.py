@@ -1,9 +1,17 @@
 import os
 import re
+import numpy as np
 import pandas as pd
 from show import Show
 import time
 from log_utils import log
+from data_store import DataStore
+from log_scanner import LogExtractor, LogScanner
+from perf import Perf
+from event_store import EventStore, STREAM_SCHEMAS
+from killinfo_decoder import KillinfoDecoder
+from column_builder import ColumnBuilder
+from log_time import DAY_MS
 
 # 定义PROCESS_STATE的映射字典
 PROCESS_STATE_MAP = {
@@ -29,6 +37,97 @@ PROCESS_STATE_MAP = {
     18: "PROCESS_STATE_CACHED_RECENT",
     19: "PROCESS_STATE_CACHED_EMPTY"
 }
+AMKILL_VALUES = KillinfoDecoder.get_empty_values(killed_adj=-1)
+
+class KillCategoriesExtractor(LogExtractor):
+    file_keywords = ('Stream-e', 'log_')
+
+    #01-18 17:13:33.654   723   723 I killinfo: [23908,10448,915,201,173576,14,93812,638636,34000,1436,53000,4288,2664712,478784,584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,29268,254540,5,10,2.730000,1.010000,3.010000,0.650000,11.110000]
+    # 只定位负载的起始位置, 字段由KillinfoDecoder切分解码
+    pattern_killinfo = re.compile(r"killinfo:\s+\[")
+    #11-26 10:08:09.369  1705  3060 I am_kill : [0,23332,com.google.android.apps.photos,200,crash]
+    pattern_amkill = re.compile(r"(\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+am_kill\s+:\s+\[\d+\,\d+\,([^,]+)\,(\d+)\,.*]")
+
+    def __init__(self, parse_date=True):
+        self.parse_date = parse_date
+        self.cache_key = f"kill_categories:v4:{parse_date}"
+        # (epoch毫秒, 包名, KILLINFO_COLUMNS各字段)
+        self.data_list = []
+
+    def rules(self):
+        return [('killinfo:', self.pattern_killinfo, self.on_killinfo),
+                ('am_kill', self.pattern_amkill, self.on_amkill)]
+
+    def on_killinfo(self, match):
+        row = KillinfoDecoder.decode(match.string, match.end())
+        if row is None:
+            return
+        date, clock, *values = row
+        time = self.time_decoder.decode_parts(date if self.parse_date else '01-01', clock)
+        if time is not None:
+            self.data_list.append((time, None, *values))
+
+    def on_amkill(self, match):
+        # am_kill的killed_adj记为-1, 其余killinfo字段为空
+        time = self.get_time(match, self.parse_date)
+        if time is not None:
+            self.data_list.append((time, match.group(3), *AMKILL_VALUES))
+
+    def to_frame(self):
+        return KillinfoDecoder.to_frame(self.data_list, (('time', 'int64'), ('package', object)))
+
+class KillinfoExtractor(KillCategoriesExtractor):
+    # 只提取killinfo, 与parse_killinfo读取相同的文件
+    file_keywords = ('-events', 'Stream-e', 'log_')
+
+    def __init__(self):
+        super().__init__()
+        self.cache_key = "killinfo:v2"
+
+    def rules(self):
+        return [('killinfo:', self.pattern_killinfo, self.on_killinfo)]
+
+class ProcessDieExtractor(LogExtractor):
+    file_keywords = ('Stream-e', 'logcat', 'log_')
+    cache_key = 'process_die:v2'
+
+    #08-20 05:02:45.216  1759  8211 I am_proc_died: [0,3968,com.motorola.coresettingsext,920,19]
+    pattern = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+am_proc_died:\s+\[\d+\,(\d+)\,([^,]+)\,(\d+)\,(\d+)\]")
+
+    def __init__(self):
+        self.data_list = ColumnBuilder([('datetime', 'int'), ('pid', 'int'), ('pname', 'category'),
+                                        ('adj', 'int'), ('process_state_value', 'int'),
+                                        ('process_state_str', 'category')])
+
+    def rules(self):
+        return [('am_proc_died', self.pattern, self.on_proc_died)]
+
+    def on_proc_died(self, match):
+        time = self.get_time(match)
+        if time is None:
+            return
+        state = int(match.group(5))
+        self.data_list.append(time, int(match.group(2)), match.group(3), int(match.group(4)), state,
+                              KillinfoParser.int_to_process_state(state))
+
+class TopAppExtractor(LogExtractor):
+    file_keywords = ('-system', 'Stream-s', 'log_')
+    cache_key = 'top_app:v2'
+
+    #11-04 06:52:31.091  2961  6067 D AppOptManager: onTopAppStateChanged pkg=com.google.android.gms, top= true
+    pattern = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+D\s+AppOptManager:\s+onTopAppStateChanged\s+pkg=(\S+),\s+top=\s+(\S+)")
+
+    def __init__(self):
+        # (epoch毫秒, 包名, top)
+        self.data_list = []
+
+    def rules(self):
+        return [('onTopAppStateChanged', self.pattern, self.on_top_app)]
+
+    def on_top_app(self, match):
+        time = self.get_time(match)
+        if time is not None:
+            self.data_list.append((time, match.group(2), match.group(3)))
 
 class KillinfoParser():
     @staticmethod
@@ -46,41 +145,21 @@ class KillinfoParser():
                 yield line
 
     @staticmethod
-    def parse_kill_categories(dir, parse_date=True):
-        killinfo_output_excel_path = None
-        data_list = []
-        #01-18 17:13:33.654   723   723 I killinfo: [23908,10448,915,201,173576,14,93812,638636,34000,1436,53000,4288,2664712,478784,584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,29268,254540,5,10,2.730000,1.010000,3.010000,0.650000,11.110000]
-
-        #pattern = r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+killinfo:\s+\[\d+\,\d+\,(\d+)\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,(\d+\.\d+)\,(\d+\.\d+)\,(\d+\.\d+)\,(\d+\.\d+)\,(\d+\.\d+)\]"
-        pattern_killinfo = re.compile(r"(\d{2}-\d{2}) \d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+I\s+killinfo:\s+\[\d+\,\d+\,(\d+)\,.*")
-        #11-26 10:08:09.369  1705  3060 I am_kill : [0,23332,com.google.android.apps.photos,200,crash]
-        pattern_amkill = re.compile(r"(\d{2}-\d{2}) \d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+I\s+am_kill\s+:\s+\[\d+\,\d+\,[^,]+\,(\d+)\,.*]")
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if 'Stream-e' in file or 'log_' in file:
-                    file_path = os.path.join(root, file)
-                    #log.info(f"Parsing {file_path}")
-                    for line in KillinfoParser.read_lines(file_path):
-                        match = pattern_killinfo.search(line)
-                        if match:
-                            data_list.append({
-                                'date': match.group(1) if parse_date else '01-01',
-                                'killed_adj': int(match.group(2)),
-                            })
-                        match2 = pattern_amkill.search(line)
-                        if match2:
-                            data_list.append({
-                                'date': match2.group(1) if parse_date else '01-01',
-                                'killed_adj': -1, # -1表示am_kill
-                            })
-        
-        df = pd.DataFrame(data_list)
+    def parse_kill_categories(dir, parse_date=True, extractor=None):
+        if extractor is None:
+            extractor = LogScanner.scan_with(dir, KillCategoriesExtractor(parse_date))
+        with Perf.stage('dataframe'):
+            df = extractor.to_frame()
+        Perf.count('rows', len(df))
         
         if df.empty:
             log.warning("Not found any killing data.")
             return None
         
         log.info(f"df = {df}")
+        KillinfoParser.write_kill_events(dir, df)
+        # 日期为每个kill所在当天的0点
+        df['date'] = EventStore.to_datetime(df['time'].to_numpy() // DAY_MS * DAY_MS)
 
         # 使用pd.cut将killed_adj列分箱
         bins = [-float('inf'), 0, 201, 921, float('inf')]
@@ -98,9 +177,6 @@ class KillinfoParser():
         # 将索引转换为列
         grouped.reset_index(inplace=True)
         
-        # 将日期字符串转换为日期类型
-        grouped['date'] = pd.to_datetime(grouped['date'], format='%m-%d')
-        
         # 增加一列 heavy_kill_per_hour
         grouped['heavy_kill_per_hour'] = grouped['heavy_kill'] / 24
         
@@ -116,40 +192,27 @@ class KillinfoParser():
             log.info(f"Counts: {row[['heavy_kill', 'critical_kill', 'medium_kill', 'am_kill', 'total_kills']].to_dict()}")
             
         if not grouped.empty:
-            # 保存结果到excel文件
-            killinfo_output_excel_path = KillinfoParser.get_killinfo_output_excel_path(dir)
-            grouped.to_excel(killinfo_output_excel_path, index=False)
+            # 保存结果, Excel为可选导出
+            DataStore.save(grouped, KillinfoParser.get_killinfo_output_excel_path(dir))
         else:
             log.warning("Not found any killing data.")
+            return None
+
+        return grouped
 
-        return killinfo_output_excel_path
 
+    @staticmethod
+    def write_kill_events(dir, df):
+        # 写入统一事件存储, am_kill的adj记为-1, 以tag区分来源
+        tags = np.where(df['killed_adj'] < 0, 'am_kill', 'killinfo')
+        payload = {column: df[column] for column in STREAM_SCHEMAS['kill'] if column in df.columns}
+        EventStore.write(dir, 'kill', EventStore.build('kill', df['time'], df['package'], tags, adj=df['killed_adj'],
+                                                       **payload))
 
     @staticmethod
     def parse_process_die_info(dir):
-        process_die_info_output_excel_path = None
-        data_list = []
-        #08-20 05:02:45.216  1759  8211 I am_proc_died: [0,3968,com.motorola.coresettingsext,920,19]
-        pattern = r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+am_proc_died:\s+\[\d+\,(\d+)\,([^,]+)\,(\d+)\,(\d+)\]"
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if 'Stream-e' in file or 'logcat' in file or 'log_' in file:
-                    file_path = os.path.join(root, file)
-                    log.info(f"Parsing {file_path}")
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        matches = re.findall(pattern, content)
-                        for match in matches:
-                            data_list.append({
-                                'datetime': match[0],
-                                'pid': int(match[1]),
-                                'pname': match[2],
-                                'adj': int(match[3]),
-                                'process_state_value': int(match[4]),
-                                'process_state_str': KillinfoParser.int_to_process_state(int(match[4])),
-                            })
-                        
-        df = pd.DataFrame(data_list)
+        extractor = LogScanner.scan_with(dir, ProcessDieExtractor())
+        df = extractor.data_list.to_frame()
         
         if df.empty:
             log.warning("Not found any process die data.")
@@ -157,12 +220,12 @@ class KillinfoParser():
         
         log.info(f"df = {df}")
         
-        # 确保 datetime 列是日期类型
-        df['datetime'] = pd.to_datetime(df['datetime'], format='%m-%d %H:%M:%S')
+        # epoch毫秒转换为日期类型
+        df['datetime'] = EventStore.to_datetime(df['datetime'])
 
         # 计算每个 pname 组内的时间差
         df['kill_interval'] = df.groupby('pname')['datetime'].transform(lambda x: x.diff().dt.total_seconds())  # 时间差以秒为单位
-        df.to_excel(os.path.join(dir, 'process_die_info_org.xlsx'), index=False)
+        DataStore.save(df, os.path.join(dir, 'process_die_info_org.xlsx'))
         
         # 按pname分组并统计个数
         grouped = df.groupby(['pname']).size().reset_index(name='count')
@@ -177,154 +240,101 @@ class KillinfoParser():
             
         if not grouped.empty:
             # 保存结果到excel文件
-            process_die_info_output_excel_path = os.path.join(dir, 'process_die_info.xlsx')
-            grouped.to_excel(process_die_info_output_excel_path, index=False)
+            DataStore.save(grouped, os.path.join(dir, 'process_die_info.xlsx'))
         else:
             log.warning("Not found any process die data.")
+            return None
 
-        return process_die_info_output_excel_path
+        return grouped
 
     @staticmethod
-    def parse_top_app_info(dir):
-        data_list = []
-        #11-04 06:52:31.091  2961  6067 D AppOptManager: onTopAppStateChanged pkg=com.google.android.gms, top= true
-        pattern = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+D\s+AppOptManager:\s+onTopAppStateChanged\s+pkg=(\S+),\s+top=\s+(\S+)")
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if '-system' in file or 'Stream-s' in file or 'log_' in file:
-                    file_path = os.path.join(root, file)
-                    log.info(f"Parsing {file_path}")
-                    for line in KillinfoParser.read_lines(file_path):
-                        match = pattern.search(line)
-                        if match:
-                            data_list.append({
-                                'datetime': match.group(1),
-                                'pkg': match.group(2),
-                                'top': match.group(3),
-                            })
-                            
-        df = pd.DataFrame(data_list)
+    def parse_top_app_info(dir, extractor=None):
+        if extractor is None:
+            extractor = LogScanner.scan_with(dir, TopAppExtractor())
+        df = pd.DataFrame(extractor.data_list, columns=['datetime', 'pkg', 'top'])
         
         if df.empty:
             log.warning("Not found any top app data.")
             return None
         
-        # 确保 datetime 列是日期类型
-        df['datetime'] = pd.to_datetime(df['datetime'], format='%m-%d %H:%M:%S')
+        # epoch毫秒转换为日期类型
+        df['datetime'] = EventStore.to_datetime(df['datetime'])
     
         log.info(f"df = {df}")
         return df
 
     @staticmethod
     def parse_killinfo(dir):
-        data_list = []
-        #01-18 17:13:33.654   723   723 I killinfo: [23908,10448,915,201,173576,14,93812,638636,34000,1436,53000,4288,2664712,478784,584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,29268,254540,5,10,2.730000,1.010000,3.010000,0.650000,11.110000]
-        pattern_killinfo = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+killinfo:\s+\[\d+\,\d+\,(\d+)\,.*")
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if '-events' in file or 'Stream-e' in file or 'log_' in file:
-                    file_path = os.path.join(root, file)
-                    #log.info(f"Parsing {file_path}")
-                    for line in KillinfoParser.read_lines(file_path):
-                        match = pattern_killinfo.search(line)
-                        if match:
-                            data_list.append({
-                                'datetime': match.group(1),
-                                'killed_adj': int(match.group(2)),
-                            })
-
-        
-        df = pd.DataFrame(data_list)
+        df = LogScanner.scan_with(dir, KillinfoExtractor()).to_frame()
         
         if df.empty:
             log.warning("Not found any killing data.")
             return None
         
-        # 确保 datetime 列是日期类型
-        df['datetime'] = pd.to_datetime(df['datetime'], format='%m-%d %H:%M:%S')
+        # epoch毫秒转换为日期类型
+        df = pd.DataFrame({'datetime': EventStore.to_datetime(df['time']), 'killed_adj': df['killed_adj']})
         
         log.info(f"df = {df}")
         return df
     
+    @staticmethod
+    def get_pkg_counts_excel_path(dir):
+        return os.path.join(dir, 'pkg_counts.xlsx')
+
     @staticmethod
     def seek_top_apps_in_heavy_kills(dir):
-        df_top_apps = KillinfoParser.parse_top_app_info(dir)
-        # 去掉 top 列为 False 的行
+        """
+        统计heavy kill(killed_adj <= 200)发生时的前台应用:
+        一次日志扫描同时提取前台应用切换和killinfo, 每个kill按时间as-of关联到此前最近的前台应用
+
+        返回:
+            各前台应用对应的heavy kill次数(pkg, count)
+        """
+        scanner = LogScanner()
+        top_extractor = scanner.register(TopAppExtractor())
+        kill_extractor = scanner.register(KillinfoExtractor())
+        scanner.scan(dir)
+
+        df_top_apps = KillinfoParser.parse_top_app_info(dir, top_extractor)
+        df_killing = kill_extractor.to_frame()
+        if df_top_apps is None or df_killing.empty:
+            log.warning("Not found any valuable data.")
+            return None
+
+        # 去掉 top 列为 false 的行, 以及 adj 大于 200 的kill
         df_top_apps = df_top_apps[df_top_apps['top'] != 'false']
-        df_top_apps.to_excel(os.path.join(dir, 'top_apps.xlsx'), index=False)
-        df_killing = KillinfoParser.parse_killinfo(dir)
-        df_killing.to_excel(os.path.join(dir, 'killing_org.xlsx'), index=False)
-        # 去掉 df_killing 中 adj 大于 200 的行
         df_killing = df_killing[df_killing['killed_adj'] <= 200]
-        df_killing.to_excel(os.path.join(dir, 'killing_le200.xlsx'), index=False)
-        # 按 datetime 列合并 df_top_apps 和 df_killing
-        merged_df = pd.merge(df_top_apps, df_killing, on='datetime', how='outer')
-        
-        # 按 datetime 列对合并后的数据进行排序
-        merged_df = merged_df.sort_values(by='datetime')
-        
-        # 对 pkg 和 top 列进行前向填充
-        merged_df['pkg'].fillna(method='ffill', inplace=True)
-        merged_df['top'].fillna(method='ffill', inplace=True)
-        
-        # 去掉 killed_adj 列为空的行
-        merged_df = merged_df.dropna(subset=['killed_adj'])
-        if not merged_df.empty:
-            # 保存结果到excel文件
-            merged_df_excel_path = os.path.join(dir, 'merged_df.xlsx')
-            merged_df.to_excel(merged_df_excel_path, index=False)
-            
-            # 按 pkg 列统计每种字符串的个数
-            pkg_counts = merged_df['pkg'].value_counts()
-            
-            # 将统计结果转换为 DataFrame
-            pkg_counts_df = pkg_counts.reset_index()
-            pkg_counts_df.columns = ['pkg', 'count']
-            
-            # 保存统计结果到excel文件
-            pkg_counts_excel_path = os.path.join(dir, 'pkg_counts.xlsx')
-            pkg_counts_df.to_excel(pkg_counts_excel_path, index=False)
-        else:
+
+        store = EventStore()
+        store.add('top', EventStore.build('top', df_top_apps['datetime'], df_top_apps['pkg'], df_top_apps['top']))
+        store.add('kill', EventStore.build('kill', df_killing['time'], tag=np.full(len(df_killing), 'killinfo'),
+                                           adj=df_killing['killed_adj']))
+        attributed = store.asof('kill', 'top', suffixes=('', '_top'))
+
+        # 第一次前台切换之前的kill没有对应的应用, 不参与统计
+        pkg_counts = attributed['package_top'].dropna().astype(str).value_counts()
+        if pkg_counts.empty:
             log.warning("Not found any valuable data.")
-        
+            return None
+        pkg_counts_df = pkg_counts.reset_index()
+        pkg_counts_df.columns = ['pkg', 'count']
+        log.info(f"pkg_counts = {pkg_counts_df}")
+        DataStore.save(pkg_counts_df, KillinfoParser.get_pkg_counts_excel_path(dir))
+        return pkg_counts_df
+
     @staticmethod
     def parse_killinfo_A54(dir):
-        data_list = []
-        #12-18 14:53:40.936   458   458 I killinfo: [24979,10048,925,201,42392,3,5557988,140228,531180,509984,16688,784,20328,10212,409600,0,323752,85848,4194300,4,1866252,1797292,58816,98640,141188,140692,335728,44112,88460,30620,129140,0,924,396,12,29,0,36796,128832,7,7,17.830000,11.990000,8.250000,1.260000,47.490002,86]
-        pattern_killinfo = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+killinfo:\s+\[\d+\,\d+\,(\d+)\,(\d+)\,(\d+)\,(\d+)\,(\d+)\,(\d+)\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,(\d+)\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,(\b\d+\.\d+\b),(\b\d+\.\d+\b),(\b\d+\.\d+\b),(\b\d+\.\d+\b),(\b\d+\.\d+\b),\d+\]")
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if '-events' in file or 'Stream-e' in file or 'log_' in file:
-                    file_path = os.path.join(root, file)
-                    #log.info(f"Parsing {file_path}")
-                    for line in KillinfoParser.read_lines(file_path):
-                        match = pattern_killinfo.search(line)
-                        if match:
-                            data_list.append({
-                                'datetime': match.group(1),
-                                'killed_adj': int(match.group(2)),
-                                'min_adj': int(match.group(3)),
-                                'rss': int(match.group(4)),
-                                'reason': int(match.group(5)),
-                                'total': int(match.group(6)),
-                                'free': int(match.group(7)),
-                                'swapfree': int(match.group(8)),
-                                'mempsi_some': float(match.group(9)),
-                                'mempsi_full': float(match.group(10)),
-                                'iopsi_some': float(match.group(11)),
-                                'iopsi_full': float(match.group(12)),
-                                'cpupsi': float(match.group(13)),
-                            })
-
-        
-        df = pd.DataFrame(data_list)
+        # 各Android版本的字段布局见killinfo_decoder
+        extractor = LogScanner.scan_with(dir, KillinfoExtractor())
+        df = extractor.to_frame()
         
         if df.empty:
             log.warning("Not found any killing data.")
             return None
         
-        # 确保 datetime 列是日期类型
-        df['datetime'] = pd.to_datetime(df['datetime'], format='%m-%d %H:%M:%S')
+        # epoch毫秒转换为日期类型
+        df['datetime'] = EventStore.to_datetime(df['time'])
+        df = df[['datetime'] + [column for column in df.columns if column not in ('time', 'package', 'datetime')]]
         
         log.info(f"df = {df}")
         return df
@@ -358,8 +368,7 @@ if __name__ == '__main__':
             item_path = os.path.join(log_path, item)
             if os.path.isdir(item_path):
                 print(f"目录: {item}")
-                killinfo_output_sub_path = KillinfoParser.parse_kill_categories(item_path, parse_date=False)
-                sub_df = pd.read_excel(killinfo_output_sub_path)
+                sub_df = KillinfoParser.parse_kill_categories(item_path, parse_date=False)
                 output_df = pd.concat([output_df, sub_df], ignore_index=True)
                 KillinfoParser.parse_process_die_info(item_path)
             elif os.path.isfile(item_path):
@@ -368,10 +377,11 @@ if __name__ == '__main__':
         print("指定的路径不存在。")
 
     killinfo_output_excel_path = os.path.join(log_path, 'killinfo_output.xlsx')
-    output_df.to_excel(killinfo_output_excel_path, index=False)
-    if killinfo_output_excel_path:
+    DataStore.save(output_df, killinfo_output_excel_path, export_excel=True)
+    if not output_df.empty:
         Show.draw_initial_report(log_path, 'test')
-        Show.draw_killing(log_path, killinfo_output_excel_path, colomn_index_as_x_labels=1)
+        Show.draw_killing(log_path, output_df, colomn_index_as_x_labels=1)
+        Show.finish_report(log_path)
         
     # log_path = r"D:\github\mlat\mla\download\milos\IKSWV-66545"
     # KillinfoParser.seek_top_apps_in_heavy_kills(log_path)
@@ -5,6 +5,58 @@ import subprocess
 import pandas as pd
 from show import Show
 from log_utils import log
+from data_store import DataStore
+from log_scanner import LogExtractor, LogScanner
+from perf import Perf
+from event_store import EventStore
+from column_builder import ColumnBuilder
+from log_time import DAY_MS
+
+class LaunchInfoExtractor(LogExtractor):
+    file_keywords = ('Stream-s', 'log_')
+
+    #08-03 11:53:46.077  1784  2473 I LaunchCheckinHandler: MotoDisplayed com.google.android.dialer/com.android.dialer.incall.activity.ui.InCallActivity,wp,ca,261
+    pattern = re.compile(r"(\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+LaunchCheckinHandler: MotoDisplayed ([^/,]+)[^,]*\,(\w+)\,(\w+)\,(\d+)")
+
+    def __init__(self, parse_date=True):
+        self.parse_date = parse_date
+        self.cache_key = f"launch_info:v3:{parse_date}"
+        self.data_list = []
+
+    def rules(self):
+        return [('MotoDisplayed', self.pattern, self.on_launch)]
+
+    def on_launch(self, match):
+        time = self.get_time(match, self.parse_date)
+        if time is None:
+            return
+        self.data_list.append({
+            'time': time,
+            'package': match.group(3),
+            'process_launch_type': match.group(4),
+            'activity_launch_type': match.group(5),
+            'duration': match.group(6)
+        })
+
+class ProcessStartExtractor(LogExtractor):
+    file_keywords = ('Stream-e', 'logcat', 'log_', '-events', 'bugreport-')
+    cache_key = 'process_start:v3'
+
+    #12-02 23:34:29.964  2751  2933 I am_proc_start: [0,4092,10421,com.dolby.daxservice,added application,com.dolby.daxservice]
+    #01-11 12:03:05.281  2387  2482 I am_proc_start: [0,17034,10412,com.motorola.personalize,service,{com.motorola.personalize/com.motorola.personalize.plugin.LockScreenPluginService}]
+    pattern = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+am_proc_start:\s+\[\d+\,(\d+)\,\d+\,([^,]+)\,([^,]+)\,([^,]+)\]")
+
+    def __init__(self):
+        self.data_list = ColumnBuilder([('datetime', 'int'), ('pid', 'int'), ('pname', 'category'),
+                                        ('type', 'category'), ('component', 'category')])
+
+    def rules(self):
+        return [('am_proc_start', self.pattern, self.on_proc_start)]
+
+    def on_proc_start(self, match):
+        time = self.get_time(match)
+        if time is not None:
+            self.data_list.append(time, int(match.group(2)), match.group(3), match.group(4), match.group(5))
 
 class LaunchInfoParser():
     @staticmethod
@@ -14,35 +66,25 @@ class LaunchInfoParser():
         return file_path
         
     @staticmethod
-    def parse_launchinfo(dir, parse_date=True):
-        output_excel_path = None
-        data_list = []
-        
-        #08-03 11:53:46.077  1784  2473 I LaunchCheckinHandler: MotoDisplayed com.google.android.dialer/com.android.dialer.incall.activity.ui.InCallActivity,wp,ca,261
-        pattern = r"(\d{2}-\d{2}) \d{2}:\d{2}:\d{2}\.\d{3}\s+\d+\s+\d+\s+I\s+LaunchCheckinHandler: MotoDisplayed [^,]+\,(\w+)\,(\w+)\,(\d+)"
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if 'Stream-s' in file or 'log_' in file:
-                    file_path = os.path.join(root, file)
-                    #log.info(f"Parsing {file_path}")
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        matches = re.findall(pattern, content)
-                        for match in matches:
-                            data_list.append({
-                                'date': match[0] if parse_date else '01-01',
-                                'process_launch_type': match[1],
-                                'activity_launch_type': match[2],
-                                'duration': match[3]
-                            })
-        
-        df = pd.DataFrame(data_list)
+    def parse_launchinfo(dir, parse_date=True, extractor=None):
+        if extractor is None:
+            extractor = LogScanner.scan_with(dir, LaunchInfoExtractor(parse_date))
+        data_list = extractor.data_list
+
+        with Perf.stage('dataframe'):
+            df = pd.DataFrame(data_list)
+        Perf.count('rows', len(df))
         
         if df.empty:
             log.warning("Not found any killing data.")
             return None
         
         log.info(f"df = {df}")
+        # 写入统一事件存储, tag为进程启动类型
+        EventStore.write(dir, 'launch', EventStore.build('launch', df['time'], df['package'], df['process_launch_type'],
+                                                         duration=df['duration'].astype(int)))
+        # 日期为每次启动所在当天的0点
+        df['date'] = EventStore.to_datetime(df['time'].to_numpy() // DAY_MS * DAY_MS)
 
         # 按日期统计总行数
         total_counts = df.groupby('date').size().reset_index(name='total_count')
@@ -57,44 +99,20 @@ class LaunchInfoParser():
         
         # 确保列顺序为 date, wp_ratio, wp_count, total_count
         result = result[['date', 'wp_ratio', 'wp_count', 'total_count']]
-        
-        # 将日期字符串转换为日期类型
-        result['date'] = pd.to_datetime(result['date'], format='%m-%d')
         if not result.empty:
-            # 保存结果到excel文件
-            output_excel_path = LaunchInfoParser.get_launch_info_excel_path(dir)
-            result.to_excel(output_excel_path, index=False)
+            # 保存结果, Excel为可选导出
+            DataStore.save(result, LaunchInfoParser.get_launch_info_excel_path(dir))
         else:
             log.warning("Not found any launch info data.")
+            return None
             
-        return output_excel_path
+        return result
 
     @staticmethod
     def parse_process_start_info(dir):
         print(f"开始解析进程启动信息,路径: {dir}")
-        process_start_info_output_excel_path = None
-        data_list = []
-        #12-02 23:34:29.964  2751  2933 I am_proc_start: [0,4092,10421,com.dolby.daxservice,added application,com.dolby.daxservice]
-        #01-11 12:03:05.281  2387  2482 I am_proc_start: [0,17034,10412,com.motorola.personalize,service,{com.motorola.personalize/com.motorola.personalize.plugin.LockScreenPluginService}]
-        pattern = r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d*+I\s+am_proc_start:\s+\[\d+\,(\d+)\,\d+\,([^,]+)\,([^,]+)\,([^,]+)\]"
-        for root, dirs, files in os.walk(dir):
-            for file in files:
-                if 'Stream-e' in file or 'logcat' in file or 'log_' in file or '-events' in file or 'bugreport-' in file:
-                    file_path = os.path.join(root, file)
-                    log.info(f"Parsing {file_path}")
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        matches = re.findall(pattern, content)
-                        for match in matches:
-                            data_list.append({
-                                'datetime': match[0],
-                                'pid': int(match[1]),
-                                'pname': match[2],
-                                'type': match[3],
-                                'component': match[4],
-                            })
-                        
-        df = pd.DataFrame(data_list)
+        extractor = LogScanner.scan_with(dir, ProcessStartExtractor())
+        df = extractor.data_list.to_frame()
         
         if df.empty:
             log.warning("Not found any process start data.")
@@ -102,12 +120,12 @@ class LaunchInfoParser():
         
         log.info(f"df = {df}")
         
-        # 确保 datetime 列是日期类型
-        df['datetime'] = pd.to_datetime(df['datetime'], format='%m-%d %H:%M:%S')
+        # epoch毫秒转换为日期类型
+        df['datetime'] = EventStore.to_datetime(df['datetime'])
 
         # 计算每个 pname 组内的时间差
         df['start_interval'] = df.groupby('pname')['datetime'].transform(lambda x: x.diff().dt.total_seconds())  # 时间差以秒为单位
-        df.to_excel(os.path.join(dir, 'process_start_info_org.xlsx'), index=False)
+        DataStore.save(df, os.path.join(dir, 'process_start_info_org.xlsx'))
         
         # 按pname分组并统计个数
         grouped = df.groupby(['pname']).size().reset_index(name='count')
@@ -122,12 +140,12 @@ class LaunchInfoParser():
             
         if not grouped.empty:
             # 保存结果到excel文件
-            process_start_info_output_excel_path = os.path.join(dir, 'process_start_info.xlsx')
-            grouped.to_excel(process_start_info_output_excel_path, index=False)
+            DataStore.save(grouped, os.path.join(dir, 'process_start_info.xlsx'))
         else:
             log.warning("Not found any process die data.")
+            return None
 
-        return process_start_info_output_excel_path
+        return grouped
 
 if __name__ == '__main__':
     log_path = r"D:\github\download\glory\IKSWV-76358\NZ4R2C0014_326292077_App_Not_Responding"
@@ -0,0 +1,56 @@
+import re
+
+
+class LineMatcher():
+    """
+    关键字预过滤 + 正则提取的行匹配器
+    每条规则由(关键字, 正则, 回调)组成, 所有关键字合并为一个交替正则,
+    只有命中关键字的候选行才会运行完整的捕获正则, 匹配成功后调用回调
+    """
+    def __init__(self, rules=()):
+        self.rules = []
+        # 累计匹配成功的次数, 用于性能统计
+        self.match_count = 0
+        self._prefilter = None
+        self._rules_by_keyword = {}
+        for keyword, pattern, handler in rules:
+            self.add(keyword, pattern, handler)
+
+    def add(self, keyword, pattern, handler):
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        self.rules.append((keyword, pattern, handler))
+        self._prefilter = None
+
+    def compile(self):
+        self._rules_by_keyword = {}
+        for keyword, pattern, handler in self.rules:
+            self._rules_by_keyword.setdefault(keyword, []).append((pattern, handler))
+        # 较长的关键字放在前面, 避免被其前缀抢先匹配
+        keywords = sorted(self._rules_by_keyword, key=len, reverse=True)
+        self._prefilter = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+        return self
+
+    def is_candidate(self, line):
+        if self._prefilter is None:
+            self.compile()
+        return self._prefilter.search(line) is not None
+
+    def feed(self, line):
+        if self._prefilter is None:
+            self.compile()
+        if self._prefilter.search(line) is None:
+            return 0
+
+        # 候选行很少, 逐个确认包含的关键字, 一行中出现多个关键字时都会分发
+        count = 0
+        for keyword, rules in self._rules_by_keyword.items():
+            if keyword not in line:
+                continue
+            for pattern, handler in rules:
+                match = pattern.search(line)
+                if match:
+                    handler(match)
+                    count += 1
+        self.match_count += count
+        return count
@@ -0,0 +1,185 @@
+from tqdm import tqdm
+from log_utils import log
+from log_matcher import LineMatcher
+from log_source import LogSource, StreamSource, OUTPUT_EXTENSIONS
+from parse_manifest import ParseManifest
+from log_time import LogTimeDecoder
+from perf import Perf
+
+
+class LogExtractor():
+    """
+    日志提取器基类, 由LogScanner统一调度
+    子类通过file_keywords声明关心的日志文件;
+    rules()返回(关键字, 正则, 回调)列表时, 只有命中关键字的行才会运行正则,
+    否则每一行都会交给on_line处理;
+    提取结果按行追加到data_list中, 以便按文件缓存到增量解析清单;
+    行中的时间由time_decoder解码为epoch毫秒, time_decoder由LogScanner设置
+    """
+    # 文件名包含其中任一关键字时, 该文件的每一行都会交给本提取器
+    file_keywords = ()
+    # 增量解析清单中的缓存键, None表示不缓存
+    cache_key = None
+    time_decoder = None
+
+    def accepts(self, file_name):
+        # 输出文件(例如events_pss.parquet)可能包含关键字, 不作为日志读取
+        if file_name.lower().endswith(OUTPUT_EXTENSIONS):
+            return False
+        return any(keyword in file_name for keyword in self.file_keywords)
+
+    def rules(self):
+        return None
+
+    def get_time(self, match, parse_date=True):
+        """
+        匹配从"MM-DD HH:MM:SS.mmm"开始时, 返回其epoch毫秒;
+        parse_date为False时忽略日期, 所有行按同一天计算
+        """
+        line, pos = match.string, match.start()
+        if parse_date:
+            return self.time_decoder.decode(line, pos)
+        return self.time_decoder.decode_parts('01-01', line[pos + 6:pos + 18])
+
+    def on_file_start(self, file_path):
+        self._file_row_start = len(self.data_list)
+
+    def on_line(self, line):
+        raise NotImplementedError
+
+    def on_file_end(self, file_path):
+        pass
+
+    def finish(self):
+        pass
+
+    def get_file_rows(self):
+        # 最近一个文件提取出的行, data_list为ColumnBuilder时是按列保存的ColumnSlice
+        return self.data_list[self._file_row_start:]
+
+    def add_cached_rows(self, rows):
+        self.data_list.extend(rows)
+
+
+class LogScanner():
+    """
+    共享的日志扫描引擎: 每个日志文件只读取并解码一次,
+    每一行分发给所有关心该文件的提取器
+    """
+    def __init__(self, time_decoder: LogTimeDecoder = None):
+        self.extractors = []
+        self._matchers = {}
+        self.time_decoder = time_decoder or LogTimeDecoder()
+
+    def register(self, extractor: LogExtractor):
+        self.extractors.append(extractor)
+        self._matchers = {}
+        extractor.time_decoder = self.time_decoder
+        return extractor
+
+    def set_time_decoder(self, time_decoder: LogTimeDecoder):
+        self.time_decoder = time_decoder
+        for extractor in self.extractors:
+            extractor.time_decoder = time_decoder
+
+    def get_matcher(self, extractors):
+        # 同一组提取器共用一个合并后的匹配器
+        key = tuple(id(extractor) for extractor in extractors)
+        if key not in self._matchers:
+            matcher = LineMatcher()
+            for extractor in extractors:
+                for keyword, pattern, handler in extractor.rules() or ():
+                    matcher.add(keyword, pattern, handler)
+            self._matchers[key] = matcher.compile() if matcher.rules else None
+        return self._matchers[key]
+
+    def scan_source(self, source: LogSource, extractors):
+        for extractor in extractors:
+            extractor.on_file_start(source.display_path)
+
+        self.time_decoder.start_file()
+        lines = tqdm(source.read_lines(), desc=f"Reading {source.name}", unit="line")
+        handlers = [extractor.on_line for extractor in extractors if extractor.rules() is None]
+        matcher = self.get_matcher([extractor for extractor in extractors if extractor.rules() is not None])
+        if matcher is not None:
+            handlers.insert(0, matcher.feed)
+        if len(handlers) == 1:
+            handler = handlers[0]
+            for line in lines:
+                handler(line)
+        else:
+            for line in lines:
+                for handler in handlers:
+                    handler(line)
+
+        for extractor in extractors:
+            extractor.on_file_end(source.display_path)
+        Perf.count('files_read')
+        Perf.count('lines_read', lines.n)
+        Perf.count('bytes_read', source.get_size())
+
+    def feed(self, source: LogSource, manifest: ParseManifest = None):
+        """
+        把一个日志来源分发给关心它的提取器, 所有来源处理完后调用finish()
+        """
+        extractors = [e for e in self.extractors if e.accepts(source.name)]
+        if not extractors:
+            return
+        if manifest is not None:
+            extractors = self.load_cached_rows(source, extractors, manifest, self.time_decoder)
+            if not extractors:
+                return
+        try:
+            with Perf.stage('scan'):
+                self.scan_source(source, extractors)
+        except (OSError, EOFError) as e:
+            log.error(f"Error reading {source.display_path}: {e}")
+            return
+        if manifest is not None:
+            # 缓存的时间依赖推断出的年份, 与行一起记录文件中各日期的年份
+            years = self.time_decoder.get_file_years()
+            for extractor in extractors:
+                if extractor.cache_key is not None:
+                    manifest.store(source, extractor.cache_key, extractor.get_file_rows(), years)
+
+    def scan_stream(self, name, fileobj, display_path=None, size=None):
+        # 流式输入(例如下载中的文件), 在数据到达时逐行解析, 不缓存到增量解析清单
+        self.feed(StreamSource(name, fileobj, display_path, size))
+
+    def finish(self):
+        for extractor in self.extractors:
+            extractor.finish()
+            Perf.count(f"{type(extractor).__name__}.rows", len(extractor.data_list))
+        for matcher in self._matchers.values():
+            if matcher is not None:
+                Perf.count('matches', matcher.match_count)
+
+    def scan(self, dir, manifest: ParseManifest = None):
+        # .gz文件和.zip包中的成员直接以流的方式读取, 文件名过滤作用于解压后的名称
+        self.set_time_decoder(LogTimeDecoder.for_dir(dir))
+        for source in LogSource.walk(dir):
+            self.feed(source, manifest)
+        self.finish()
+
+    @staticmethod
+    def load_cached_rows(source: LogSource, extractors, manifest: ParseManifest, time_decoder: LogTimeDecoder):
+        # 文件未变化且推断的年份不变时直接使用清单中缓存的行, 返回仍需解析该文件的提取器
+        pending = []
+        for extractor in extractors:
+            rows = manifest.lookup(source, extractor.cache_key, time_decoder.matches_years) \
+                if extractor.cache_key is not None else None
+            if rows is None:
+                pending.append(extractor)
+            else:
+                extractor.add_cached_rows(rows)
+        if len(pending) < len(extractors):
+            Perf.count('files_cached')
+        return pending
+
+    @staticmethod
+    def scan_with(dir, extractor: LogExtractor):
+        # 单独运行一个提取器, 兼容各解析器原有的独立调用方式
+        scanner = LogScanner()
+        scanner.register(extractor)
+        scanner.scan(dir)
+        return extractor
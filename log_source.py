@@ -0,0 +1,210 @@
+import io
+import os
+import gzip
+import hashlib
+import zipfile
+from contextlib import contextmanager
+from log_utils import log
+
+# 本工具写入设备目录的输出文件, 不作为日志解析
+OUTPUT_EXTENSIONS = ('.parquet', '.xlsx', '.html', '.json', '.pkl', '.png', '.csv')
+# 读取磁盘文件的缓冲区大小
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+class HashingReader(io.RawIOBase):
+    """
+    读取磁盘文件的同时计算原始字节的sha1, 读到文件末尾时记录到source.scanned_hash,
+    增量解析清单因此不需要为计算哈希再读一遍文件
+    """
+    def __init__(self, f, source):
+        self.f = f
+        self.source = source
+        self.sha1 = hashlib.sha1()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.f.readinto(buffer)
+        if count:
+            self.sha1.update(memoryview(buffer)[:count])
+        elif self.sha1 is not None:
+            self.source.scanned_hash = f"sha1:{self.sha1.hexdigest()}"
+            self.sha1 = None
+        return count
+
+
+class LogSource():
+    """
+    一个可读取的日志来源: 普通文件, .gz文件或.zip包中的成员
+    压缩内容以流的方式边读边解压, 不会解压到磁盘, 输入目录保持只读
+    """
+    def __init__(self, path, member=None):
+        # path: 磁盘上的文件路径; member: zip包中的成员名
+        self.path = path
+        self.member = member
+        # zip成员的大小和CRC, 由list_zip_members填充
+        self.member_size = None
+        self.member_crc = None
+        # 完整读取过一次文件后记录的内容哈希
+        self.scanned_hash = None
+        inner_name = os.path.basename(member) if member else os.path.basename(path)
+        self.compressed = inner_name.lower().endswith('.gz')
+        # name用于各解析器的文件名过滤, 与解压后的文件名一致
+        self.name = inner_name[:-3] if self.compressed else inner_name
+
+    def __repr__(self):
+        return f"LogSource({self.display_path})"
+
+    @property
+    def display_path(self):
+        if self.member:
+            return f"{self.path}!{self.member}"
+        return self.path
+
+    @property
+    def dir_path(self):
+        return os.path.dirname(self.path)
+
+    def get_mtime(self):
+        return os.path.getmtime(self.path)
+
+    def get_size(self):
+        if self.member is not None and self.member_size is not None:
+            return self.member_size
+        return os.path.getsize(self.path)
+
+    def get_known_hash(self):
+        # 不读取文件就能得到的内容哈希, 没有时返回None
+        if self.member is not None and self.member_crc is not None:
+            return f"crc32:{self.member_crc:08x}"
+        return self.scanned_hash
+
+    def get_content_hash(self):
+        # zip成员直接使用包内记录的CRC, 其他文件计算磁盘上原始字节的sha1
+        if self.member is not None and self.member_crc is not None:
+            return f"crc32:{self.member_crc:08x}"
+        if self.scanned_hash is not None:
+            return self.scanned_hash
+        sha1 = hashlib.sha1()
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+        return f"sha1:{sha1.hexdigest()}"
+
+    @contextmanager
+    def open_binary(self):
+        if self.member is None:
+            with open(self.path, 'rb', buffering=0) as raw:
+                f = io.BufferedReader(HashingReader(raw, self), READ_BUFFER_SIZE)
+                if self.compressed:
+                    with gzip.GzipFile(fileobj=f) as gz:
+                        yield gz
+                else:
+                    yield f
+        else:
+            with zipfile.ZipFile(self.path, 'r') as zip_ref, zip_ref.open(self.member) as f:
+                if self.compressed:
+                    with gzip.GzipFile(fileobj=f) as gz:
+                        yield gz
+                else:
+                    yield f
+
+    @contextmanager
+    def open_text(self, encoding='utf-8'):
+        with self.open_binary() as f:
+            yield io.TextIOWrapper(f, encoding=encoding, errors='ignore')
+
+    def read_lines(self, encoding='utf-8'):
+        with self.open_text(encoding) as f:
+            for line in f:
+                yield line
+
+    def read_text(self, encoding='utf-8'):
+        with self.open_text(encoding) as f:
+            return f.read()
+
+    @staticmethod
+    def from_path(file_path):
+        if isinstance(file_path, LogSource):
+            return file_path
+        return LogSource(file_path)
+
+    @staticmethod
+    def list_zip_members(zip_file_path):
+        sources = []
+        try:
+            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                for info in zip_ref.infolist():
+                    if not info.is_dir():
+                        source = LogSource(zip_file_path, info.filename)
+                        source.member_size = info.file_size
+                        source.member_crc = info.CRC
+                        sources.append(source)
+        except zipfile.BadZipFile:
+            log.error(f"错误: 文件 {zip_file_path} 不是一个有效的 ZIP 文件或已经损坏。")
+        except Exception as e:
+            log.error(f"读取ZIP文件时发生错误 {zip_file_path}: {e}")
+        return sources
+
+    @staticmethod
+    def walk(dir):
+        """
+        遍历目录下所有日志来源, .zip包展开为其中的成员
+
+        参数:
+            dir: 要遍历的目录
+
+        返回:
+            LogSource生成器
+        """
+        for root, dirs, files in os.walk(dir):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                if file.lower().endswith('.zip'):
+                    yield from LogSource.list_zip_members(file_path)
+                else:
+                    yield LogSource(file_path)
+
+
+class StreamSource(LogSource):
+    """
+    以二进制流形式到达的日志(例如边下载边解析), 内容不落盘;
+    name为原始文件名, .gz结尾时边读边解压
+    """
+    def __init__(self, name, fileobj, display_path=None, size=None):
+        super().__init__(display_path or name)
+        self.fileobj = fileobj
+        self.size = size
+        self.compressed = name.lower().endswith('.gz')
+        self.name = name[:-3] if self.compressed else name
+
+    def get_mtime(self):
+        return None
+
+    def get_size(self):
+        # 未指定大小时使用已读取的字节数
+        if self.size is not None:
+            return self.size
+        try:
+            return self.fileobj.tell()
+        except (OSError, ValueError):
+            return 0
+
+    def get_content_hash(self):
+        raise OSError(f"Stream {self.display_path} can only be read once")
+
+    @contextmanager
+    def open_binary(self):
+        if self.compressed:
+            with gzip.GzipFile(fileobj=self.fileobj) as gz:
+                yield gz
+        else:
+            yield self.fileobj
+
+    @contextmanager
+    def open_text(self, encoding='utf-8'):
+        with self.open_binary() as f:
+            yield io.TextIOWrapper(f, encoding=encoding, errors='ignore')
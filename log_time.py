@@ -0,0 +1,142 @@
+import os
+import re
+from datetime import datetime, timedelta
+from log_utils import log
+from log_source import LogSource, OUTPUT_EXTENSIONS
+from version_parser import VersionParser
+
+DAY_MS = 24 * 3600 * 1000
+EPOCH = datetime(1970, 1, 1)
+# 日志时间晚于参考时间不超过该值时仍认为属于参考时间所在的年份
+YEAR_SLACK = timedelta(days=31)
+
+#bugreport-msi-U1TZ34.2-2024-09-02-10-00-00.txt
+BUGREPORT_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:-(\d{2})-(\d{2})-(\d{2}))?")
+#== dumpstate: 2024-09-02 10:00:00
+DUMPSTATE_DATE = re.compile(r"dumpstate: (\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})")
+# 在bugreport开头查找dumpstate时间的字节数
+HEADER_SIZE = 64 * 1024
+
+
+class LogTimeDecoder():
+    """
+    logcat时间解码: 把定长的"MM-DD HH:MM:SS.mmm"转换为int64 epoch毫秒, 保留毫秒
+    日志中没有年份, 按参考时间(日志的采集时间)推断: 取不晚于参考时间(加YEAR_SLACK)的最近年份,
+    跨年(12月->1月)的日志因此保持正确顺序; 每一天的起始偏移只计算一次
+    时间为日志中的本地时间, 按UTC换算, EventStore.to_datetime()换算回来即为原始时间
+    """
+    def __init__(self, reference=None):
+        self.reference = reference or datetime.now()
+        self._day_offsets = {}
+
+    def __getstate__(self):
+        return {'reference': self.reference, '_day_offsets': {}}
+
+    def start_file(self):
+        # 每个文件重新计算日期偏移, 文件读完后_day_offsets中即为该文件出现过的日期
+        self._day_offsets = {}
+
+    def get_file_years(self):
+        """
+        返回:
+            {"MM-DD": 推断的年份}, 当前文件中出现过的日期, 与解析结果一起保存到增量解析清单
+        """
+        return {date: self.infer_year(int(date[:2]), int(date[3:5])) for date in self._day_offsets}
+
+    def matches_years(self, years):
+        # 参考时间变化后, 只有缓存中各日期推断的年份都不变时, 缓存的epoch毫秒才仍然有效
+        if years is None:
+            return False
+        return all(self.infer_year(int(date[:2]), int(date[3:5])) == year for date, year in years.items())
+
+    def infer_year(self, month, day):
+        latest = self.reference + YEAR_SLACK
+        for year in range(latest.year, latest.year - 8, -1):
+            try:
+                if datetime(year, month, day) <= latest:
+                    return year
+            except ValueError:
+                # 2月29日只属于闰年
+                continue
+        raise ValueError(f"Invalid log date {month:02d}-{day:02d}")
+
+    def get_day_offset(self, date):
+        """
+        参数:
+            date: "MM-DD"
+
+        返回:
+            该日0点的epoch毫秒
+        """
+        offset = self._day_offsets.get(date)
+        if offset is None:
+            month, day = int(date[:2]), int(date[3:5])
+            offset = (datetime(self.infer_year(month, day), month, day) - EPOCH) // timedelta(milliseconds=1)
+            self._day_offsets[date] = offset
+        return offset
+
+    @staticmethod
+    def get_clock_ms(clock):
+        # "HH:MM:SS"或"HH:MM:SS.mmm" -> 当日的毫秒数
+        millis = int(clock[9:12]) if len(clock) >= 12 and clock[8] == '.' else 0
+        return ((int(clock[:2]) * 60 + int(clock[3:5])) * 60 + int(clock[6:8])) * 1000 + millis
+
+    def decode_parts(self, date, clock):
+        """
+        参数:
+            date: "MM-DD"
+            clock: "HH:MM:SS.mmm", 毫秒可省略
+
+        返回:
+            epoch毫秒, 格式不正确时返回None
+        """
+        try:
+            return self.get_day_offset(date) + LogTimeDecoder.get_clock_ms(clock)
+        except ValueError:
+            return None
+
+    def decode(self, text, pos=0):
+        # text[pos:]以"MM-DD HH:MM:SS.mmm"开头, 例如正则匹配的起始位置
+        return self.decode_parts(text[pos:pos + 5], text[pos + 6:pos + 18])
+
+    @staticmethod
+    def to_datetime(match):
+        try:
+            return datetime(*(int(group) if group else 0 for group in match.groups()))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def find_reference(dir):
+        """
+        推断日志的采集时间: 依次使用最新bugreport文件名或开头dumpstate中的时间,
+        bugreport的修改时间, 以及目录中日志文件的最新修改时间
+        """
+        source = VersionParser.find_latest_bugreport_file(dir)
+        if source is not None:
+            match = BUGREPORT_DATE.search(source.name)
+            reference = LogTimeDecoder.to_datetime(match) if match else None
+            if reference is not None:
+                return reference, source.name
+            try:
+                with source.open_binary() as f:
+                    match = DUMPSTATE_DATE.search(f.read(HEADER_SIZE).decode('utf-8', errors='ignore'))
+                reference = LogTimeDecoder.to_datetime(match) if match else None
+                if reference is not None:
+                    return reference, f"dumpstate of {source.name}"
+            except (OSError, EOFError) as e:
+                log.warning(f"Failed to read {source.display_path}: {e}")
+            return datetime.fromtimestamp(source.get_mtime()), f"mtime of {source.name}"
+
+        mtimes = [source.get_mtime() for source in LogSource.walk(dir)
+                  if not source.name.lower().endswith(OUTPUT_EXTENSIONS)]
+        if mtimes:
+            return datetime.fromtimestamp(max(mtimes)), "mtime of log files"
+        return None, None
+
+    @staticmethod
+    def for_dir(dir):
+        reference, origin = LogTimeDecoder.find_reference(dir) if dir and os.path.isdir(dir) else (None, None)
+        decoder = LogTimeDecoder(reference)
+        log.info(f"Log time reference: {decoder.reference} ({origin or 'now'})")
+        return decoder
@@ -3,17 +3,31 @@ import re
 import fnmatch
 import pandas as pd
 import datetime
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from log_utils import log
+from log_source import LogSource
+from data_store import DataStore
+from perf import Perf
+from parse_manifest import ParseManifest
 from version_parser import VersionParser
 from typing import Dict, List, Optional, Tuple
 
-class ParseMeminfo():
-    @staticmethod
-    def read_lines(file_path):
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                yield line
+# 子进程中的apk版本信息, 由进程池initializer设置一次, 避免每个任务重复传输
+_worker_versions_dict: Dict[str, str] = {}
+
+def _init_worker(versions_dict: Dict[str, str]):
+    global _worker_versions_dict
+    _worker_versions_dict = versions_dict
 
+def _parse_one_file_in_worker(source: LogSource):
+    try:
+        return ParseMeminfo.parse_one_file(source, _worker_versions_dict)
+    except Exception as e:
+        log.error(f"Error parsing file {source.display_path}: {e}")
+        return None
+
+class ParseMeminfo():
     @staticmethod
     def get_output_excel_path(dir):
         keyword = os.path.basename(dir)
@@ -21,15 +35,17 @@ class ParseMeminfo():
         return file_path
 
     @staticmethod
-    def parse_one_file(file_path: str, versions_dict: Dict[str, str]):
-        file_name = os.path.basename(file_path)
+    def parse_one_file(file_path, versions_dict: Dict[str, str]):
+        # file_path可以是文件路径, 也可以是.gz/.zip中的LogSource
+        source = LogSource.from_path(file_path)
+        file_name = source.name
         # 匹配日期时间部分
         match = re.search(r'[-_](\d{4}[-_]\d{2}[-_]\d{2}(?:[-_]\d{2})?(?:[-_]\d{2})?(?:[-_]\d{2})?)\.txt$', file_name)
         if match:
             datetime_str = match.group(1).replace('-', '_')
             data = {'date_time':datetime_str}
         else:
-            log.warning(f"No date time found in file name: {file_path}")
+            log.warning(f"No date time found in file name: {source.display_path}")
             return None
 
         PATTERN_PSS_OOM = r"(.+)K: (.+)"
@@ -41,7 +57,7 @@ class ParseMeminfo():
                              'Tuning: '                     : None}
 
         pattern = None
-        for line in ParseMeminfo.read_lines(file_path):
+        for line in source.read_lines():
             for keyword, pattern_info in keyword_pattern.items():
                 if keyword in line:
                     pattern = pattern_info
@@ -64,41 +80,97 @@ class ParseMeminfo():
                             data[name] = size_kb
         
         if len(data) <= 1:
-            log.info(f"No match found in the file: {file_path}")
+            log.info(f"No match found in the file: {source.display_path}")
             return None
 
         return data
 
     @staticmethod
-    def parse_all_files(dir):
-        versions_dict = VersionParser.parse_apk_versions_from_latest_bugreport(dir)
+    def find_all_files(dir) -> List[LogSource]:
+        # LogSource.walk按固定顺序遍历, 保证串行和并行模式下合并结果一致
+        source_list = []
+        key_list = ['meminfo']
+        for source in LogSource.walk(dir):
+            for key in key_list:
+                if fnmatch.fnmatch(source.name, f'*{key}*.txt'):
+                    source_list.append(source)
+                    break
+        return source_list
+
+    @staticmethod
+    def parse_files_serial(source_list: List[LogSource], versions_dict: Dict[str, str]) -> List[Optional[dict]]:
+        data_list = []
+        for source in source_list:
+            try:
+                data_list.append(ParseMeminfo.parse_one_file(source, versions_dict))
+            except Exception as e:
+                log.error(f"Error parsing file {source.display_path}: {e}")
+                data_list.append(None)
+        return data_list
+
+    @staticmethod
+    def parse_files_parallel(source_list: List[LogSource], versions_dict: Dict[str, str], jobs: int) -> List[Optional[dict]]:
+        # 每个meminfo快照相互独立, 分发到进程池解析; map保证结果顺序与文件顺序一致
+        chunksize = max(1, len(source_list) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(versions_dict,)) as executor:
+            return list(executor.map(_parse_one_file_in_worker, source_list, chunksize=chunksize))
+
+    @staticmethod
+    def get_cache_key(versions_dict: Dict[str, str]):
+        # 进程名中带有apk版本, 版本信息变化时缓存失效
+        digest = hashlib.sha1(repr(sorted(versions_dict.items())).encode('utf-8')).hexdigest()
+        return f"meminfo:{digest[:12]}"
+
+    @staticmethod
+    def parse_all_files(dir, jobs=1, manifest: ParseManifest = None):
+        versions_dict = VersionParser.parse_apk_versions_from_latest_bugreport(dir, manifest=manifest)
         if not versions_dict:
             log.warning(f"No apk versions found in directory {dir}")
         try:
-            data_list_all = []
-            key_list = ['meminfo']
-            for path, dir_lst, file_lst in os.walk(dir):
-                for key in key_list:
-                    for file in fnmatch.filter(file_lst, f'*{key}*.txt'):
-                        file_path = os.path.join(path, file)
-                        try:
-                            data = ParseMeminfo.parse_one_file(file_path, versions_dict)
-                            if data:
-                                data_list_all.append(data)
-
-                        except Exception as e:
-                            log.error(f"Error parsing file {file_path}: {e}")
+            source_list = ParseMeminfo.find_all_files(dir)
+            results = [None] * len(source_list)
+
+            # 增量模式下只解析新增或变化的文件
+            cache_key = ParseMeminfo.get_cache_key(versions_dict)
+            pending_index = []
+            for index, source in enumerate(source_list):
+                rows = manifest.lookup(source, cache_key) if manifest is not None else None
+                if rows is None:
+                    pending_index.append(index)
+                elif rows:
+                    results[index] = rows[0]
+            pending_list = [source_list[index] for index in pending_index]
+            if manifest is not None:
+                log.info(f"{len(source_list) - len(pending_list)} meminfo files cached, {len(pending_list)} to parse")
+
+            with Perf.stage('parse_files'):
+                if jobs > 1 and len(pending_list) > 1:
+                    log.info(f"Parsing {len(pending_list)} meminfo files with {jobs} processes")
+                    parsed = ParseMeminfo.parse_files_parallel(pending_list, versions_dict, jobs)
+                else:
+                    parsed = ParseMeminfo.parse_files_serial(pending_list, versions_dict)
+            Perf.count('files_read', len(pending_list))
+            Perf.count('files_cached', len(source_list) - len(pending_list))
+            Perf.count('bytes_read', sum(source.get_size() for source in pending_list))
+
+            for index, data in zip(pending_index, parsed):
+                results[index] = data
+                if manifest is not None:
+                    manifest.store(source_list[index], cache_key, [data] if data else [])
+            data_list_all = [data for data in results if data]
 
             excel_path = ParseMeminfo.get_output_excel_path(dir)
+            df_result = None
             if data_list_all:
-                df_all = (pd.DataFrame(data_list_all)).drop_duplicates()
+                with Perf.stage('dataframe'):
+                    df_all = (pd.DataFrame(data_list_all)).drop_duplicates()
+                Perf.count('rows', len(df_all))
                 columns = list(df_all.columns)
                 native_index = columns.index('Native')
                 system_index = columns.index('System')
                 
                 columns_to_sort = df_all.columns[(native_index + 1): (system_index -1)]
 
-                print(f"columns_to_sort: {columns_to_sort}")
                 # 按每列的最大值排序
                 sorted_columns = sorted(columns_to_sort, key=lambda col: df_all[col].max(), reverse=False)
                 
@@ -106,24 +178,23 @@ class ParseMeminfo():
                 for col in sorted_columns:
                     columns.insert(native_index + 1, columns.pop(columns.index(col)))
                 
-                df_reindex = df_all.reindex(columns=columns)
+                df_reindex = df_all.reindex(columns=columns).reset_index(drop=True)
                 
                 df_reindex['date_time'] = pd.to_datetime(df_reindex['date_time'], format='%Y_%m_%d_%H_%M_%S', errors='coerce')
                 if not df_reindex.empty:
-                    df_reindex.to_excel(excel_path, index=False)
+                    DataStore.save(df_reindex, excel_path)
+                    df_result = df_reindex
                 else:
                     log.warning("All data entries were duplicates.")
             else:
                 log.info("Not found any valuable meminfo! Please check if meminfo logs exists or not.")
-                excel_path = None
         except Exception as e:
             log.error(f"Error processing files in directory {dir}: {e}")
-            excel_path = None
+            df_result = None
 
-        return excel_path
+        return df_result
 
 
 if __name__ == '__main__':
     dir=os.getcwd()
-    output_excel_path = ParseMeminfo.get_output_excel_path(dir)
     ParseMeminfo.parse_all_files(dir)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os
+import pickle
+from log_utils import log
+from log_source import LogSource
+from version import __version__
+
+
+class ParseManifest():
+    """
+    增量解析清单, 保存在输出目录中
+    记录每个输入文件的路径, 大小, 修改时间, 内容哈希以及各提取器从中提取出的行;
+    再次运行时只解析新增或变化的文件, 其余文件直接复用缓存的行
+    """
+    def __init__(self, dir, name):
+        self.dir = dir
+        self.path = os.path.join(dir, f"ramut_manifest_{name}.pkl")
+        self.entries = {}
+        self.seen = set()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._hashes = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                manifest = pickle.load(f)
+            # 工具版本变化后解析逻辑可能不同, 丢弃旧缓存
+            if manifest.get('version') == __version__:
+                self.entries = manifest.get('entries', {})
+            else:
+                log.info(f"Manifest {self.path} was built by version {manifest.get('version')}, ignored.")
+        except Exception as e:
+            log.warning(f"Failed to load manifest {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        # 删除本次运行中已不存在的输入文件
+        for path in list(self.entries):
+            if path not in self.seen:
+                del self.entries[path]
+                self.dirty = True
+        log.info(f"Manifest {self.path}: {self.hits} cached, {self.misses} parsed")
+        if not self.dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': __version__, 'entries': self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        log.info(f"Manifest saved, {len(self.entries)} files recorded")
+
+    def get_key(self, source: LogSource):
+        # 使用相对路径, 目录被移动或以不同方式指定时缓存仍然有效
+        return os.path.relpath(source.display_path, self.dir)
+
+    def get_content_hash(self, source: LogSource):
+        key = self.get_key(source)
+        if key not in self._hashes:
+            self._hashes[key] = source.get_content_hash()
+        return self._hashes[key]
+
+    def get_valid_entry(self, source: LogSource):
+        """
+        返回与当前文件内容一致的清单条目; 大小和修改时间不变时直接认为未变化,
+        否则比较内容哈希(例如文件被复制或touch过)
+        """
+        key = self.get_key(source)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        size, mtime = source.get_size(), source.get_mtime()
+        if entry['size'] == size and entry['mtime'] == mtime:
+            return entry
+        # 没有记录哈希(例如在子进程中解析)时无法确认内容未变, 重新解析
+        if entry['size'] != size or entry['hash'] is None:
+            return None
+        if entry['hash'] != self.get_content_hash(source):
+            return None
+        entry['mtime'] = mtime
+        self.dirty = True
+        return entry
+
+    def lookup(self, source: LogSource, key, check_years=None):
+        """
+        参数:
+            check_years: 可选, 接收store()时记录的years, 返回缓存的行是否仍然有效
+        """
+        entry = self.get_valid_entry(source)
+        rows = entry['rows'].get(key) if entry else None
+        if rows is not None and check_years is not None and not check_years(entry.get('years', {}).get(key)):
+            rows = None
+        if rows is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rows
+
+    def store(self, source: LogSource, key, rows, years=None):
+        entry = self.get_valid_entry(source)
+        if entry is None:
+            entry = {
+                'path': source.display_path,
+                'size': source.get_size(),
+                'mtime': source.get_mtime(),
+                # 使用扫描时顺带计算的哈希, 不为此再读一遍文件
+                'hash': self._hashes.get(self.get_key(source)) or source.get_known_hash(),
+                'rows': {},
+            }
+            self.entries[self.get_key(source)] = entry
+        entry['rows'][key] = rows
+        if years is not None:
+            # 行中的时间依赖推断的年份, {"MM-DD": 年份}
+            entry.setdefault('years', {})[key] = years
+        self.dirty = True
@@ -0,0 +1,118 @@
+import io
+import os
+import json
+import time
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from log_utils import log
+from version import __version__
+
+BYTES_PER_MB = 1024 * 1024
+
+
+class Perf():
+    """
+    运行过程的性能统计: 各阶段耗时, 计数器(读取的字节数/行数, 匹配数, 输出行数)
+    以及tracemalloc内存峰值(仅在tracemalloc开启时, 由ramut.py的--profile开启)
+    统计按当前分析部分(section)分组, 结束时写入*_perf.json
+    """
+    section = None
+    stages = {}
+    counters = {}
+    sections = {}
+
+    @staticmethod
+    def reset():
+        Perf.section = None
+        Perf.stages = {}
+        Perf.counters = {}
+        Perf.sections = {}
+
+    @staticmethod
+    def get_key(name):
+        return f"{Perf.section}/{name}" if Perf.section else name
+
+    @staticmethod
+    def add_time(name, seconds):
+        stage = Perf.stages.setdefault(Perf.get_key(name), {'seconds': 0.0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+
+    @staticmethod
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Perf.add_time(name, time.perf_counter() - start)
+
+    @staticmethod
+    def count(name, value=1):
+        key = Perf.get_key(name)
+        Perf.counters[key] = Perf.counters.get(key, 0) + value
+
+    @staticmethod
+    @contextmanager
+    def track_section(name):
+        """
+        统计一个分析部分的总耗时和内存峰值, 其中的stage和count都归入该部分
+        """
+        previous = Perf.section
+        Perf.section = name
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            section = {'seconds': time.perf_counter() - start}
+            if tracemalloc.is_tracing():
+                section['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / BYTES_PER_MB
+            Perf.sections[name] = section
+            Perf.section = previous
+
+    @staticmethod
+    def snapshot():
+        return {'stages': Perf.stages, 'counters': Perf.counters, 'sections': Perf.sections}
+
+    @staticmethod
+    def merge(snapshot):
+        # 合并子进程中统计的结果
+        for key, stage in snapshot['stages'].items():
+            merged = Perf.stages.setdefault(key, {'seconds': 0.0, 'calls': 0})
+            merged['seconds'] += stage['seconds']
+            merged['calls'] += stage['calls']
+        for key, value in snapshot['counters'].items():
+            Perf.counters[key] = Perf.counters.get(key, 0) + value
+        Perf.sections.update(snapshot['sections'])
+
+    @staticmethod
+    def save(path, total_seconds=None):
+        result = {'version': __version__, 'total_seconds': total_seconds}
+        result.update(Perf.snapshot())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        log.info(f"Performance data saved to {path}")
+
+    @staticmethod
+    def save_profile(profiler, path, extra_paths=(), top=50):
+        """
+        保存cProfile统计(可用snakeviz等工具查看)以及按累计耗时排序的文本摘要
+
+        参数:
+            profiler: 主进程的cProfile.Profile
+            path: 输出路径
+            extra_paths: 子进程保存的统计文件, 合并后删除
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        for extra_path in extra_paths:
+            stats.add(extra_path)
+            os.remove(extra_path)
+        stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(top)
+        with open(path + '.txt', 'w', encoding='utf-8') as f:
+            f.write(stream.getvalue())
+        log.info(f"Profile saved to {path}")
@@ -2,7 +2,33 @@ import os
 import re
 import pandas as pd
 from log_utils import log
+from data_store import DataStore
 from show import Show
+from log_scanner import LogExtractor, LogScanner
+from perf import Perf
+from event_store import EventStore
+from column_builder import ColumnBuilder
+
+class PssExtractor(LogExtractor):
+    file_keywords = ('Stream-e', 'event', 'logcat')
+    cache_key = 'pss:v3'
+
+    pattern = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+am_pss  : \[(\d+),(\d+),([^,]+),(\d+),\d+,\d+,(\d+)")
+
+    def __init__(self):
+        self.data_list = ColumnBuilder([('datetime', 'int'), ('pid', 'int'), ('uid', 'int'),
+                                        ('package', 'category'), ('pss', 'int')])
+
+    def rules(self):
+        return [('am_pss', self.pattern, self.on_pss)]
+
+    def on_pss(self, match):
+        time = self.get_time(match)
+        if time is None:
+            return
+        pss = int(match.group(5))
+        self.data_list.append(time, int(match.group(2)), int(match.group(3)), match.group(4),
+                              pss//1024 if pss > 0 else int(match.group(6))//1024)
 
 class PssParser():
     @staticmethod
@@ -18,36 +44,22 @@ class PssParser():
                 yield line
 
     @staticmethod
-    def parse_pss_data(dir: str):
-            data = []
-            pattern = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+am_pss  : \[(\d+),(\d+),([^,]+),(\d+),\d+,\d+,(\d+)")
-
-            for root, dirs, files in os.walk(dir):
-                for file in files:
-                    if 'Stream-e' in file or "event" in file or 'logcat' in file:
-                        file_path = os.path.join(root, file)
-                        #log.info(f"Parsing {file_path}")
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            for line in PssParser.read_lines(file_path):
-                                match = pattern.search(line)
-                                if match:
-                                    data.append({
-                                        'datetime' : match.group(1),
-                                        'pid': int(match.group(2)),
-                                        'uid': int(match.group(3)),
-                                        'package': match.group(4),
-                                        'pss': int(match.group(5))//1024 if int(match.group(5)) > 0 else int(match.group(6))//1024,
-                                    })
-
-            df = pd.DataFrame(data)
+    def parse_pss_data(dir: str, extractor=None):
+            if extractor is None:
+                extractor = LogScanner.scan_with(dir, PssExtractor())
+            with Perf.stage('dataframe'):
+                df = extractor.data_list.to_frame()
+            Perf.count('rows', len(df))
             log.info(f"df = {df}")
             if df.empty:
                 log.warning("Not found any PSS data.")
                 return None
             
-            # 确保'datetime'列为日期时间格式
-            df['datetime'] = pd.to_datetime(df['datetime'], format='%m-%d %H:%M:%S')
+            # epoch毫秒转换为日期时间格式
+            df['datetime'] = EventStore.to_datetime(df['datetime'])
             df = df.sort_values('datetime')  # 按时间升序排序
+            EventStore.write(dir, 'pss', EventStore.build('pss', df['datetime'], df['package'], pid=df['pid'],
+                                                          uid=df['uid'], pss=df['pss']))
             # new_df = df.pivot(columns='package', values='pss')
     
             # # 使用apply方法并行处理每一列，去除空值并填充到最长长度
@@ -58,16 +70,16 @@ class PssParser():
 
             excel_path = PssParser.get_output_excel_path(dir)
             if not df.empty:
-                df.to_excel(excel_path, index=False)
-                return excel_path
+                DataStore.save(df, excel_path)
+                return df
             else:
                 log.warning("Not found any PSS data.")
                 return None
 
 if __name__ == "__main__":
     folder_path = "D:/github/ramct/downloads/NZ4C240007"
-    PssParser.parse_pss_data(folder_path)
-    excel_path = PssParser.get_output_excel_path(folder_path)
-    if excel_path:
+    df = PssParser.parse_pss_data(folder_path)
+    if df is not None:
         Show.draw_initial_report(folder_path, 'Test')
-        Show.draw_pss_report(folder_path, excel_path)
\ No newline at end of file
+        Show.draw_pss_report(folder_path, df)
+        Show.finish_report(folder_path)
\ No newline at end of file
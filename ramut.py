@@ -1,52 +1,47 @@
 import getopt
 import os, sys
 import traceback
-import gzip
+import pandas as pd
 import time
-import zipfile
+import cProfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 from mi_parser import ParseMeminfo
 from show import Show
 from analysis import Analysis
-from killinfo_parser import KillinfoParser
-from launchinfo_parser import LaunchInfoParser
-from pss_parser import PssParser
-from cpu_parser import CpuParser
+from killinfo_parser import KillinfoParser, KillCategoriesExtractor
+from launchinfo_parser import LaunchInfoParser, LaunchInfoExtractor
+from pss_parser import PssParser, PssExtractor
+from cpu_parser import CpuParser, CpuExtractor
+from log_scanner import LogScanner
+from event_store import EventStore
+from log_source import LogSource
+from parse_manifest import ParseManifest
 from log_utils import log
+from data_store import DataStore
+from downsampler import Downsampler
+from perf import Perf
 from version import __version__
 
 SPLIT_LINE = "################################"
-
-def unzip_all_gz_files(directory):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.gz'):
-                gz_file_path = os.path.join(root, file)
-                output_file_path = os.path.join(root, file[:-3])  # Remove the '.gz' extension
-                
-                with gzip.open(gz_file_path, 'rb') as f_in:
-                    with open(output_file_path, 'wb') as f_out:
-                        f_out.write(f_in.read())
-                
-                print(f"unziped: {gz_file_path} -> {output_file_path}")
-                # 删除原文件
-                os.remove(gz_file_path)
-                
-            if file.endswith('.zip'):
-                zip_file_path = os.path.join(root, file)
-                
-                try:
-                    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                        zip_ref.extractall(root)
-
-                    print(f"解压: {zip_file_path} -> {root}")
-                    # 删除原文件
-                    os.remove(zip_file_path)
-                except zipfile.BadZipFile:
-                    print(f"错误: 文件 {zip_file_path} 不是一个有效的 ZIP 文件或已经损坏。")
-                except Exception as e:
-                    print(f"解压文件时发生错误 {zip_file_path}: {e}")
-
+# 批量模式下, 子目录中有文件名包含这些关键字的日志时才视为设备目录
+DEVICE_LOG_KEYWORDS = ('Stream-', 'meminfo', 'bugreport', 'log_')
+# 当前设备各分析部分的汇总指标, 用于批量模式的汇总表
+device_summary = {}
+# 命令行参数的默认值, 其他工具调用run_device时也以此为基础
+DEFAULT_SETTINGS = {
+    'ref_cov': 0.25,
+    'ref_diff': 80000,
+    'jobs': 1,
+    'incremental': True,
+    'export_excel': False,
+    'rank_by_slope': False,
+    'max_points': Downsampler.max_points,
+    'profile': False,
+    'concurrent': False,
+}
 
 def read_version_file(dir_path):
     """
@@ -60,13 +55,11 @@ def read_version_file(dir_path):
     """
     version_content = None
     
-    # 遍历目录
-    for root, dirs, files in os.walk(dir_path):
-        if 'version.txt' in files:
-            version_path = os.path.join(root, 'version.txt')
+    # 遍历目录, 包括.gz和.zip中的version.txt
+    for source in LogSource.walk(dir_path):
+        if source.name == 'version.txt':
             try:
-                with open(version_path, 'r', encoding='utf-8') as f:
-                    version_content = f.read().strip()
+                version_content = source.read_text().strip()
                 break  # 找到文件后停止搜索
             except IOError as e:
                 print(f"无法读取version.txt文件: {e}")
@@ -74,34 +67,284 @@ def read_version_file(dir_path):
     
     return version_content
 
-def analyze_data(parser, analysis_func, show_func, data_type):
+def analyze_data(parser, analysis_func, show_func, data_type, summary_func=None):
     log.info(SPLIT_LINE)
     log.info(f"Beginning of {data_type} Analysis....")
     log.info(SPLIT_LINE)
     start_second = time.time()
     try:
-        excel_path = parser(dir)
-        if excel_path:
-            analysis_func(dir, excel_path, ref_cov, ref_diff)
-            show_func(dir, excel_path)
-        else:
-            log.warning(f"NOT FOUND ANY {data_type.upper()} INFO DATA!!!")
+        # 解析结果直接在内存中传递给分析和绘图, 不再从Excel读回
+        with Perf.track_section(data_type):
+            with Perf.stage('parse'):
+                df = parser(dir)
+            if df is not None:
+                with Perf.stage('analysis'):
+                    result = analysis_func(dir, df, ref_cov, ref_diff)
+                with Perf.stage('show'):
+                    show_func(dir, df)
+                if summary_func is not None:
+                    device_summary.update(summary_func(df, result))
+            else:
+                log.warning(f"NOT FOUND ANY {data_type.upper()} INFO DATA!!!")
     except Exception as e:
         log.error(f"Error during {data_type} analysis: {e}")
         log.error(traceback.format_exc())
     
     end_second = time.time()
     log.info(f"End of {data_type} Analysis. duration: {end_second - start_second} seconds.")
+    return end_second - start_second
+
+def skip_analysis(*args):
+    pass
+
+def summarize_ram(df, abnormal_data_list):
+    return {'meminfo_snapshots': len(df), 'abnormal_processes': len(abnormal_data_list or [])}
+
+def summarize_kills(df, result):
+    return {'kills_per_day': df['total_kills'].mean(), 'heavy_kills_per_day': df['heavy_kill'].mean()}
+
+def summarize_launches(df, result):
+    total = df['total_count'].sum()
+    return {'launches': total, 'wp_ratio': df['wp_count'].sum() / total if total else None}
+
+def summarize_cpu(df, result):
+    total = df[df['process'] == 'total']['percent']
+    return {'cpu_total_mean': total.mean() if not total.empty else None}
+
+def summarize_pss(df, result):
+    peak = df.loc[df['pss'].idxmax()]
+    return {'peak_pss_mb': peak['pss'] / 1024, 'peak_pss_package': peak['package']}
+
+def get_settings():
+    # 子进程中没有__main__里设置的全局变量, 需要显式传递
+    return {
+        'dir': dir,
+        'ref_cov': ref_cov,
+        'ref_diff': ref_diff,
+        'jobs': jobs,
+        'incremental': incremental,
+        'export_excel': DataStore.export_excel,
+        'rank_by_slope': Analysis.rank_by_slope,
+        'max_points': Downsampler.max_points,
+        'profile': profile,
+        'concurrent': concurrent,
+    }
+
+def init_section_worker(settings):
+    global dir, ref_cov, ref_diff, jobs, incremental, profile, concurrent
+    dir = settings['dir']
+    ref_cov = settings['ref_cov']
+    ref_diff = settings['ref_diff']
+    jobs = settings['jobs']
+    incremental = settings['incremental']
+    DataStore.export_excel = settings['export_excel']
+    Analysis.rank_by_slope = settings['rank_by_slope']
+    Downsampler.max_points = settings['max_points']
+    profile = settings['profile']
+    concurrent = settings['concurrent']
+    if profile and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def run_section(part, parser, analysis_func, show_func, data_type, summary_func=None):
+    # 在子进程中执行一个分析部分, 报告内容写入第part个分片, 性能统计和汇总指标随结果返回
+    Show.report_part = part
+    Perf.reset()
+    device_summary.clear()
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    duration = analyze_data(parser, analysis_func, show_func, data_type, summary_func)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(Show.get_perf_path(dir, f'.part{part}.prof'))
+    return data_type, duration, Perf.snapshot(), dict(device_summary)
+
+def get_log_sections(kill_extractor, launch_extractor, cpu_extractor, pss_extractor):
+    # 基于日志扫描结果的分析部分, 顺序即报告中的顺序
+    return [
+        (partial(KillinfoParser.parse_kill_categories, extractor=kill_extractor), skip_analysis, Show.draw_killing, "Kill infos", summarize_kills),
+        #(KillinfoParser.parse_process_die_info, skip_analysis, Show.draw_killing, "Die infos"),
+        (partial(LaunchInfoParser.parse_launchinfo, extractor=launch_extractor), skip_analysis, Show.draw_launch_info, "Launch infos", summarize_launches),
+        (partial(CpuParser.parse_cpu_data, extractor=cpu_extractor), skip_analysis, Show.draw_cpu_report, "CPU Usage", summarize_cpu),
+        (partial(PssParser.parse_pss_data, extractor=pss_extractor), skip_analysis, Show.draw_pss_report, "Pss of process", summarize_pss),
+    ]
+
+def run_concurrently(ram_section, scanner, log_sections, log_feed=None):
+    """
+    并发执行各分析部分: 内存部分在子进程中与日志扫描同时进行,
+    扫描结束后其余部分各占一个子进程; 报告分片最后按原顺序合并
+    """
+    with ProcessPoolExecutor(max_workers=1 + len(log_sections), initializer=init_section_worker,
+                             initargs=(get_settings(),)) as executor:
+        futures = [executor.submit(run_section, 0, *ram_section)]
+        scan_logs(scanner, log_feed)
+        for part, section in enumerate(log_sections, 1):
+            futures.append(executor.submit(run_section, part, *section))
+        durations = []
+        for future in futures:
+            try:
+                data_type, duration, snapshot, summary = future.result()
+                durations.append((data_type, duration))
+                Perf.merge(snapshot)
+                device_summary.update(summary)
+            except Exception as e:
+                log.error(f"Error in analysis worker: {e}")
+                log.error(traceback.format_exc())
+
+    Show.assemble_report(dir, len(futures))
+    for data_type, duration in durations:
+        log.info(f"{data_type} Analysis duration: {duration} seconds.")
+
+def parse_meminfo(dir):
+    manifest = ParseManifest(dir, 'meminfo') if incremental else None
+    df = ParseMeminfo.parse_all_files(dir, jobs, manifest)
+    if manifest is not None:
+        manifest.save()
+    return df
+
+def scan_logs(scanner, log_feed=None):
+    # 所有基于logcat的解析器共用一次日志扫描, 每个文件只读取一次
+    # log_feed不为空时由它把日志流(例如下载中的文件)交给scanner, 不再扫描目录
+    log.info(SPLIT_LINE)
+    log.info(f"Beginning of Log Scan for {len(scanner.extractors)} extractors....")
+    log.info(SPLIT_LINE)
+    start_second = time.time()
+    try:
+        with Perf.track_section('Log Scan'):
+            if log_feed is not None:
+                log_feed(scanner)
+                scanner.finish()
+            else:
+                manifest = ParseManifest(dir, 'logs') if incremental else None
+                scanner.scan(dir, manifest)
+                if manifest is not None:
+                    manifest.save()
+    except Exception as e:
+        log.error(f"Error during log scan: {e}")
+        log.error(traceback.format_exc())
+
+    end_second = time.time()
+    log.info(f"End of Log Scan. duration: {end_second - start_second} seconds.")
+
+def run_pipeline(log_feed=None):
+    """
+    对全局变量dir指定的设备目录运行完整的解析, 分析和报告流程
+
+    参数:
+        log_feed: 可选, 接收LogScanner并向其输入日志流的函数, 见scan_logs
+
+    返回:
+        该设备的汇总指标
+    """
+    device_summary.clear()
+    run_start_second = time.time()
+    profiler = None
+    if profile:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    sw_version = read_version_file(dir)
+    report_titile = (f"RamUT Report for {dir}\n"
+                   f"build version:{sw_version}\n"
+                   f"tool version:{__version__}")
+
+    Show.draw_initial_report(dir, report_titile)
+    EventStore.clear(dir)
+
+    ram_section = (parse_meminfo, Analysis.analyze, Show.draw_ram_trend, "Ram Usage", summarize_ram)
+    scanner = LogScanner()
+    log_sections = get_log_sections(scanner.register(KillCategoriesExtractor()),
+                                    scanner.register(LaunchInfoExtractor()),
+                                    scanner.register(CpuExtractor()),
+                                    scanner.register(PssExtractor()))
+
+    if concurrent:
+        run_concurrently(ram_section, scanner, log_sections, log_feed)
+    else:
+        # Ram Consumption Analysis
+        analyze_data(*ram_section)
+        scan_logs(scanner, log_feed)
+        # Kill infos, Launch infos, CPU, Pss of process Analysis
+        for section in log_sections:
+            analyze_data(*section)
+    # 各解析器写入的事件流汇总到同一时间轴
+    analyze_data(EventStore.load, skip_analysis, Show.draw_event_timeline, "Event Timeline")
+    Show.finish_report(dir)
+
+    if profiler is not None:
+        profiler.disable()
+        # 并发模式下合并各子进程的统计
+        part_paths = [Show.get_perf_path(dir, f'.part{part}.prof') for part in range(1 + len(log_sections))]
+        Perf.save_profile(profiler, Show.get_perf_path(dir, '.prof'), [path for path in part_paths if os.path.exists(path)])
+    Perf.save(Show.get_perf_path(dir, '_perf.json'), time.time() - run_start_second)
+    return dict(device_summary)
+
+def find_device_dirs(root):
+    # 批量模式: 根目录下包含日志的每个子目录对应一台设备
+    device_dirs = []
+    for item in sorted(os.listdir(root)):
+        item_path = os.path.join(root, item)
+        if not os.path.isdir(item_path):
+            continue
+        if any(keyword in source.name for source in LogSource.walk(item_path) for keyword in DEVICE_LOG_KEYWORDS):
+            device_dirs.append(item_path)
+    return device_dirs
+
+def run_device(settings, log_feed=None):
+    # 处理一台设备(批量模式的子进程或tools/pull_log.py的流式解析), 返回汇总表中的一行
+    init_section_worker(settings)
+    Perf.reset()
+    Show.report_part = None
+    start_second = time.time()
+    summary = {'device': os.path.basename(dir)}
+    try:
+        summary.update(run_pipeline(log_feed))
+    except Exception as e:
+        log.error(f"Error processing device {dir}: {e}")
+        log.error(traceback.format_exc())
+        summary['error'] = str(e)
+    summary['duration'] = time.time() - start_second
+    return summary
+
+def run_batch(root, batch_jobs):
+    """
+    批量模式: 在有限大小的进程池中对每个设备目录运行完整流程,
+    并把各设备的汇总指标写入根目录下的一张汇总表
+    """
+    device_dirs = find_device_dirs(root)
+    log.info(f"Batch mode: {len(device_dirs)} device directories in {root}, {batch_jobs} workers")
+    settings = get_settings()
+    settings_list = [dict(settings, dir=device_dir) for device_dir in device_dirs]
+    with ProcessPoolExecutor(max_workers=batch_jobs) as executor:
+        summaries = list(executor.map(run_device, settings_list))
+
+    if not summaries:
+        log.warning(f"No device directories found in {root}")
+        return
+    df_summary = pd.DataFrame(summaries)
+    log.info(f"Batch summary:\n{df_summary}")
+    DataStore.save(df_summary, os.path.join(root, 'RamUT_Batch_Summary.xlsx'))
+    Show.draw_initial_report(root, f"RamUT Batch Summary for {root}\ntool version:{__version__}")
+    Show.draw_batch_summary(root, df_summary)
+    Show.finish_report(root)
 
 if __name__ == '__main__':
     argv = sys.argv[1:]
     dir=os.getcwd()
-    ref_cov = 0.25
-    ref_diff = 80000
+    ref_cov = DEFAULT_SETTINGS['ref_cov']
+    ref_diff = DEFAULT_SETTINGS['ref_diff']
+    jobs = DEFAULT_SETTINGS['jobs']
+    incremental = DEFAULT_SETTINGS['incremental']
+    concurrent = DEFAULT_SETTINGS['concurrent']
+    profile = DEFAULT_SETTINGS['profile']
+    batch_root = None
+    batch_jobs = 2
  
     log.info(f"RamUT version:{__version__}")
     try:
-        opts, args = getopt.getopt(argv, "p:c:d:")  # 短选项模式
+        opts, args = getopt.getopt(argv, "p:c:d:j:n:b:w:xrsm", ["profile"])  # 短选项模式
     except getopt.GetoptError:
         log.info("Error in get option")
         sys.exit(1)
@@ -122,28 +365,45 @@ if __name__ == '__main__':
             except ValueError:
                 log.info("Error: -d option requires an integer value")
                 sys.exit(1)
+        if opt in ['-r']:
+            # 忽略增量解析清单, 重新解析全部文件
+            incremental = False
+        if opt in ['-x']:
+            DataStore.export_excel = True
+        if opt in ['--profile']:
+            # 额外输出cProfile统计并开启tracemalloc内存峰值统计
+            profile = True
+        if opt in ['-m']:
+            # 各分析部分在多个进程中并发执行
+            concurrent = True
+        if opt in ['-s']:
+            # 疑似泄漏的进程按增长斜率排序
+            Analysis.rank_by_slope = True
+        if opt in ['-n']:
+            # 报告中每条曲线的最大点数, 0表示不降采样
+            try:
+                Downsampler.max_points = max(0, int(opt_value))
+            except ValueError:
+                log.info("Error: -n option requires an integer value")
+                sys.exit(1)
+        if opt in ['-b']:
+            # 批量模式, 参数为包含多个设备目录的根目录
+            batch_root = opt_value
+        if opt in ['-w']:
+            try:
+                batch_jobs = max(1, int(opt_value))
+            except ValueError:
+                log.info("Error: -w option requires an integer value")
+                sys.exit(1)
+        if opt in ['-j']:
+            try:
+                jobs = max(1, int(opt_value))
+            except ValueError:
+                log.info("Error: -j option requires an integer value")
+                sys.exit(1)
 
-    unzip_all_gz_files(dir)
-    sw_version = read_version_file(dir)
-    report_titile = (f"RamUT Report for {dir}\n"
-                   f"build version:{sw_version}\n"
-                   f"tool version:{__version__}")
-
-    Show.draw_initial_report(dir, report_titile)
-
-    # Ram Consumption Analysis
-    analyze_data(ParseMeminfo.parse_all_files, Analysis.analyze, Show.draw_ram_trend, "Ram Usage")
-    
-    # Kill infos Analysis
-    analyze_data(KillinfoParser.parse_kill_categories, lambda *args: None, Show.draw_killing, "Kill infos")
-    #analyze_data(KillinfoParser.parse_process_die_info, lambda *args: None, Show.draw_killing, "Die infos")
-    
-    # Launch infos Analysis
-    analyze_data(LaunchInfoParser.parse_launchinfo, lambda *args: None, Show.draw_launch_info, "Launch infos")
-    
-    # CPU Analysis
-    analyze_data(CpuParser.parse_cpu_data, lambda *args: None, Show.draw_cpu_report, "CPU Usage")
-
-    # Pss of process Analysis
-    analyze_data(PssParser.parse_pss_data, lambda *args: None, Show.draw_pss_report, "Pss of process")
-    log.info("Finished.")
\ No newline at end of file
+    if batch_root is not None:
+        run_batch(batch_root, batch_jobs)
+    else:
+        run_pipeline()
+    log.info("Finished.")
@@ -0,0 +1,159 @@
+import os
+import json
+import uuid
+import base64
+import hashlib
+import numpy as np
+import mpld3
+import mpld3.urls
+from mpld3._display import NumpyEncoder
+from plotly.offline import get_plotlyjs
+from log_utils import log
+from perf import Perf
+
+# 报告中的图表片段: 占位div + 图表数据, 由报告末尾的启动脚本统一绘制
+CHART_TEMPLATE = '<div class="ramut-chart" id="{0}"></div>\n<script type="application/json" data-chart="{0}" data-kind="{1}">{2}</script>\n'
+
+# 解码列式数据并绘制所有图表
+BOOTSTRAP_JS = """
+(function () {
+    function decodeColumn(column) {
+        var binary = atob(column.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return column.dtype === 'f4' ? new Float32Array(bytes.buffer) : new Float64Array(bytes.buffer);
+    }
+    function decodeMpld3(spec) {
+        // mpld3需要按行组织的数组, 由共享的列重新组装
+        var columns = spec.columns.map(decodeColumn);
+        Object.keys(spec.data).forEach(function (key) {
+            var ref = spec.data[key];
+            var rows = new Array(ref.length);
+            for (var r = 0; r < ref.length; r++) {
+                rows[r] = ref.columns.map(function (index) { return columns[index][r]; });
+            }
+            spec.data[key] = rows;
+        });
+        delete spec.columns;
+        return spec;
+    }
+    document.querySelectorAll('script[data-chart]').forEach(function (element) {
+        var id = element.getAttribute('data-chart');
+        var spec = JSON.parse(element.textContent);
+        if (element.getAttribute('data-kind') === 'mpld3') {
+            mpld3.draw_figure(id, decodeMpld3(spec));
+        } else {
+            Plotly.newPlot(id, spec.data, spec.layout, {responsive: true});
+        }
+    });
+})();
+"""
+
+
+class ReportWriter():
+    """
+    生成可离线打开的报告片段:
+    JS库(d3, mpld3, plotly)只在报告末尾内联一次, 不依赖CDN;
+    每个图表的数据以紧凑JSON保存, mpld3的数值数据按列去重后编码为base64类型数组
+    """
+    @staticmethod
+    def new_chart_id():
+        # 各分析部分可能在不同进程中生成, 使用随机id避免冲突
+        return f"chart_{uuid.uuid4().hex[:12]}"
+
+    @staticmethod
+    def to_json(spec):
+        # 紧凑输出, 并避免数据中的"</"提前结束<script>标签; 刻度等numpy数值由NumpyEncoder转换
+        return json.dumps(spec, cls=NumpyEncoder, separators=(',', ':'), allow_nan=False).replace('</', '<\\/')
+
+    @staticmethod
+    def encode_column(values: np.ndarray):
+        # float32能无损表示时使用float32, 否则使用float64(例如时间戳)
+        values = np.asarray(values, dtype='<f8')
+        as_float32 = values.astype('<f4')
+        if np.array_equal(as_float32.astype('<f8'), values, equal_nan=True):
+            return {'dtype': 'f4', 'bdata': base64.b64encode(as_float32.tobytes()).decode('ascii')}
+        return {'dtype': 'f8', 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+    @staticmethod
+    def compact_mpld3_data(figure_dict):
+        """
+        把mpld3的按行数组转换为共享的列: 相同内容的列(例如线和标记使用的同一组y值)只保存一次
+        """
+        columns = []
+        column_index = {}
+        for key, rows in figure_dict['data'].items():
+            # 空数据(例如没有点的线)无法确定列数, 保持原样
+            if not len(rows):
+                continue
+            values = np.asarray(rows, dtype=float).reshape(len(rows), -1)
+            refs = []
+            for column in values.T:
+                digest = hashlib.sha1(np.ascontiguousarray(column).tobytes()).hexdigest()
+                if digest not in column_index:
+                    column_index[digest] = len(columns)
+                    columns.append(ReportWriter.encode_column(column))
+                refs.append(column_index[digest])
+            figure_dict['data'][key] = {'length': len(rows), 'columns': refs}
+        figure_dict['columns'] = columns
+        return figure_dict
+
+    @staticmethod
+    def mpld3_fragment(fig):
+        chart_id = ReportWriter.new_chart_id()
+        with Perf.stage('render_mpld3'):
+            figure_dict = ReportWriter.compact_mpld3_data(mpld3.fig_to_dict(fig))
+            fragment = CHART_TEMPLATE.format(chart_id, 'mpld3', ReportWriter.to_json(figure_dict))
+        Perf.count('report_bytes', len(fragment))
+        return fragment
+
+    @staticmethod
+    def plotly_fragment(fig):
+        # plotly已将数值数组编码为base64类型数组
+        chart_id = ReportWriter.new_chart_id()
+        with Perf.stage('render_plotly'):
+            fragment = CHART_TEMPLATE.format(chart_id, 'plotly', fig.to_json().replace('</', '<\\/'))
+        Perf.count('report_bytes', len(fragment))
+        return fragment
+
+    @staticmethod
+    def read_library(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    @staticmethod
+    def get_used_kinds(html_path):
+        kinds = set()
+        with open(html_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if 'data-kind="mpld3"' in line:
+                    kinds.add('mpld3')
+                if 'data-kind="plotly"' in line:
+                    kinds.add('plotly')
+        return kinds
+
+    @staticmethod
+    def finish(html_path):
+        """
+        在报告末尾内联用到的JS库和启动脚本, 并结束HTML文档
+
+        参数:
+            html_path: 报告路径
+        """
+        kinds = ReportWriter.get_used_kinds(html_path)
+        libraries = []
+        if 'mpld3' in kinds:
+            libraries.append(ReportWriter.read_library(mpld3.urls.D3_LOCAL))
+            libraries.append(ReportWriter.read_library(mpld3.urls.MPLD3MIN_LOCAL))
+        if 'plotly' in kinds:
+            libraries.append(get_plotlyjs())
+        with open(html_path, 'a', encoding='utf-8') as file:
+            for library in libraries:
+                file.write('<script type="text/javascript">')
+                file.write(library.replace('</script', '<\\/script'))
+                file.write('</script>\n')
+            file.write(f'<script type="text/javascript">{BOOTSTRAP_JS}</script>\n')
+            file.write('</body>\n</html>\n')
+        log.info(f"Report finished: {html_path}, {os.path.getsize(html_path) / 1024 / 1024:.2f} MB")
@@ -1,11 +1,15 @@
 import matplotlib.pyplot as plt
-import mpld3
 import os
 import html
 import pandas as pd
 import numpy as np
 from log_utils import log
+from data_store import DataStore
+from downsampler import Downsampler
+from report_writer import ReportWriter
+from event_store import EventStore
 from version_parser import VersionParser
+from cpu_parser import CpuParser, CATEGORY_NAMES
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import math
@@ -13,14 +17,41 @@ import math
 KBYTES_PER_MB = 1024
 MAX_ITEMS_EACH_CATEGORY = 8
 class Show():
+    # 并发执行时各分析部分写入独立的分片文件, 由assemble_report按顺序合并
+    report_part = None
+
     @staticmethod 
     def get_html_path(dir):
+        if Show.report_part is not None:
+            return Show.get_part_path(dir, Show.report_part)
         return os.path.join(dir, 'RamUT_Report.html')
+
+    @staticmethod
+    def get_perf_path(dir, suffix):
+        # 与报告同名的性能统计文件, 例如RamUT_Report_perf.json
+        return os.path.join(dir, f'RamUT_Report{suffix}')
+
+    @staticmethod
+    def get_part_path(dir, part):
+        return os.path.join(dir, f'RamUT_Report.part{part}.html')
+
+    @staticmethod
+    def assemble_report(dir, part_count):
+        # 按分析部分的顺序把分片追加到报告中, 并删除分片文件
+        html_path = os.path.join(dir, 'RamUT_Report.html')
+        with open(html_path, 'a', encoding='utf-8') as file:
+            for part in range(part_count):
+                part_path = Show.get_part_path(dir, part)
+                if not os.path.exists(part_path):
+                    continue
+                with open(part_path, 'r', encoding='utf-8') as part_file:
+                    file.write(part_file.read())
+                os.remove(part_path)
     
     @staticmethod
     def gen_html_title(title):
         # 生成HTML标题（支持多行）
-        template = """
+        template = """<!DOCTYPE html>
         <html>
         <head>
             <meta charset="UTF-8">
@@ -37,8 +68,6 @@ class Show():
             <h1 style="text-align: center; color: blue;">
                 {0}
             </h1>
-        </body>
-        </html>
         """
         
         # 处理多行标题
@@ -57,17 +86,10 @@ class Show():
         
     @staticmethod 
     def gen_html_content(h1: str):
-        # 将HTML代码嵌入到HTML模板中
+        # 报告是一个完整的HTML文档, 各部分只追加标题和内容片段
         template = """
-        <html>
-        <head>
-        <title>RamUT Report</title>
-        </head>
-        <body>
         <h1>{}</h1>
         <div></div>
-        </body>
-        </html>
         """
         # Sanitize the input to prevent HTML injection
         sanitized_h1 = html.escape(h1)
@@ -94,13 +116,13 @@ class Show():
         return all_colors[index]
     
     @staticmethod 
-    def draw_ram_trend(dir, excel_path):
+    def draw_ram_trend(dir, data):
         markers = 'o'
 
         try:
-            df = pd.read_excel(excel_path)
+            df = DataStore.get_dataframe(data)
         except FileNotFoundError:
-            log.info(f"draw_ram_trend error: could not found: {excel_path}")
+            log.info(f"draw_ram_trend error: could not found: {data}")
             return
 
         df_column_list = df.columns.to_list()
@@ -112,7 +134,7 @@ class Show():
         y_labels_list = ['Native', 'System','Persistent','PersistentService','Foreground','Visible','Perceptible']
         x_labels = df_column_list[0]
         for index, y_labels in enumerate(y_labels_list):
-            ax.plot(df[x_labels], df[y_labels]//KBYTES_PER_MB, label=y_labels, marker=markers, color=Show.get_color(index))
+            ax.plot(*Downsampler.downsample(df[x_labels], df[y_labels]//KBYTES_PER_MB), label=y_labels, marker=markers, color=Show.get_color(index))
         ax.legend()
         
         for end_tag in ['PerceptibleMedium', 'PerceptibleLow', 'AServices', 'Previous', 'BServices', 'Cached']:
@@ -140,7 +162,7 @@ class Show():
             ax.set_title(title)
             for index2 in range(start, end):
                 y_labels = df_column_list[index2]
-                ax.plot(df[x_labels], df[y_labels]//KBYTES_PER_MB, label=y_labels, marker=markers, color=Show.get_color(index2))
+                ax.plot(*Downsampler.downsample(df[x_labels], df[y_labels]//KBYTES_PER_MB), label=y_labels, marker=markers, color=Show.get_color(index2))
             ax.legend()
         
         for ax in axs.flatten():
@@ -159,23 +181,23 @@ class Show():
         html_path = Show.get_html_path(dir)
         # 将HTML网页保存到文件
         try:
-            with open(html_path, 'a') as file:
+            with open(html_path, 'a', encoding='utf-8') as file:
                 file.write(html_content)
-                mpld3.save_html(fig, file)
+                file.write(ReportWriter.mpld3_fragment(fig))
                 log.info(f"draw_ram_trend, saved to {html_path}")
         except Exception as e:
             log.error(f"Error writing to file: {e}")
             
-        Show.draw_ram_status_trend(dir, excel_path)
+        Show.draw_ram_status_trend(dir, df)
 
     @staticmethod 
-    def draw_ram_status_trend(dir, excel_path):
+    def draw_ram_status_trend(dir, data):
         markers = 'o'
         
         try:
-            df = pd.read_excel(excel_path)
+            df = DataStore.get_dataframe(data)
         except FileNotFoundError:
-            log.info(f"draw_ram_status_trend error: could not found: {excel_path}")
+            log.info(f"draw_ram_status_trend error: could not found: {data}")
             return
 
         df_column_list = df.columns.to_list()
@@ -188,7 +210,7 @@ class Show():
         end = df_column_list.index('ZRAM')
         for index in range(start, end):
             y_labels = df_column_list[index]
-            ax.plot(df[x_labels], df[y_labels]//KBYTES_PER_MB, label=y_labels, marker=markers, color=Show.get_color(index))
+            ax.plot(*Downsampler.downsample(df[x_labels], df[y_labels]//KBYTES_PER_MB), label=y_labels, marker=markers, color=Show.get_color(index))
         ax.legend()
 
         ax.tick_params(axis='x', labelrotation=30)
@@ -205,18 +227,18 @@ class Show():
         html_path = Show.get_html_path(dir)
         # 将HTML网页保存到文件
         try:
-            with open(html_path, 'a') as file:
+            with open(html_path, 'a', encoding='utf-8') as file:
                 file.write(html_content)
-                mpld3.save_html(fig, file)
+                file.write(ReportWriter.mpld3_fragment(fig))
                 log.info(f"draw_ram_status_trend, saved to {html_path}")
         except Exception as e:
             log.error(f"Error writing to file: {e}")
 
     @staticmethod 
-    def draw_killing(dir, excel_path, colomn_index_as_x_labels=0):
+    def draw_killing(dir, data, colomn_index_as_x_labels=0):
         markers = 'o'
 
-        df = pd.read_excel(excel_path)
+        df = DataStore.get_dataframe(data)
         df_column_list = df.columns.to_list()
         
         # 计算子图的行数和列数, df的第一列是时间戳
@@ -235,10 +257,11 @@ class Show():
             else:
                 ax = axs[coloum]
             ax.set_title(y_labels)
+            x_values, y_values = Downsampler.downsample(df[x_labels], df[y_labels])
             if colomn_index_as_x_labels == 1:
-                ax.set_xticks(range(len(df[x_labels])))  # 设置固定的刻度位置
-                ax.set_xticklabels(df[x_labels], rotation=30)  # 设置 x 轴标签为字符串并旋转
-            ax.plot(df[x_labels], df[y_labels], label=y_labels, marker=markers, color=Show.get_color(index))
+                ax.set_xticks(range(len(x_values)))  # 设置固定的刻度位置
+                ax.set_xticklabels(x_values, rotation=30)  # 设置 x 轴标签为字符串并旋转
+            ax.plot(x_values, y_values, label=y_labels, marker=markers, color=Show.get_color(index))
             
         # for ax in axs.flatten():
         #     ax.tick_params(axis='x', labelrotation=30)
@@ -248,15 +271,15 @@ class Show():
         h1 = "Kill Information"
         html_content = Show.gen_html_content(h1)
         html_path = Show.get_html_path(dir)
-        with open(html_path, 'a') as file:
+        with open(html_path, 'a', encoding='utf-8') as file:
             file.write(html_content)
-            mpld3.save_html(fig, file)
+            file.write(ReportWriter.mpld3_fragment(fig))
     
     @staticmethod 
-    def draw_launch_info(dir, excel_path):
+    def draw_launch_info(dir, data):
         markers = 'o'
 
-        df = pd.read_excel(excel_path)
+        df = DataStore.get_dataframe(data)
         df_column_list = df.columns.to_list()
         
         # 计算子图的行数和列数, df的第一列是时间戳
@@ -275,7 +298,7 @@ class Show():
             else:
                 ax = axs[coloum]
             ax.set_title(y_labels)
-            ax.plot(df[x_labels], df[y_labels], label=y_labels, marker=markers, color=Show.get_color(index))
+            ax.plot(*Downsampler.downsample(df[x_labels], df[y_labels]), label=y_labels, marker=markers, color=Show.get_color(index))
             
         for ax in axs.flatten():
             ax.tick_params(axis='x', labelrotation=30)
@@ -285,9 +308,9 @@ class Show():
         h1 = "App Launch Information"
         html_content = Show.gen_html_content(h1)
         html_path = Show.get_html_path(dir)
-        with open(html_path, 'a') as file:
+        with open(html_path, 'a', encoding='utf-8') as file:
             file.write(html_content)
-            mpld3.save_html(fig, file)
+            file.write(ReportWriter.mpld3_fragment(fig))
             
             
     @staticmethod
@@ -322,7 +345,7 @@ class Show():
                 ax = axs[coloum]
             title = f"{name}, MBs"
             ax.set_title(title)
-            ax.plot(df[x_labels], df[name]//KBYTES_PER_MB, label=name, marker=markers, color=Show.get_color(index))
+            ax.plot(*Downsampler.downsample(df[x_labels], df[name]//KBYTES_PER_MB), label=name, marker=markers, color=Show.get_color(index))
             
         for ax in axs.flatten():
             ax.tick_params(axis='x', labelrotation=30)
@@ -333,23 +356,78 @@ class Show():
         html_content = Show.gen_html_content(h1)
         html_path = Show.get_html_path(dir)
         html_str = df_abnormal.to_html(index=False)
-        with open(html_path, 'a') as file:
+        with open(html_path, 'a', encoding='utf-8') as file:
             file.write(html_content)
             file.write(html_str)
-            mpld3.save_html(fig, file)
+            file.write(ReportWriter.mpld3_fragment(fig))
             
+    @staticmethod
+    def draw_event_timeline(dir, store):
+        # 各事件流按小时汇总到同一时间轴, 便于对照kill与launch, CPU, PSS的变化
+        series = []
+        kills = store.get('kill')
+        if len(kills):
+            series.append(('Kills per hour', EventStore.bucket(kills)))
+            heavy_kills = kills[(kills['tag'] == 'killinfo') & (kills['adj'] < 201)]
+            series.append(('Heavy kills per hour', EventStore.bucket(heavy_kills)))
+        launches = store.get('launch')
+        if len(launches):
+            series.append(('Launches per hour', EventStore.bucket(launches)))
+        cpu_total = store.get('cpu', packages=['total'])
+        if len(cpu_total):
+            series.append(('Total CPU (%)', EventStore.bucket(cpu_total, 'percent', 'mean')))
+        pss = store.get('pss')
+        if len(pss):
+            series.append(('Peak PSS (MB)', EventStore.bucket(pss, 'pss', 'max') / 1024))
+        # 例如只有killinfo之外的kill事件时, 不绘制空的子图
+        series = [(title, values) for title, values in series if len(values)]
+        if not series:
+            log.warning("No events to draw")
+            return
+
+        cols = 2
+        rows = math.ceil(len(series) / cols)
+        fig, axs = plt.subplots(rows, cols, figsize=(12, 4 * rows), squeeze=False)
+        for index, (title, values) in enumerate(series):
+            ax = axs[index // cols][index % cols]
+            ax.set_title(title)
+            ax.plot(*Downsampler.downsample(pd.Series(values.index), values), marker='o', color=Show.get_color(index))
+            ax.tick_params(axis='x', labelrotation=30)
+        for ax in axs.flatten()[len(series):]:
+            ax.set_visible(False)
+        plt.tight_layout()
+
+        html_path = Show.get_html_path(dir)
+        with open(html_path, 'a', encoding='utf-8') as file:
+            file.write(Show.gen_html_content("Event Timeline"))
+            file.write(ReportWriter.mpld3_fragment(fig))
+
+    @staticmethod
+    def finish_report(dir):
+        # 所有部分写完后内联JS库并结束HTML文档
+        ReportWriter.finish(os.path.join(dir, 'RamUT_Report.html'))
+
+    @staticmethod
+    def draw_batch_summary(dir, df_summary):
+        # 批量模式的设备汇总表
+        html_content = Show.gen_html_content("Device Summary")
+        html_path = Show.get_html_path(dir)
+        with open(html_path, 'a', encoding='utf-8') as file:
+            file.write(html_content)
+            file.write(df_summary.to_html(index=False, float_format=lambda value: f"{value:.3f}"))
+
     @staticmethod
     def draw_initial_report(dir, title):
         html_title = Show.gen_html_title(title)
         html_path = Show.get_html_path(dir)
-        with open(html_path, 'w') as file:
+        with open(html_path, 'w', encoding='utf-8') as file:
             file.write(html_title)
             
     @staticmethod
-    def draw_pss_report(dir, excel_path):
+    def draw_pss_report(dir, data):
         MIN_PSS_TO_DRAW = 200000  # KB
 
-        df = pd.read_excel(excel_path)
+        df = DataStore.get_dataframe(data)
         df = df[df['pss'] >= MIN_PSS_TO_DRAW]  # 前置过滤
 
         # 1. 动态计算最佳布局
@@ -369,11 +447,12 @@ class Show():
             pkg_data = df[df['package'] == pkg]
             row = (i // 2) + 1
             col = (i % 2) + 1
+            x_values, y_values = Downsampler.downsample(pkg_data['datetime'], pkg_data['pss']/1024)  # 直接转换为MB
 
             fig.add_trace(
                 go.Scatter(
-                    x=pkg_data['datetime'],
-                    y=pkg_data['pss']/1024,  # 直接转换为MB
+                    x=x_values,
+                    y=y_values,
                     name=pkg,
                     mode='lines+markers',
                     marker_symbol=i % 30,
@@ -417,37 +496,34 @@ class Show():
         )
 
 
-        # 5. 输出优化
-
-        html_path = os.path.join(dir, "pss_report.html")
-        fig.write_html(
-            html_path,
-            full_html=True,
-            include_plotlyjs='cdn',
-            animation_opts={'frame': {'redraw': False}}
-        )
-        
+        # 5. 写入报告, plotly.js由ReportWriter.finish内联
         html_path = Show.get_html_path(dir)
-        with open(html_path, 'a') as f:  # 追加模式
-            f.write(fig.to_html(full_html=False, include_plotlyjs='cdn'))
+        with open(html_path, 'a', encoding='utf-8') as f:  # 追加模式
+            f.write(ReportWriter.plotly_fragment(fig))
 
             
     @staticmethod
-    def draw_cpu_report(dir, excel_path):
+    def draw_cpu_report(dir, data):
         PROCESSES_PER_PAGE = 2  # 每页显示的进程数
         MIN_CPU_TO_DRAW = 0.5  # 绘图的最小CPU值，小于此值的进程将不绘图，单位百分比
-        df = pd.read_excel(excel_path)
-
-        datetime_df = df.iloc[:, 0]  # 使用 iloc 选取第一列作为时间戳
-        category_df = df.iloc[:, 1:5]  # 使用 iloc 选取第2-5列作为分类数据
-        processes_df = df.iloc[:, 5:]  # 使用 iloc 选取后面的所有列
-
-        processes_df = processes_df.loc[:, processes_df.fillna(0).mean() >= MIN_CPU_TO_DRAW]
-
-        sorted_columns = processes_df.fillna(0).mean().sort_values(ascending=False).index
-        processes_df = processes_df[sorted_columns]
-        # 合并分类数据和进程数据
-        df_to_draw = pd.concat([category_df, processes_df], axis=1)
+        df = DataStore.get_dataframe(data)
+        if 'process' not in df.columns:
+            # 兼容旧的宽表格式: 第一列为时间戳, 其余每列一个进程
+            df = df.melt(id_vars=df.columns[0], var_name='process', value_name='percent').dropna(subset=['percent'])
+            df.columns = ['date_time', 'process', 'percent']
+
+        # 按时间戳计算每个进程的平均CPU, 未出现的时间戳按0计算
+        timestamps = df['date_time'].nunique()
+        mean_cpu = df.groupby('process', observed=True)['percent'].sum() / timestamps
+        categories = [category for category in CATEGORY_NAMES if category in mean_cpu.index]
+        processes = mean_cpu.drop(index=categories)
+        processes = processes[processes >= MIN_CPU_TO_DRAW].sort_values(ascending=False)
+
+        # 只把要绘制的分类和进程转换为宽表
+        df_to_draw = CpuParser.pivot_processes(df, categories + processes.index.to_list())
+        datetime_df = df_to_draw.index
+        log.info(f"draw_cpu_report, pivoted {df_to_draw.shape} of {df['process'].nunique()} processes, "
+                 f"{df_to_draw.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB")
 
         column_list_to_draw = df_to_draw.columns.to_list()
 
@@ -478,13 +554,13 @@ class Show():
                     column = column_list_to_draw[global_index]
                     ax = axs[index, 0]
                     ax.set_title(f"{column} (%)")
-                    ax.plot(datetime_df, df_to_draw[column], label=column, marker='o', color=Show.get_color(global_index))
+                    ax.plot(*Downsampler.downsample(datetime_df.to_series(), df_to_draw[column]), label=column, marker='o', color=Show.get_color(global_index))
                     ax.legend()
 
             plt.tight_layout()
 
             # 保存图表为HTML片段
-            html_snippet = mpld3.fig_to_html(fig)
+            html_snippet = ReportWriter.mpld3_fragment(fig)
             html_content += html_snippet  # 将图表的HTML片段直接添加
             plt.close(fig)  # 关闭该图形以释放内存
             html_content += "</div>"
@@ -511,5 +587,5 @@ class Show():
         html_content += javascript
 
         html_path = Show.get_html_path(dir)
-        with open(html_path, 'a') as file:
+        with open(html_path, 'a', encoding='utf-8') as file:
             file.write(html_content)
@@ -0,0 +1,10 @@
+import os
+import sys
+import matplotlib
+
+# 测试中不打开绘图窗口
+matplotlib.use('Agg')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'tools'))
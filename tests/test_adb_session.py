@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import shlex
+import types
+import numpy as np
+import pytest
+import cpu_monitor
+import pss_monitor
+from adb_session import AdbSession
+from cpu_monitor import CpuMonitor
+from pss_monitor import PssMonitor
+
+FAKE_ADB = ' '.join(shlex.quote(arg) for arg in
+                    [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                  'tools', 'fake_adb.py')])
+
+
+@pytest.fixture
+def session():
+    with AdbSession('FAKE0001', FAKE_ADB) as session:
+        yield session
+
+
+def test_command_framing(session):
+    assert session.run("echo hello") == ['hello']
+    assert session.last_status == 0
+    # 每条命令的输出以各自的结束标记分隔, 不会混入下一条命令
+    lines = session.run("ps -e | grep launcher3")
+    assert len(lines) == 1 and lines[0].endswith('com.motorola.launcher3')
+    assert session.last_status == 0
+    assert session.run("ps -e | grep nosuchprocess") == []
+    assert session.last_status == 1
+    assert session.run("nosuchcommand") == ['/system/bin/sh: nosuchcommand: inaccessible or not found']
+    assert session.last_status == 127
+    assert session.sequence == 4
+
+
+def test_reconnect_after_shell_exit(session):
+    assert session.run("echo first") == ['first']
+    process = session.process
+    process.kill()
+    process.wait()
+    assert not session.is_alive()
+    assert session.run("echo second") == ['second']
+    assert session.process is not process
+
+
+def test_reconnect_after_broken_stdin(session):
+    assert session.run("echo first") == ['first']
+    session.process.stdin.close()
+    assert session.run("echo second") == ['second']
+
+
+def test_close_while_reading_restarts_session(session):
+    lines = session.iter_lines("ps -e")
+    next(lines)
+    # 调用方提前退出时剩余输出不能混入下一条命令
+    lines.close()
+    assert session.process is None
+    assert session.run("echo next") == ['next']
+
+
+def stop_after(count):
+    # 替换监控模块中的time, 第count次等待时模拟Ctrl+C
+    calls = []
+
+    def sleep(seconds):
+        calls.append(seconds)
+        if len(calls) >= count:
+            raise KeyboardInterrupt
+    return types.SimpleNamespace(time=time.time, monotonic=time.monotonic, sleep=sleep)
+
+
+def test_cpu_monitor_loop(tmp_path, monkeypatch):
+    spill_path = str(tmp_path / 'cpu.csv')
+    monitor = CpuMonitor(['lmkd', 'system_server'], 'FAKE0001', FAKE_ADB, spill_path, capacity=10, spill_every=2)
+    assert monitor.pids == {'lmkd': '612', 'system_server': '1705'}
+    monkeypatch.setattr(cpu_monitor, 'time', stop_after(3))
+    monitor.monitor(interval=0)
+
+    times, values = monitor.total_cpu_values.snapshot()
+    assert len(times) == 3
+    # epoch毫秒
+    assert abs(times[-1] - time.time() * 1000) < 60 * 1000
+    assert not np.isnan(values).any()
+    assert monitor.session.process is None
+    with open(spill_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'time,lmkd,system_server'
+    assert len(lines) == 4
+    assert os.path.exists(str(tmp_path / 'cpu.png'))
+
+
+@pytest.mark.parametrize('names', [['com.motorola.launcher3'], ['com.motorola.launcher3', 'system_server']])
+def test_pss_monitor_loop(tmp_path, monkeypatch, names):
+    spill_path = str(tmp_path / 'pss.csv')
+    monitor = PssMonitor(names, 'FAKE0001', FAKE_ADB, spill_path, capacity=2, spill_every=2)
+    monkeypatch.setattr(pss_monitor, 'time', stop_after(3))
+    monitor.monitor(interval=0)
+
+    # 缓冲区只保留最近的采样, 完整历史在CSV中
+    times, values = monitor.total_pss_values.snapshot()
+    assert len(times) == 2
+    assert (values > 0).all()
+    with open(spill_path, encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 4
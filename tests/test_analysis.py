@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import Analysis, KBYTES_PER_MB
+
+REF_COV = 0.25
+REF_DIFF = 80000
+
+
+def detect_abnormal_baseline(dataframe, ref_cov, ref_diff):
+    # 向量化之前逐列计算CoV和首尾差值的实现
+    dataframe = Analysis.clean_data(dataframe)
+    abnormal_data_list = []
+    for col in list(dataframe.columns)[1:]:
+        df_col = dataframe[col].dropna()
+        if df_col.empty:
+            continue
+        cov = np.std(df_col) / np.mean(df_col)
+        if cov > ref_cov:
+            val_initial = df_col.iloc[0]
+            val_end = df_col.iloc[-1]
+            if val_end - val_initial > ref_diff:
+                abnormal_data_list.append({
+                    'process': col,
+                    'cov': cov,
+                    'min_mB': np.min(df_col) // KBYTES_PER_MB,
+                    'max_mB': np.max(df_col) // KBYTES_PER_MB,
+                    'initial_mB': val_initial // KBYTES_PER_MB,
+                    'end_mB': val_end // KBYTES_PER_MB,
+                })
+    return abnormal_data_list
+
+
+def random_frame(rng):
+    rows = int(rng.integers(2, 40))
+    columns = int(rng.integers(1, 12))
+    data = {'datetime': pd.date_range('2024-09-01', periods=rows, freq='min')}
+    for index in range(columns):
+        start = rng.uniform(10000, 400000)
+        growth = rng.choice([0.0, rng.uniform(0, 30000)])
+        values = start + growth * np.arange(rows) + rng.normal(0, start * rng.uniform(0, 0.5), rows)
+        values = np.abs(values).round()
+        values[rng.random(rows) < rng.uniform(0, 0.5)] = np.nan
+        data[f"com.app{index}"] = values
+    # 清理时删除的列
+    data['Native'] = rng.uniform(1, 2, rows)
+    data['Cached'] = rng.uniform(1, 2, rows)
+    return pd.DataFrame(data)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_detect_abnormal_matches_baseline(seed):
+    dataframe = random_frame(np.random.default_rng(seed))
+    expected = detect_abnormal_baseline(dataframe, REF_COV, REF_DIFF)
+    actual = Analysis.detect_abnormal_data(dataframe, REF_COV, REF_DIFF, rank_by_slope=False)
+    assert [data['process'] for data in actual] == [data['process'] for data in expected]
+    for data, baseline in zip(actual, expected):
+        assert data['cov'] == pytest.approx(baseline['cov'], rel=1e-9)
+        for key in ('min_mB', 'max_mB', 'initial_mB', 'end_mB'):
+            assert data[key] == baseline[key]
+
+
+def test_detect_abnormal_small_frame():
+    dataframe = pd.DataFrame({
+        'datetime': pd.date_range('2024-09-01', periods=4, freq='h'),
+        'com.leak': [100000, np.nan, 300000, 500000],
+        'com.flat': [200000, 200100, 199900, 200000],
+        'com.empty': [np.nan] * 4,
+    })
+    expected = detect_abnormal_baseline(dataframe, REF_COV, REF_DIFF)
+    actual = Analysis.detect_abnormal_data(dataframe, REF_COV, REF_DIFF, rank_by_slope=False)
+    assert [data['process'] for data in expected] == ['com.leak']
+    assert actual == [{'process': 'com.leak', 'cov': pytest.approx(expected[0]['cov']),
+                       'min_mB': 97, 'max_mB': 488, 'initial_mB': 97, 'end_mB': 488}]
@@ -0,0 +1,45 @@
+import pickle
+from column_builder import ColumnBuilder, ColumnSlice
+
+COLUMNS = [('time', 'int'), ('pss', 'float'), ('package', 'category')]
+
+
+def build(rows):
+    builder = ColumnBuilder(COLUMNS)
+    builder.extend(rows)
+    return builder
+
+
+def test_slice_round_trip_through_manifest():
+    builder = build([(1, 1.5, 'com.d'), (2, 2.5, 'com.b'), (3, 3.5, 'com.a'), (4, 4.5, 'com.c')])
+    column_slice = pickle.loads(pickle.dumps(builder[1:]))
+    assert isinstance(column_slice, ColumnSlice)
+    assert len(column_slice) == 3
+    # 切片中只保存用到的取值
+    assert column_slice.columns[2][0] == ['com.b', 'com.a', 'com.c']
+
+    # 读回到字典不同的构建器中, 编码按新字典重新映射
+    other = build([(0, 0.5, 'com.c')])
+    other.extend(column_slice)
+    df = other.to_frame()
+    assert df['time'].tolist() == [0, 2, 3, 4]
+    assert df['pss'].tolist() == [0.5, 2.5, 3.5, 4.5]
+    assert df['package'].tolist() == ['com.c', 'com.b', 'com.a', 'com.c']
+    assert other.categories[2] == ['com.c', 'com.b', 'com.a']
+
+
+def test_empty_slice_and_row_tuples():
+    builder = build([(1, 1.0, 'com.a')])
+    empty = builder[1:]
+    assert len(empty) == 0
+    builder.extend(empty)
+    # 旧清单中按行保存的元组仍可追加
+    builder.extend([(2, 2.0, 'com.b')])
+    assert builder.to_frame()['package'].tolist() == ['com.a', 'com.b']
+
+
+def test_pickled_builder_keeps_appending():
+    builder = pickle.loads(pickle.dumps(build([(1, 1.0, 'com.a')])))
+    builder.append(2, 2.0, 'com.a')
+    assert builder.to_frame()['package'].cat.categories.tolist() == ['com.a']
+    assert len(builder) == 2
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from downsampler import Downsampler
+
+
+def build_series(count, seed=0):
+    rng = np.random.default_rng(seed)
+    x = pd.Series(pd.date_range('2024-01-01', periods=count, freq='s'))
+    y = pd.Series(rng.normal(size=count).cumsum())
+    return x, y
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('count,max_points', [(10000, 2000), (5000, 7), (1001, 100), (50, 3)])
+def test_downsample_respects_budget_and_keeps_ends(method, count, max_points):
+    x, y = build_series(count)
+    sampled_x, sampled_y = Downsampler.downsample(x, y, max_points, method)
+    assert 2 <= len(sampled_y) <= max_points
+    assert sampled_x.iloc[0] == x.iloc[0]
+    assert sampled_x.iloc[-1] == x.iloc[-1]
+    assert sampled_y.iloc[0] == y.iloc[0]
+    assert sampled_y.iloc[-1] == y.iloc[-1]
+    assert sampled_x.is_monotonic_increasing
+
+
+def test_minmax_keeps_peaks():
+    x, y = build_series(10000, seed=1)
+    _, sampled_y = Downsampler.downsample(x, y, 200, 'minmax')
+    assert sampled_y.max() == y.max()
+    assert sampled_y.min() == y.min()
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_short_series_unchanged(method):
+    x, y = build_series(100)
+    sampled_x, sampled_y = Downsampler.downsample(x, y, 100, method)
+    assert sampled_x.tolist() == x.tolist()
+    assert sampled_y.tolist() == y.tolist()
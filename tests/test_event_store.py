@@ -0,0 +1,33 @@
+import os
+from event_store import EventStore
+from data_store import DataStore
+from show import Show
+
+HOUR_MS = 3600 * 1000
+
+
+def build_kills():
+    # 只有am_kill事件, 没有heavy kill
+    times = [HOUR_MS * 10, HOUR_MS * 10 + 5, HOUR_MS * 11]
+    return EventStore.build('kill', times, ['com.a', 'com.b', 'com.a'], ['am_kill'] * 3, adj=[-1, -1, -1])
+
+
+def test_clear_removes_stale_streams(tmp_path):
+    dir = str(tmp_path)
+    EventStore.write(dir, 'kill', build_kills())
+    assert len(EventStore.load(dir).get('kill')) == 3
+
+    EventStore.clear(dir)
+    assert not os.path.exists(DataStore.get_columnar_path(EventStore.get_path(dir, 'kill')))
+    assert EventStore.load(dir).streams == {}
+
+
+def test_event_timeline_skips_empty_series(tmp_path):
+    dir = str(tmp_path)
+    Show.draw_initial_report(dir, 'test')
+    Show.draw_event_timeline(dir, EventStore({'kill': build_kills()}))
+    with open(Show.get_html_path(dir), encoding='utf-8') as f:
+        html = f.read()
+    assert 'Event Timeline' in html
+    assert 'Kills per hour' in html
+    assert 'Heavy kills per hour' not in html
@@ -0,0 +1,66 @@
+import re
+import math
+import killinfo_decoder
+from killinfo_decoder import KILLINFO_COLUMNS, KillinfoDecoder
+
+NAMES = [name for name, _ in KILLINFO_COLUMNS]
+AOSP_LINE = ("01-18 17:13:33.654   723   723 I killinfo: [23908,10448,915,201,173576,14,93812,638636,34000,1436,"
+             "53000,4288,2664712,478784,584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,"
+             "29268,254540,5,10,2.730000,1.010000,3.010000,0.650000,11.110000]")
+A54_LINE = ("12-18 14:53:40.936   458   458 I killinfo: [24979,10048,925,201,42392,3,5557988,140228,531180,509984,"
+            "16688,784,20328,10212,409600,0,323752,85848,4194300,4,1866252,1797292,58816,98640,141188,140692,335728,"
+            "44112,88460,30620,129140,0,924,396,12,29,0,36796,128832,7,7,17.830000,11.990000,8.250000,1.260000,"
+            "47.490002,86]")
+# 改为按布局解码之前parse_killinfo_A54使用的正则
+A54_PATTERN = re.compile(r"(\d{2}-\d{2} \d{2}:\d{2}:\d{2})\.\d{3}\s+\d+\s+\d+\s+I\s+killinfo:\s+\[\d+\,\d+\,(\d+)\,(\d+)\,(\d+)\,(\d+)\,(\d+)\,(\d+)\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,(\d+)\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,\d+\,(\b\d+\.\d+\b),(\b\d+\.\d+\b),(\b\d+\.\d+\b),(\b\d+\.\d+\b),(\b\d+\.\d+\b),\d+\]")
+A54_GROUPS = ['killed_adj', 'min_adj', 'rss', 'reason', 'total', 'free', 'swapfree',
+              'mempsi_some', 'mempsi_full', 'iopsi_some', 'iopsi_full', 'cpupsi']
+
+
+def decode(line):
+    row = KillinfoDecoder.decode(line, line.index('killinfo: [') + len('killinfo: ['))
+    assert row is not None
+    return row[:2], dict(zip(NAMES, row[2:]))
+
+
+def test_decode_aosp_android13():
+    (date, clock), values = decode(AOSP_LINE)
+    assert (date, clock) == ('01-18', '17:13:33.654')
+    assert values['pid'] == 23908 and values['uid'] == 10448
+    assert values['killed_adj'] == 915 and values['min_adj'] == 201
+    assert values['rss'] == 173576 and values['reason'] == 14
+    assert values['free'] == 93812
+    assert values['swaptotal'] == 2664712 and values['swapfree'] == 478784
+    # AOSP布局中没有total
+    assert values['total'] == -1
+    assert [values[name] for name in killinfo_decoder.PSI_COLUMNS] == [2.73, 1.01, 3.01, 0.65, 11.11]
+
+
+def test_decode_a54_matches_old_regex():
+    match = A54_PATTERN.search(A54_LINE)
+    expected = {name: (float if name in killinfo_decoder.PSI_COLUMNS else int)(match.group(index + 2))
+                for index, name in enumerate(A54_GROUPS)}
+    (date, clock), values = decode(A54_LINE)
+    assert f"{date} {clock[:8]}" == match.group(1)
+    for name, value in expected.items():
+        assert values[name] == value, name
+    assert values['pid'] == 24979 and values['uid'] == 10048
+
+
+def test_unknown_layout_warns_once(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(killinfo_decoder.log, 'warning', warnings.append)
+    monkeypatch.setattr(killinfo_decoder, 'UNKNOWN_COUNTS', set())
+    line = "01-18 17:13:33.654   723   723 I killinfo: [1,2,900,200,4096,3,5,6,7]"
+    for _ in range(3):
+        _, values = decode(line)
+    assert values['pid'] == 1 and values['reason'] == 3
+    assert values['free'] == -1 and math.isnan(values['mempsi_some'])
+    assert len(warnings) == 1 and '9 fields' in warnings[0]
+
+
+def test_decode_rejects_invalid_lines():
+    line = "01-18 17:13:33.654   723   723 I killinfo: [1,2,x,4,5,6]"
+    assert KillinfoDecoder.decode(line, line.index('[') + 1) is None
+    line = "killinfo: [1,2,3,4,5,6]"
+    assert KillinfoDecoder.decode(line, line.index('[') + 1) is None
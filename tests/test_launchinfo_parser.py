@@ -0,0 +1,33 @@
+import io
+from datetime import datetime
+from event_store import EventStore
+from launchinfo_parser import ProcessStartExtractor
+from log_scanner import LogScanner
+from log_time import LogTimeDecoder
+
+LOG = """\
+12-02 23:34:29.964  2751  2933 I am_proc_start: [0,4092,10421,com.dolby.daxservice,added application,com.dolby.daxservice]
+12-02 23:34:30.001  2751  2933 I am_proc_died: [0,4000,com.android.chrome,900,17]
+01-11 12:03:05.281  2387  2482 I am_proc_start: [0,17034,10412,com.motorola.personalize,service,{com.motorola.personalize/com.motorola.personalize.plugin.LockScreenPluginService}]
+"""
+
+
+def test_process_start_rows():
+    scanner = LogScanner(LogTimeDecoder(datetime(2025, 1, 20)))
+    extractor = scanner.register(ProcessStartExtractor())
+    scanner.scan_stream('Stream-e_0001.txt', io.BytesIO(LOG.encode('utf-8')))
+    scanner.finish()
+
+    df = extractor.data_list.to_frame()
+    assert len(df) == 2
+    row = df.iloc[0]
+    # 跨年的日志按参考时间推断年份
+    assert EventStore.to_datetime([row['datetime']])[0] == datetime(2024, 12, 2, 23, 34, 29, 964000)
+    assert row['pid'] == 4092
+    assert row['pname'] == 'com.dolby.daxservice'
+    assert row['type'] == 'added application'
+    assert row['component'] == 'com.dolby.daxservice'
+    row = df.iloc[1]
+    assert EventStore.to_datetime([row['datetime']])[0] == datetime(2025, 1, 11, 12, 3, 5, 281000)
+    assert row['pid'] == 17034
+    assert row['type'] == 'service'
@@ -0,0 +1,71 @@
+import random
+import datetime
+from collections import Counter
+from log_matcher import LineMatcher
+from killinfo_parser import KillCategoriesExtractor, ProcessDieExtractor, TopAppExtractor
+from launchinfo_parser import LaunchInfoExtractor, ProcessStartExtractor
+from pss_parser import PssExtractor
+from cpu_parser import CpuExtractor
+from gen_corpus import Clock, gen_packages, gen_events_line, gen_system_lines
+
+EXTRA_LINES = [
+    # 只包含关键字, 完整正则不匹配
+    "01-18 17:13:33.654   723   723 I killinfo: truncated",
+    "01-18 17:13:34.001  1705  3060 W am_kill : [0,23332]",
+    "am_pss  am_proc_start am_proc_died MotoDisplayed onTopAppStateChanged",
+    "09-15 13:41:42.204  2439  2857 I ActivityManager: Start proc 9727:com.tencent.mm/u0a123",
+    # 一行中包含多个关键字
+    "01-18 17:13:35.216  1759  8211 I am_proc_died: [0,3968,com.a,920,19] am_kill am_pss",
+    "08-11 23:48:36.443  1903  2548 I ActivityManager: 25% TOTAL: 12% user + 10% kernel + 0.2% iowait + 1.4% irq",
+    "",
+    "no keyword here",
+]
+
+
+def build_rules():
+    extractors = [KillCategoriesExtractor(), ProcessDieExtractor(), TopAppExtractor(), LaunchInfoExtractor(),
+                  ProcessStartExtractor(), PssExtractor(), CpuExtractor()]
+    rules = []
+    for extractor in extractors:
+        rules.extend(extractor.rules())
+    return rules
+
+
+def build_lines(count=3000):
+    random.seed(7)
+    clock = Clock(datetime.datetime(2024, 1, 18, 17, 0, 0), 50)
+    packages = gen_packages(20)
+    lines = list(EXTRA_LINES)
+    for _ in range(count):
+        lines.append(gen_events_line(clock, packages, 0.5))
+        lines.extend(gen_system_lines(clock, packages, 0.5))
+    return lines
+
+
+def test_prefilter_matches_plain_regexes():
+    rules = build_rules()
+    found = Counter()
+    matcher = LineMatcher()
+    for index, (keyword, pattern, _) in enumerate(rules):
+        matcher.add(keyword, pattern, lambda match, index=index: found.update([(index, match.string, match.span())]))
+    matcher.compile()
+
+    expected = Counter()
+    lines = build_lines()
+    for line in lines:
+        matcher.feed(line)
+        for index, (_, pattern, _) in enumerate(rules):
+            match = pattern.search(line)
+            if match:
+                expected[(index, line, match.span())] += 1
+
+    assert len(expected) > 1000
+    assert found == expected
+    assert matcher.match_count == sum(expected.values())
+
+
+def test_is_candidate_only_for_keyword_lines():
+    matcher = LineMatcher(build_rules()).compile()
+    assert matcher.is_candidate(EXTRA_LINES[0])
+    assert not matcher.is_candidate("no keyword here")
+    assert matcher.feed("no keyword here") == 0
@@ -0,0 +1,72 @@
+from log_scanner import LogExtractor, LogScanner
+from log_source import LogSource
+from killinfo_parser import KillCategoriesExtractor, ProcessDieExtractor
+from launchinfo_parser import ProcessStartExtractor
+from pss_parser import PssExtractor
+
+EVENTS_LINES = [
+    "01-18 17:13:33.654   723   723 I killinfo: [23908,10448,915,201,173576,14,93812,638636,34000,1436,53000,4288,"
+    "2664712,478784,584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,29268,254540,5,10,"
+    "2.730000,1.010000,3.010000,0.650000,11.110000]",
+    "01-18 17:13:34.001  1705  3060 I am_kill : [0,23332,com.google.android.apps.photos,200,crash]",
+    "01-18 17:13:35.216  1759  8211 I am_proc_died: [0,3968,com.motorola.coresettingsext,920,19]",
+    "01-18 17:13:36.964  2751  2933 I am_proc_start: [0,4092,10421,com.dolby.daxservice,added application,com.dolby.daxservice]",
+    "01-18 17:13:37.100  1705  3060 I am_pss  : [4092,10421,com.dolby.daxservice,52428800,26214400,0,52432896,0,0,0]",
+    "01-18 17:13:38.000  1234  1250 D WifiStateMachine: handleMessage what=131155 arg1=0 arg2=0",
+]
+
+
+class LineCollector(LogExtractor):
+    # 没有rules(), 每一行都交给on_line
+    file_keywords = ('Stream-e',)
+
+    def __init__(self):
+        self.data_list = []
+
+    def on_line(self, line):
+        self.data_list.append(line)
+
+
+class CountingSource(LogSource):
+    def __init__(self, path):
+        super().__init__(path)
+        self.reads = 0
+
+    def read_lines(self, encoding='utf-8'):
+        self.reads += 1
+        return super().read_lines(encoding)
+
+
+def test_file_is_read_once_for_all_extractors(tmp_path):
+    path = tmp_path / 'Stream-e_0001.txt'
+    path.write_text("\n".join(EVENTS_LINES) + "\n", encoding='utf-8')
+
+    scanner = LogScanner()
+    kills = scanner.register(KillCategoriesExtractor())
+    dies = scanner.register(ProcessDieExtractor())
+    starts = scanner.register(ProcessStartExtractor())
+    pss = scanner.register(PssExtractor())
+    lines = scanner.register(LineCollector())
+
+    source = CountingSource(str(path))
+    scanner.feed(source)
+    scanner.finish()
+
+    assert source.reads == 1
+    assert len(kills.data_list) == 2
+    assert len(dies.data_list) == 1
+    assert len(starts.data_list) == 1
+    assert len(pss.data_list) == 1
+    assert len(lines.data_list) == len(EVENTS_LINES)
+
+
+def test_unrelated_file_is_not_read(tmp_path):
+    path = tmp_path / 'kernel_0001.txt'
+    path.write_text("\n".join(EVENTS_LINES) + "\n", encoding='utf-8')
+
+    scanner = LogScanner()
+    scanner.register(KillCategoriesExtractor())
+    scanner.register(PssExtractor())
+    source = CountingSource(str(path))
+    scanner.feed(source)
+    assert source.reads == 0
@@ -0,0 +1,61 @@
+from datetime import datetime
+from launchinfo_parser import ProcessStartExtractor
+from log_scanner import LogScanner
+from log_source import LogSource
+from log_time import LogTimeDecoder
+from parse_manifest import ParseManifest
+
+LOG = """\
+12-31 23:59:59.100  2751  2933 I am_proc_start: [0,4092,10421,com.a,activity,com.a/.Main]
+01-01 00:00:01.200  2751  2933 I am_proc_start: [0,4093,10422,com.b,service,com.b/.Service]
+"""
+
+
+def test_decode_infers_year_across_new_year():
+    decoder = LogTimeDecoder(datetime(2025, 1, 10))
+    assert decoder.decode("12-31 23:59:59.100") < decoder.decode("01-01 00:00:01.200")
+    assert decoder.decode("01-01 00:00:01.200") - decoder.decode("12-31 23:59:59.100") == 2100
+
+
+def test_file_years_depend_only_on_inferred_years():
+    decoder = LogTimeDecoder(datetime(2025, 1, 10))
+    decoder.start_file()
+    decoder.decode("12-31 23:59:59.100")
+    decoder.decode("01-01 00:00:01.200")
+    years = decoder.get_file_years()
+    assert years == {'12-31': 2024, '01-01': 2025}
+
+    # 参考时间变化但推断的年份不变时缓存仍然有效
+    assert LogTimeDecoder(datetime(2025, 1, 11)).matches_years(years)
+    assert LogTimeDecoder(datetime(2025, 11, 29)).matches_years(years)
+    # 参考时间晚到12-31属于下一年时缓存失效
+    assert not LogTimeDecoder(datetime(2025, 12, 1)).matches_years(years)
+    assert not LogTimeDecoder(datetime(2025, 1, 10)).matches_years(None)
+
+    # 每个文件重新记录出现过的日期
+    decoder.start_file()
+    assert decoder.get_file_years() == {}
+
+
+def scan(dir, reference):
+    manifest = ParseManifest(dir, 'test')
+    scanner = LogScanner(LogTimeDecoder(reference))
+    extractor = scanner.register(ProcessStartExtractor())
+    scanner.feed(LogSource(str(dir / 'Stream-e_0001.txt')), manifest)
+    scanner.finish()
+    manifest.save()
+    return manifest, extractor.data_list.to_frame()
+
+
+def test_manifest_reuses_rows_while_years_match(tmp_path):
+    (tmp_path / 'Stream-e_0001.txt').write_text(LOG)
+    manifest, df = scan(tmp_path, datetime(2025, 1, 10))
+    assert manifest.misses == 1 and len(df) == 2
+
+    manifest, cached = scan(tmp_path, datetime(2025, 1, 20))
+    assert manifest.hits == 1
+    assert cached['datetime'].tolist() == df['datetime'].tolist()
+
+    manifest, df = scan(tmp_path, datetime(2026, 1, 10))
+    assert manifest.misses == 1
+    assert (df['datetime'] - cached['datetime']).tolist() == [365 * 24 * 3600 * 1000] * 2
@@ -0,0 +1,87 @@
+import os
+from log_scanner import LogScanner
+from log_source import LogSource
+from parse_manifest import ParseManifest
+from pss_parser import PssExtractor
+
+PSS_LINE = "01-18 17:13:{second:02d}.100  1705  3060 I am_pss  : [4092,10421,com.app{index},52428800,26214400,0,52432896,0,0,0]"
+MTIME = 1700000000
+
+
+def write_log(path, count, mtime=MTIME):
+    lines = [PSS_LINE.format(second=index % 60, index=index) for index in range(count)]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.utime(path, (mtime, mtime))
+
+
+def run_scan(log_dir, out_dir):
+    # 每次运行使用新的扫描器和清单, 与ramut.py再次运行时相同
+    manifest = ParseManifest(out_dir, 'test')
+    extractor = PssExtractor()
+    scanner = LogScanner()
+    scanner.register(extractor)
+    for source in LogSource.walk(log_dir):
+        scanner.feed(source, manifest)
+    scanner.finish()
+    manifest.save()
+    return manifest, extractor.data_list.to_frame()
+
+
+def setup_dirs(tmp_path):
+    log_dir, out_dir = tmp_path / 'logs', tmp_path / 'out'
+    log_dir.mkdir()
+    out_dir.mkdir()
+    write_log(log_dir / 'Stream-e_0001.txt', 10)
+    write_log(log_dir / 'Stream-e_0002.txt', 20)
+    return str(log_dir), str(out_dir)
+
+
+def test_unchanged_files_are_reused(tmp_path):
+    log_dir, out_dir = setup_dirs(tmp_path)
+    manifest, first = run_scan(log_dir, out_dir)
+    assert (manifest.hits, manifest.misses) == (0, 2)
+
+    manifest, second = run_scan(log_dir, out_dir)
+    assert (manifest.hits, manifest.misses) == (2, 0)
+    assert second['package'].tolist() == first['package'].tolist()
+    assert second['datetime'].tolist() == first['datetime'].tolist()
+
+
+def test_touched_file_with_same_content_is_reused(tmp_path):
+    log_dir, out_dir = setup_dirs(tmp_path)
+    run_scan(log_dir, out_dir)
+    path = os.path.join(log_dir, 'Stream-e_0001.txt')
+    os.utime(path, (MTIME + 100, MTIME + 100))
+
+    manifest, df = run_scan(log_dir, out_dir)
+    assert (manifest.hits, manifest.misses) == (2, 0)
+    assert len(df) == 30
+
+
+def test_changed_size_is_reparsed(tmp_path):
+    log_dir, out_dir = setup_dirs(tmp_path)
+    run_scan(log_dir, out_dir)
+    write_log(os.path.join(log_dir, 'Stream-e_0002.txt'), 25)
+
+    manifest, df = run_scan(log_dir, out_dir)
+    assert (manifest.hits, manifest.misses) == (1, 1)
+    assert len(df) == 35
+
+
+def test_changed_content_with_same_size_is_reparsed(tmp_path):
+    log_dir, out_dir = setup_dirs(tmp_path)
+    run_scan(log_dir, out_dir)
+    path = os.path.join(log_dir, 'Stream-e_0001.txt')
+    size = os.path.getsize(path)
+    with open(path, encoding='utf-8') as f:
+        text = f.read().replace('com.app1,', 'com.appX,')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.utime(path, (MTIME + 100, MTIME + 100))
+    assert os.path.getsize(path) == size
+
+    manifest, df = run_scan(log_dir, out_dir)
+    assert (manifest.hits, manifest.misses) == (1, 1)
+    assert 'com.appX' in df['package'].tolist()
+    assert len(df) == 30
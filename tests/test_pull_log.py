@@ -0,0 +1,173 @@
+import os
+import queue
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from pull_log import CHUNK_SIZE, PART_SUFFIX, create_session, download_file, stream_file
+
+CONTENT = bytes(range(256)) * (CHUNK_SIZE // 256 * 3)
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """
+    支持"Range: bytes=N-"的静态文件服务;
+    send_length为False时不返回Content-Length, truncate_at不为None时只发送到该位置后断开
+    """
+    send_length = True
+    truncate_at = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_file(head=True)
+
+    def do_GET(self):
+        self.send_file(head=False)
+
+    def send_file(self, head):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(data)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        if self.send_length:
+            self.send_header('Content-Length', str(len(data) - start))
+        else:
+            self.close_connection = True
+        self.end_headers()
+        if head:
+            return
+        body = data[start:self.truncate_at] if self.truncate_at is not None else data[start:]
+        self.wfile.write(body)
+        if self.truncate_at is not None:
+            self.close_connection = True
+
+
+@pytest.fixture
+def server(tmp_path):
+    served = tmp_path / 'served'
+    served.mkdir()
+    (served / 'Stream-main.log').write_bytes(CONTENT)
+    handler = type('Handler', (RangeHandler,), {})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(served)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.handler = handler
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}/"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session():
+    with create_session(1) as session:
+        yield session
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_download_and_skip(server, session, tmp_path):
+    destination = str(tmp_path / 'Stream-main.log')
+    url = server.base_url + 'Stream-main.log'
+    assert download_file(url, destination, session) == 'downloaded'
+    assert read(destination) == CONTENT
+    assert not os.path.exists(destination + PART_SUFFIX)
+    assert download_file(url, destination, session) == 'skipped'
+
+
+def test_skip_without_content_length(server, session, tmp_path):
+    server.handler.send_length = False
+    destination = str(tmp_path / 'Stream-main.log')
+    url = server.base_url + 'Stream-main.log'
+    assert download_file(url, destination, session) == 'downloaded'
+    assert read(destination) == CONTENT
+    assert download_file(url, destination, session) == 'skipped'
+
+
+def test_resume_after_interrupted_download(server, session, tmp_path):
+    destination = str(tmp_path / 'Stream-main.log')
+    url = server.base_url + 'Stream-main.log'
+    server.handler.truncate_at = CHUNK_SIZE * 2 + 100
+    assert download_file(url, destination, session) == 'failed'
+    assert not os.path.exists(destination)
+    # 已写入*.part的完整数据块在续传时保留
+    assert os.path.getsize(destination + PART_SUFFIX) == CHUNK_SIZE * 2
+
+    server.handler.truncate_at = None
+    assert download_file(url, destination, session) == 'resumed'
+    assert read(destination) == CONTENT
+    assert not os.path.exists(destination + PART_SUFFIX)
+
+
+def test_complete_part_file_is_finished(server, session, tmp_path):
+    # *.part已经完整时服务器对Range返回416, 只需完成重命名
+    server.handler.send_length = False
+    destination = str(tmp_path / 'Stream-main.log')
+    with open(destination + PART_SUFFIX, 'wb') as f:
+        f.write(CONTENT)
+    assert download_file(server.base_url + 'Stream-main.log', destination, session) == 'resumed'
+    assert read(destination) == CONTENT
+
+
+def test_oversized_part_file_is_replaced(server, session, tmp_path):
+    server.handler.send_length = False
+    destination = str(tmp_path / 'Stream-main.log')
+    with open(destination + PART_SUFFIX, 'wb') as f:
+        f.write(CONTENT + b'stale')
+    assert download_file(server.base_url + 'Stream-main.log', destination, session) == 'downloaded'
+    assert read(destination) == CONTENT
+
+
+def test_missing_file_fails(server, session, tmp_path):
+    destination = str(tmp_path / 'missing.log')
+    assert download_file(server.base_url + 'missing.log', destination, session) == 'failed'
+    assert not os.path.exists(destination)
+
+
+def collect(chunks):
+    data = []
+    while True:
+        chunk = chunks.get_nowait()
+        if chunk is None:
+            return b''.join(data)
+        assert not isinstance(chunk, Exception)
+        data.append(chunk)
+
+
+def test_stream_resumes_saved_part(server, session, tmp_path):
+    # 保存原始文件时, 上次中断的*.part先从本地交给解析, 其余部分按Range续传
+    raw_path = str(tmp_path / 'Stream-main.log')
+    with open(raw_path + PART_SUFFIX, 'wb') as f:
+        f.write(CONTENT[:CHUNK_SIZE + 7])
+    chunks = queue.Queue()
+    stream_file(server.base_url + 'Stream-main.log', session, chunks, raw_path)
+    assert collect(chunks) == CONTENT
+    assert read(raw_path) == CONTENT
+    assert not os.path.exists(raw_path + PART_SUFFIX)
+
+
+def test_stream_without_raw_file(server, session):
+    chunks = queue.Queue()
+    stream_file(server.base_url + 'Stream-main.log', session, chunks)
+    assert collect(chunks) == CONTENT
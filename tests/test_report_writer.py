@@ -0,0 +1,48 @@
+import json
+import numpy as np
+import matplotlib.pyplot as plt
+from report_writer import ReportWriter
+
+
+def get_spec(fragment):
+    start = fragment.index('>', fragment.index('<script')) + 1
+    return json.loads(fragment[start:fragment.index('</script>', start)])
+
+
+def test_mpld3_fragment_with_numpy_ticks():
+    fig, ax = plt.subplots()
+    ax.plot(np.arange(5), np.arange(5) * 2.0)
+    ax.set_xticks(np.arange(5))
+    try:
+        spec = get_spec(ReportWriter.mpld3_fragment(fig))
+    finally:
+        plt.close(fig)
+    assert spec['columns']
+    for ref in spec['data'].values():
+        assert ref['length'] == 5
+
+
+def test_compact_mpld3_data_keeps_empty_rows():
+    figure_dict = {'data': {'data01': [], 'data02': [[0, 1], [1, 2]]}}
+    compacted = ReportWriter.compact_mpld3_data(figure_dict)
+    assert compacted['data']['data01'] == []
+    assert compacted['data']['data02'] == {'length': 2, 'columns': [0, 1]}
+    assert len(compacted['columns']) == 2
+
+
+def test_report_parts_are_utf8(tmp_path):
+    from show import Show
+    dir = str(tmp_path)
+    Show.draw_initial_report(dir, '内存报告')
+    try:
+        for part in range(2):
+            Show.report_part = part
+            with open(Show.get_html_path(dir), 'a', encoding='utf-8') as file:
+                file.write(Show.gen_html_content(f"分析{part}"))
+    finally:
+        Show.report_part = None
+    Show.assemble_report(dir, 2)
+    Show.finish_report(dir)
+    with open(Show.get_html_path(dir), 'rb') as f:
+        html = f.read().decode('utf-8')
+    assert '内存报告' in html and '分析0' in html and '分析1' in html
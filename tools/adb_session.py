@@ -0,0 +1,109 @@
+import queue
+import shlex
+import threading
+import subprocess
+
+# 每条命令结束后输出的标记, 后面跟着序号和命令的退出码
+END_MARKER = '__RAMUT_END__'
+
+
+class AdbSession:
+    """
+    与设备保持一个长连接的adb shell, 命令通过stdin发送, 输出由读取线程逐行放入队列,
+    避免每次采样都启动adb进程和重新握手; 会话断开后在下一条命令时自动重连
+    """
+    def __init__(self, device_id=None, adb='adb'):
+        self.device_id = device_id
+        self.command = shlex.split(adb) + (['-s', device_id] if device_id else []) + ['shell']
+        self.process = None
+        self.lines = None
+        self.sequence = 0
+        self.last_status = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace',
+                                        bufsize=1)
+        self.lines = queue.Queue()
+        threading.Thread(target=self.read_output, args=(self.process.stdout, self.lines), daemon=True).start()
+
+    @staticmethod
+    def read_output(stdout, lines):
+        for line in stdout:
+            lines.put(line)
+        # None表示shell已退出
+        lines.put(None)
+
+    def send(self, text):
+        self.process.stdin.write(text)
+        self.process.stdin.flush()
+
+    def iter_lines(self, command, timeout=30):
+        """
+        执行一条命令, 逐行返回输出, 调用方可以边读边解析
+
+        参数:
+            command: shell命令, 可以包含管道和多条命令
+            timeout: 等待每一行输出的最长秒数, 超时后关闭会话, 下次命令时重连
+        """
+        if not self.is_alive():
+            self.start()
+        self.sequence += 1
+        marker = f"{END_MARKER}{self.sequence}"
+        try:
+            self.send(f"{command}; echo {marker} $?\n")
+        except (OSError, ValueError):
+            # shell在检查之后才退出(例如设备断开), 重连后重新发送
+            self.close()
+            self.start()
+            self.send(f"{command}; echo {marker} $?\n")
+
+        finished = False
+        try:
+            while True:
+                try:
+                    line = self.lines.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No output from adb shell in {timeout}s: {command}")
+                if line is None:
+                    raise ConnectionError(f"adb shell exited: {' '.join(self.command)}")
+                index = line.find(marker)
+                if index < 0:
+                    yield line.rstrip('\r\n')
+                    continue
+                # 命令输出没有以换行结束时, 标记会和最后一行输出连在一起
+                if index > 0:
+                    yield line[:index]
+                status = line[index + len(marker):].split()
+                self.last_status = int(status[0]) if status and status[0].isdigit() else None
+                finished = True
+                return
+        finally:
+            if not finished:
+                # 输出没有读完(超时, 异常或调用方提前退出), 剩余输出会混入下一条命令, 直接关闭会话
+                self.close()
+
+    def run(self, command, timeout=30):
+        return list(self.iter_lines(command, timeout))
+
+    def close(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            if process.poll() is None:
+                process.stdin.write("exit\n")
+                process.stdin.flush()
+                process.wait(timeout=2)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+import runpy
+import argparse
+import datetime
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from log_source import LogSource
+from log_scanner import LogScanner
+from version import __version__
+
+try:
+    import resource
+except ImportError:
+    # Windows没有resource模块, 安装了psutil时使用psutil读取峰值内存
+    resource = None
+
+BYTES_PER_MB = 1024 * 1024
+
+
+def get_peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB, macOS为字节
+        return peak / 1024 if sys.platform != 'darwin' else peak / BYTES_PER_MB
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / BYTES_PER_MB
+    except (ImportError, AttributeError):
+        return None
+
+
+def get_log_extractors():
+    from killinfo_parser import KillCategoriesExtractor
+    from launchinfo_parser import LaunchInfoExtractor
+    from cpu_parser import CpuExtractor
+    from pss_parser import PssExtractor
+    return [KillCategoriesExtractor(), LaunchInfoExtractor(), CpuExtractor(), PssExtractor()]
+
+
+def run_log_scan(dir):
+    scanner = LogScanner()
+    for extractor in get_log_extractors():
+        scanner.register(extractor)
+    scanner.scan(dir)
+
+
+def run_pipeline(dir):
+    sys.argv = ['ramut.py', '-p', dir, '-r']
+    runpy.run_path(os.path.join(ROOT_DIR, 'ramut.py'), run_name='__main__')
+
+
+def run_meminfo(dir):
+    from mi_parser import ParseMeminfo
+    ParseMeminfo.parse_all_files(dir)
+
+
+def run_killinfo(dir):
+    from killinfo_parser import KillinfoParser
+    KillinfoParser.parse_kill_categories(dir)
+
+
+def run_launchinfo(dir):
+    from launchinfo_parser import LaunchInfoParser
+    LaunchInfoParser.parse_launchinfo(dir)
+
+
+def run_cpu(dir):
+    from cpu_parser import CpuParser
+    CpuParser.parse_cpu_data(dir)
+
+
+def run_pss(dir):
+    from pss_parser import PssParser
+    PssParser.parse_pss_data(dir)
+
+
+def run_version(dir):
+    from version_parser import VersionParser
+    VersionParser.parse_apk_versions_from_latest_bugreport(dir)
+
+
+def accepts_extractor(index):
+    return lambda source: get_log_extractors()[index].accepts(source.name)
+
+
+def accepts_latest_bugreport(dir):
+    from version_parser import VersionParser
+    latest = VersionParser.find_latest_bugreport_file(dir)
+    return lambda source: latest is not None and source.display_path == latest.display_path
+
+
+# 名称: (运行函数, 输入文件过滤), 输入文件用于计算lines/sec和MB/sec
+BENCHMARKS = {
+    'meminfo': (run_meminfo, lambda dir: lambda source: fnmatch.fnmatch(source.name, '*meminfo*.txt')),
+    'killinfo': (run_killinfo, lambda dir: accepts_extractor(0)),
+    'launchinfo': (run_launchinfo, lambda dir: accepts_extractor(1)),
+    'cpu': (run_cpu, lambda dir: accepts_extractor(2)),
+    'pss': (run_pss, lambda dir: accepts_extractor(3)),
+    'version': (run_version, accepts_latest_bugreport),
+    'log_scan': (run_log_scan, lambda dir: lambda source: any(e.accepts(source.name) for e in get_log_extractors())),
+    'pipeline': (run_pipeline, lambda dir: lambda source: True),
+}
+
+
+def measure_corpus(dir):
+    # 统计每个输入文件解压后的行数和字节数
+    corpus = []
+    for source in LogSource.walk(dir):
+        lines = 0
+        size = 0
+        with source.open_binary() as f:
+            for line in f:
+                lines += 1
+                size += len(line)
+        corpus.append((source, lines, size))
+    return corpus
+
+
+def measure_input(corpus, accepts):
+    selected = [(lines, size) for source, lines, size in corpus if accepts(source)]
+    return sum(lines for lines, _ in selected), sum(size for _, size in selected)
+
+
+def run_worker(name, dir):
+    # 在独立进程中运行一个基准, 使峰值内存只包含该解析器
+    func = BENCHMARKS[name][0]
+    start = time.perf_counter()
+    func(dir)
+    duration = time.perf_counter() - start
+    print(json.dumps({'seconds': duration, 'peak_rss_mb': get_peak_rss_mb()}))
+
+
+def run_benchmark(name, dir):
+    command = [sys.executable, os.path.abspath(__file__), '--worker', name, dir]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT_DIR)
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def load_history(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_delta(value, previous):
+    if previous is None or not previous.get('lines_per_sec'):
+        return ''
+    return f"{(value / previous['lines_per_sec'] - 1) * 100:+.1f}% vs {previous['version']}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the RamUT parsers and the full pipeline on a log corpus.')
+    parser.add_argument('dir', help='Corpus directory, e.g. generated by tools/gen_corpus.py')
+    parser.add_argument('-b', '--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='Benchmarks to run')
+    parser.add_argument('-o', '--history', help='JSON lines file to append results to and compare against')
+    parser.add_argument('--worker', choices=list(BENCHMARKS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.dir)
+        sys.exit(0)
+
+    history = load_history(args.history)
+    corpus = measure_corpus(args.dir)
+    results = []
+    print(f"RamUT {__version__}, corpus {args.dir}")
+    print(f"{'benchmark':<12}{'lines':>12}{'MB':>10}{'seconds':>10}{'lines/sec':>14}{'MB/sec':>10}{'peak RSS MB':>13}")
+    for name in args.benchmarks:
+        lines, size = measure_input(corpus, BENCHMARKS[name][1](args.dir))
+        measured = run_benchmark(name, args.dir)
+        if measured is None:
+            print(f"{name:<12} failed")
+            continue
+        seconds = measured['seconds']
+        result = {
+            'version': __version__,
+            'benchmark': name,
+            'lines': lines,
+            'mb': size / BYTES_PER_MB,
+            'seconds': seconds,
+            'lines_per_sec': lines / seconds if seconds else 0,
+            'mb_per_sec': size / BYTES_PER_MB / seconds if seconds else 0,
+            'peak_rss_mb': measured['peak_rss_mb'],
+        }
+        results.append(result)
+        previous = next((item for item in reversed(history) if item['benchmark'] == name), None)
+        peak = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else 'n/a'
+        print(f"{name:<12}{lines:>12,}{result['mb']:>10.1f}{seconds:>10.2f}{result['lines_per_sec']:>14,.0f}"
+              f"{result['mb_per_sec']:>10.2f}{peak:>13}  {format_delta(result['lines_per_sec'], previous)}")
+
+    if args.history:
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(args.history, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(dict(result, corpus=os.path.abspath(args.dir), timestamp=timestamp)) + "\n")
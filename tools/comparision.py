@@ -1,100 +1,260 @@
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
-import mpld3
+import sys
+import glob
 import argparse
-import html
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from data_store import DataStore, COLUMNAR_EXT
+from downsampler import Downsampler
+from report_writer import ReportWriter
+from show import Show
+from log_utils import log
+
+# 长格式数据(每行一个进程的一个采样), 比较前按(时间, 进程)转换为宽格式: (进程列, 数值列)
+LONG_FORMATS = [('process', 'percent'), ('package', 'pss')]
+# 图例超过该数量的运行时不再显示
+MAX_LEGEND_RUNS = 20
+
 
 class Comparison:
-    def __init__(self, excel_list):
+    """
+    多次运行结果的比较: 同一类数据文件(例如各设备的*_launch_info.parquet)逐个延迟加载,
+    按相对时间(距首个采样的小时数)对齐, 一次向量化计算各运行每一列的统计值,
+    只绘制各运行间差异最大的top_k个指标, 其余指标以表格列出
+    """
+    def __init__(self, excel_list, top_k=12, output_dir=None):
         self.excel_list = excel_list
-    
-    def gen_html_content(self, h1: str):
-        # 将HTML代码嵌入到HTML模板中
-        template = """
-        <html>
-        <head>
-        <title>RamUT Report</title>
-        </head>
-        <body>
-        <h1>{}</h1>
-        <div></div>
-        </body>
-        </html>
-        """
-        # Sanitize the input to prevent HTML injection
-        sanitized_h1 = html.escape(h1)
-        try:
-            output = template.format(sanitized_h1)
-        except Exception as e:
-            # Handle any potential exceptions during string formatting
-            output = template.format("Error: Invalid input")
-        return output
+        self.top_k = top_k
+        self.output_dir = output_dir or os.getcwd()
+        self.run_names = Comparison.get_run_names(excel_list)
 
-    def compare(self):
-        df_dict = {}
-        for excel_path in self.excel_list:
-            df = pd.read_excel(excel_path)
-            dir_name = os.path.basename(os.path.dirname(excel_path))
-            df_dict[dir_name] = df
-        
-        # 获取所有 df_dict 的列名
-        all_columns = set()
-        for dir_name, df in df_dict.items():
-            all_columns.update(df.columns)
-            
-        # 过滤掉非数值的列
-        numeric_columns = set()
-        for column in all_columns:
-            if pd.api.types.is_numeric_dtype(df_dict[next(iter(df_dict))][column]):
-                numeric_columns.add(column)
-        all_columns = numeric_columns
-        
-        # 计算子图的行数和列数
-        num_plots = len(all_columns)
-        rows = (num_plots + 1) // 2
-        cols = 2
-        
-        # 创建子图
-        fig, axs = plt.subplots(rows, cols, figsize=(12, 6 * rows))
-
-        markers = 'o'
-        # 对每一列进行比较并绘制曲线图
-        for index,column in enumerate(all_columns):
-            row = index // 2
-            coloum = (index) %2
-            if rows > 1:
-                ax = axs[row][coloum]
+    @staticmethod
+    def get_run_names(paths):
+        # 以数据文件所在目录名作为运行名, 重名时加上序号
+        names = []
+        for path in paths:
+            name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            if name in names:
+                name = f"{name}#{len(names)}"
+            names.append(name)
+        return names
+
+    @staticmethod
+    def expand_paths(paths, pattern=None):
+        # 目录按pattern查找数据文件, 便于一次比较几十上百次运行
+        result = []
+        for path in paths:
+            if os.path.isdir(path) and pattern:
+                result += sorted(glob.glob(os.path.join(path, '**', pattern), recursive=True))
             else:
-                ax = axs[coloum]
-            ax.set_title(column)
+                result.append(path)
+        return result
+
+    @staticmethod
+    def get_data_path(path):
+        # Excel优先使用同名的列式文件, 可以只读取需要的列
+        if os.path.splitext(path)[1].lower() in ('.xlsx', '.xls'):
+            columnar_path = DataStore.get_columnar_path(path)
+            if os.path.exists(columnar_path):
+                return columnar_path
+        return path
+
+    @staticmethod
+    def load_run(path, columns=None):
+        """
+        读取一次运行的数据并转换为宽格式
+
+        参数:
+            path: 数据文件路径(parquet/pkl/xlsx)
+            columns: 只保留的数值列, None表示全部
+
+        返回:
+            (相对时间, 数值列DataFrame)
+        """
+        path = Comparison.get_data_path(path)
+        if columns is not None and path.endswith('.parquet'):
+            df = Comparison.read_parquet_columns(path, columns)
+        else:
+            df = DataStore.load(path)
+        time_axis, df = Comparison.to_wide(df)
+        if columns is not None:
+            df = df.reindex(columns=[column for column in columns if column in df.columns])
+        return time_axis, df
+
+    @staticmethod
+    def read_parquet_columns(path, columns):
+        import pyarrow.parquet as pq
+        names = pq.read_schema(path).names
+        if any(key in names and value in names for key, value in LONG_FORMATS):
+            # 长格式的列名是进程名, 需要读取完整数据再转换
+            return pd.read_parquet(path)
+        # 只读取时间列(第一列)和需要的数值列
+        selected = [names[0]] + [name for name in names[1:] if name in columns]
+        return pd.read_parquet(path, columns=selected)
+
+    @staticmethod
+    def get_time_column(df):
+        for column in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[column]):
+                return column
+        return None
+
+    @staticmethod
+    def to_wide(df):
+        """
+        转换为按时间排列的数值列, 时间转换为距首个采样的小时数, 没有时间列时使用采样序号
+        """
+        time_column = Comparison.get_time_column(df)
+        for key, value in LONG_FORMATS:
+            if time_column is not None and key in df.columns and value in df.columns:
+                df = df.pivot_table(index=time_column, columns=key, values=value, aggfunc='mean', observed=True)
+                df.columns = df.columns.astype(str)
+                df = df.reset_index()
+                break
+
+        if time_column is not None:
+            df = df.sort_values(time_column, kind='stable')
+            times = df[time_column]
+            time_axis = (times - times.min()).dt.total_seconds().to_numpy() / 3600
+        else:
+            time_axis = np.arange(len(df), dtype=float)
+        numeric = df.select_dtypes(include='number')
+        numeric.columns = numeric.columns.astype(str)
+        return pd.Series(time_axis, name='hours'), numeric.reset_index(drop=True)
 
-            for dir_name, df in df_dict.items():
-                if column in df.columns:
-                    ax.plot(df[column], label=f'{dir_name}', marker=markers)
-            
-            # 显示图例
-            ax.legend()
+    @staticmethod
+    def compute_run_stats(df: pd.DataFrame):
+        # 一次计算所有列的统计值, 结果每列一行
+        values = df.to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            count = np.sum(~np.isnan(values), axis=0)
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+            first = df.bfill().iloc[0].to_numpy(dtype=float) if len(df) else np.full(df.shape[1], np.nan)
+            last = df.ffill().iloc[-1].to_numpy(dtype=float) if len(df) else np.full(df.shape[1], np.nan)
+            minimum = np.nanmin(values, axis=0) if len(df) else np.full(df.shape[1], np.nan)
+            maximum = np.nanmax(values, axis=0) if len(df) else np.full(df.shape[1], np.nan)
+        return pd.DataFrame({'column': df.columns, 'count': count, 'mean': mean, 'std': std, 'min': minimum,
+                             'max': maximum, 'first': first, 'last': last})
 
-        for ax in axs.flatten():
-            ax.tick_params(axis='x', labelrotation=30)
-        
+    def collect_stats(self):
+        """
+        逐个加载运行并计算统计值, 同一时间只有一次运行的数据在内存中
+
+        返回:
+            长格式统计表, 每行为(运行, 列)
+        """
+        stats = []
+        for name, path in zip(self.run_names, self.excel_list):
+            try:
+                _, df = Comparison.load_run(path)
+            except Exception as e:
+                log.warning(f"Failed to load {path}: {e}")
+                continue
+            run_stats = Comparison.compute_run_stats(df)
+            run_stats.insert(0, 'run', name)
+            stats.append(run_stats)
+        if not stats:
+            return pd.DataFrame(columns=['run', 'column', 'count', 'mean', 'std', 'min', 'max', 'first', 'last'])
+        return pd.concat(stats, ignore_index=True)
+
+    @staticmethod
+    def rank_divergence(stats: pd.DataFrame):
+        """
+        按各运行均值的变异系数(标准差/均值的绝对值)衡量差异, 从大到小排序;
+        所有列的并集参与比较, 只在部分运行中出现的列也会保留
+        """
+        means = stats.pivot_table(index='column', columns='run', values='mean', aggfunc='first')
+        values = means.to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            center = np.nanmean(values, axis=1)
+            spread = np.nanstd(values, axis=1)
+            divergence = np.where(np.abs(center) > 0, spread / np.abs(center), np.where(spread > 0, np.inf, 0.0))
+        valid = ~np.isnan(values)
+        min_index = np.argmin(np.where(valid, values, np.inf), axis=1)
+        max_index = np.argmax(np.where(valid, values, -np.inf), axis=1)
+        runs = means.columns.to_numpy()
+        rows = np.arange(len(values))
+        result = pd.DataFrame({
+            'column': means.index,
+            'runs': valid.sum(axis=1),
+            'divergence': divergence,
+            'mean': center,
+            'min_run': runs[min_index],
+            'min_mean': values[rows, min_index],
+            'max_run': runs[max_index],
+            'max_mean': values[rows, max_index],
+        })
+        return result.sort_values('divergence', ascending=False, kind='stable').reset_index(drop=True)
+
+    def draw_top_metrics(self, columns):
+        """
+        绘制差异最大的指标, 每个运行只加载一次且只读取这些列
+        """
+        rows = (len(columns) + 1) // 2
+        fig, axs = plt.subplots(rows, 2, figsize=(12, 5 * rows), squeeze=False)
+        axes = dict(zip(columns, axs.flatten()))
+        for name, path in zip(self.run_names, self.excel_list):
+            try:
+                time_axis, df = Comparison.load_run(path, columns)
+            except Exception as e:
+                log.warning(f"Failed to load {path}: {e}")
+                continue
+            for column in df.columns:
+                x_values, y_values = Downsampler.downsample(time_axis, df[column])
+                axes[column].plot(x_values, y_values, label=name)
+
+        show_legend = len(self.run_names) <= MAX_LEGEND_RUNS
+        for column, ax in axes.items():
+            ax.set_title(column)
+            ax.set_xlabel('hours')
+            if show_legend and ax.lines:
+                ax.legend()
+        for ax in axs.flatten()[len(columns):]:
+            ax.set_visible(False)
         plt.tight_layout()
-        
-        h1 = f"Comparison of {self.excel_list}"
-        html_content = self.gen_html_content(h1)
-        dir = os.getcwd()
-        html_path = os.path.join(dir, 'Comparison_Report.html')
-        with open(html_path, 'w') as file:
-            file.write(html_content)
-            mpld3.save_html(fig, file)
-        
-        
+        fragment = ReportWriter.mpld3_fragment(fig)
+        plt.close(fig)
+        return fragment
+
+    def compare(self):
+        stats = self.collect_stats()
+        ranking = Comparison.rank_divergence(stats)
+        # 只有一个运行有数据的列无法比较, 不参与绘图
+        comparable = ranking[ranking['runs'] > 1]
+        top_columns = comparable['column'].head(self.top_k).tolist()
+
+        html_path = os.path.join(self.output_dir, 'Comparison_Report.html')
+        with open(html_path, 'w', encoding='utf-8') as file:
+            file.write(Show.gen_html_title(f"Comparison of {len(self.run_names)} runs\n" + "\n".join(self.run_names[:10])))
+            if top_columns:
+                file.write(Show.gen_html_content(f"Top {len(top_columns)} divergent metrics"))
+                file.write(self.draw_top_metrics(top_columns))
+            rest = ranking[~ranking['column'].isin(top_columns)]
+            if len(rest):
+                file.write(Show.gen_html_content("Other metrics"))
+                file.write(rest.to_html(index=False, float_format=lambda value: f"{value:.3f}"))
+        ReportWriter.finish(html_path)
+
+        DataStore.save(ranking, os.path.join(self.output_dir, 'Comparison_Summary.xlsx'))
+        return ranking
+
+
 if __name__ == "__main__":
     #excel_files = ['D:/github/ramct/downloads/paros/U4UQ34.50-3/N1PR160214/N1PR160214_launch_info.xlsx', 'D:/github/ramct/downloads/paros/N1PR160188/N1PR160188_launch_info.xlsx']
-    parser = argparse.ArgumentParser(description='Compare Excel files.')
-    parser.add_argument('-p', '--paths', nargs='+', help='List of Excel file paths', required=True)
+    parser = argparse.ArgumentParser(description='Compare the results of multiple runs.')
+    parser.add_argument('-p', '--paths', nargs='+', help='Data files (parquet/pkl/xlsx) or directories to search', required=True)
+    parser.add_argument('-g', '--glob', help='File pattern to search in directories, e.g. "*_launch_info' + COLUMNAR_EXT + '"')
+    parser.add_argument('-k', '--top', type=int, default=12, help='Number of most divergent metrics to plot')
+    parser.add_argument('-o', '--output', help='Output directory, default is the current directory')
     args = parser.parse_args()
-    
-    comparison = Comparison(args.paths)
-    comparison.compare()
\ No newline at end of file
+
+    comparison = Comparison(Comparison.expand_paths(args.paths, args.glob), args.top, args.output)
+    comparison.compare()
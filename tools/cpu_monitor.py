@@ -1,112 +1,103 @@
-import subprocess
 import time
-import matplotlib.pyplot as plt
+import argparse
 from datetime import datetime
+from adb_session import AdbSession
+from sample_buffer import SampleRecorder
 
 class CpuMonitor:
-    def __init__(self, process_name, device_id=None):
+    def __init__(self, process_names, device_id=None, adb='adb', spill_path=None, capacity=10000, spill_every=60,
+                 live=False):
         super().__init__()
-        self.process_name = process_name
+        if isinstance(process_names, str):
+            process_names = [process_names]
+        self.process_names = list(process_names)
         self.device_id = device_id
-        self.pid = self.get_pid_from_name(process_name)
-        self.total_cpu_values = []
-        
-    def get_pid_from_name(self, process_name):
-        if self.device_id:
-            cmd = f"adb -s {self.device_id} shell ps -e | grep {process_name}"
-        else:
-            cmd = f"adb shell ps -e | grep {process_name}"
-        
-        # 使用 subprocess 模块执行命令
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        # 检查命令是否成功执行
-        if result.returncode != 0:
-            print(f"Error executing command: {result.stderr}")
-            return None
-        
-        # 读取命令的输出
-        lines = result.stdout.strip().split('\n')
-        
-        if not lines:
-            print(f"No output from command: {cmd}")
-            return None
-        
-        # 解析第一行的第二列
-        parts = lines[0].split()
-        if len(parts) < 2:
-            print(f"Unexpected output format: {lines[0]}")
-            return None
-        
-        pid = parts[1]
-        print(f"Process ID={pid}")
-        return pid
-    
+        # 所有采样共用一个adb shell会话
+        self.session = AdbSession(device_id, adb)
+        self.pids = self.get_pids()
+        # 最近的采样保存在定长缓冲区中, 完整历史定期追加写入spill_path
+        if spill_path is None:
+            spill_path = f"cpu_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.recorder = SampleRecorder(self.process_names, spill_path, 'CPU usage over time', 'CPU usage (%)', capacity,
+                                       spill_every, live)
+        self.total_cpu_values = self.recorder.buffer
+
+    def get_pids(self):
+        # 一次ps输出中查找所有目标进程, 优先完全匹配进程名
+        pids = {}
+        for line in self.session.iter_lines("ps -e"):
+            parts = line.split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                continue
+            for name in self.process_names:
+                if parts[-1] == name or (name not in pids and name in line):
+                    pids[name] = parts[1]
+        for name in self.process_names:
+            print(f"{name}: Process ID={pids.get(name)}")
+        return pids
+
+    def read_cpu(self):
+        """
+        一次top调用读取所有目标进程的CPU占用(%), 边读边解析
+        """
+        names = {pid: name for name, pid in self.pids.items()}
+        result = {}
+        if not names:
+            return result
+        for line in self.session.iter_lines(f"top -b -n 1 -p {','.join(names)}"):
+            parts = line.split()
+            if len(parts) > 8 and parts[0] in names:
+                try:
+                    result[names[parts[0]]] = float(parts[8])
+                except ValueError:
+                    print(f"Error: parts[8] ('{parts[8]}') cannot be converted to float")
+        return result
+
     def get_cpu(self):
-        if not self.pid:
-            print("PID is not available")
-            return None
-        
-        if self.device_id:
-            cmd = f"adb -s {self.device_id} shell top -n1 -p {self.pid}"
-        else:
-            cmd = f"adb shell top -n1 -p {self.pid}"
-        
-        # 使用 subprocess 模块执行命令
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        # 检查命令是否成功执行
-        if result.returncode != 0:
-            print(f"Error executing command: {result.stderr}")
+        timestamp = int(time.time() * 1000)
+        current_time = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        try:
+            result = self.read_cpu()
+        except (TimeoutError, ConnectionError) as e:
+            print(f"Error executing command: {e}")
             return None
-        
-        # 读取命令的输出
-        lines = result.stdout.strip().split('\n')
-        
-        for line in lines:
-            if self.process_name in line:
-                parts = line.split()
-                if len(parts) > 8:
-                    try:
-                        cpu_usage = float(parts[8])
-                        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        print(f"cpu usage={cpu_usage} at {current_time}")
-                        self.total_cpu_values.append((current_time, cpu_usage))
-                        return cpu_usage
-                    except ValueError:
-                        print(f"Error: parts[8] ('{parts[8]}') cannot be converted to float")
-                        return None
-        
-        print("CPU value not found in the output")
-        return None
-    
-    def monitor_and_plot(self):
+
+        for name, cpu_usage in result.items():
+            print(f"{name}: cpu usage={cpu_usage} at {current_time}")
+        self.recorder.record(timestamp, result)
+        missing = [name for name in self.process_names if name not in result]
+        if missing:
+            # 进程可能已重启, 下次采样前重新获取PID
+            print(f"CPU value not found for {', '.join(missing)}")
+            self.pids = self.get_pids()
+        return result
+
+    def monitor(self, interval=1):
+        # 按固定节拍采样, 扣除命令本身的耗时
+        next_sample = time.monotonic()
         try:
             while True:
                 self.get_cpu()
-                time.sleep(1)
+                next_sample += interval
+                time.sleep(max(0, next_sample - time.monotonic()))
         except KeyboardInterrupt:
             print("Monitoring stopped by user")
-        
-        if self.total_cpu_values:
-            times, values = zip(*self.total_cpu_values)
-            plt.plot(times, values, label=self.process_name)
-            plt.xlabel('Time')
-            plt.ylabel('CPU usage (%)')
-            plt.title('CPU usage over time')
-            # 选择性地显示 x 轴标签
-            num_labels = 10  # 显示的标签数量
-            if len(times) > num_labels:
-                step = len(times) // num_labels
-                plt.xticks(range(0, len(times), step), times[::step], rotation=45)
-            else:
-                plt.xticks(rotation=45)
-            plt.legend()
-            plt.tight_layout()
-            plt.show()
-        else:
-            print("No data to plot")
-            
+        finally:
+            self.session.close()
+            self.recorder.close()
+
 if __name__ == "__main__":
-    monitor = CpuMonitor("lmkd")
-    monitor.monitor_and_plot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Monitor the CPU usage of processes over one adb shell session.')
+    parser.add_argument('-p', '--processes', nargs='+', default=["lmkd"], help='Process names')
+    parser.add_argument('-s', '--serial', help='Device serial')
+    parser.add_argument('-i', '--interval', type=float, default=1, help='Seconds between samples')
+    parser.add_argument('-o', '--output', help='CSV file the samples are appended to')
+    parser.add_argument('--capacity', type=int, default=10000, help='Number of recent samples kept in memory')
+    parser.add_argument('--spill-every', type=int, default=60, help='Append samples to the CSV file every N samples')
+    parser.add_argument('--live', action='store_true', help='Show a live chart')
+    parser.add_argument('--adb', default='adb', help='adb command, e.g. "python tools/fake_adb.py" for local testing')
+    args = parser.parse_args()
+
+    monitor = CpuMonitor(args.processes, args.serial, args.adb, args.output, args.capacity, args.spill_every,
+                         args.live)
+    monitor.monitor(args.interval)
@@ -0,0 +1,135 @@
+import re
+import sys
+import shlex
+import time
+import random
+import argparse
+
+# 本地模拟adb, 用于在没有设备时测试pss_monitor/cpu_monitor:
+#   python tools/pss_monitor.py -p com.motorola.launcher3 lmkd --adb "python tools/fake_adb.py"
+# 支持 adb [-s serial] shell [command], 不带命令时作为交互shell从stdin逐行读取命令
+# 模拟的命令: ps -e/-A, dumpsys meminfo [pid], top -b -n 1 -p pid1,pid2, echo, exit, 以及 "| grep [-E] pattern"
+
+PROCESSES = [
+    ('root', 1, 'init'), ('lmkd', 612, 'lmkd'), ('system', 1705, 'system_server'),
+    ('u0_a123', 2961, 'com.android.systemui'), ('u0_a88', 3120, 'com.motorola.launcher3'),
+    ('u0_a150', 4410, 'com.android.chrome'), ('radio', 2011, 'com.android.phone'),
+]
+
+
+def split_outside_quotes(command, separator):
+    # 按分隔符拆分, 忽略引号中的分隔符(例如grep -E "a|b")
+    return re.split(re.escape(separator) + r'(?=(?:[^"\']*["\'][^"\']*["\'])*[^"\']*$)', command)
+
+
+class FakeDevice:
+    def __init__(self, seed=0):
+        self.start = time.time()
+        self.random = random.Random(seed)
+        self.base_pss = {pid: self.random.randint(2000, 300000) for _, pid, _ in PROCESSES}
+
+    def get_pss(self, pid):
+        # 内存随运行时间缓慢增长并带有抖动
+        elapsed = time.time() - self.start
+        return int(self.base_pss[pid] + elapsed * 10 + self.random.randint(-500, 500))
+
+    def ps(self, args):
+        lines = ["USER            PID   PPID     VSZ    RSS WCHAN            ADDR S NAME"]
+        for user, pid, name in PROCESSES:
+            lines.append(f"{user:<12}{pid:>7}{1:>7}{12345678:>8}{5000:>7} 0                   0 S {name}")
+        return lines, 0
+
+    def dumpsys(self, args):
+        if args[:1] != ['meminfo']:
+            return [f"Can't find service: {' '.join(args[:1])}"], 0
+        lines = ["Applications Memory Usage (in Kilobytes):", f"Uptime: {int((time.time() - self.start) * 1000)} Realtime: 0", ""]
+        targets = [arg for arg in args[1:] if not arg.startswith('-')]
+        if not targets:
+            lines.append("Total PSS by process:")
+            for user, pid, name in sorted(PROCESSES, key=lambda item: self.get_pss(item[1]), reverse=True):
+                lines.append(f"    {self.get_pss(pid):>10,}K: {name} (pid {pid})")
+            lines += ["", "Total PSS by OOM adjustment:", f"    {sum(self.get_pss(pid) for _, pid, _ in PROCESSES):,}K: Native"]
+            return lines, 0
+        for target in targets:
+            process = next((item for item in PROCESSES if str(item[1]) == target or item[2] == target), None)
+            if process is None:
+                lines.append(f"No process found for: {target}")
+                continue
+            pss = self.get_pss(process[1])
+            lines += [f"** MEMINFO in pid {process[1]} [{process[2]}] **",
+                      "                   Pss  Private  Private  SwapPss      Rss     Heap     Heap     Heap",
+                      f"  Native Heap    {pss // 4:>6}   {pss // 4:>6}        0        0   {pss // 3:>6}        0        0        0",
+                      f"           TOTAL PSS:   {pss:>8}            TOTAL RSS:   {pss * 2:>8}       TOTAL SWAP PSS:      100", ""]
+        return lines, 0
+
+    def top(self, args):
+        pids = None
+        for index, arg in enumerate(args):
+            if arg == '-p' and index + 1 < len(args):
+                pids = set(args[index + 1].split(','))
+        lines = ["Tasks: 7 total,   1 running,   6 sleeping,   0 stopped,   0 zombie",
+                 "  PID USER         PR  NI VIRT  RES  SHR S[%CPU] %MEM     TIME+ ARGS"]
+        for user, pid, name in PROCESSES:
+            if pids is None or str(pid) in pids:
+                cpu = self.random.uniform(0, 40)
+                lines.append(f"{pid:>5} {user:<12} 20   0  12G 100M  50M S {cpu:>5.1f}   1.2   0:01.00 {name}")
+        return lines, 0
+
+    def execute(self, command, status):
+        # 处理一条命令及其管道中的grep
+        stages = [stage.strip() for stage in split_outside_quotes(command, '|')]
+        args = shlex.split(stages[0].replace('$?', str(status)))
+        if not args:
+            return [], status
+        handler = {'ps': self.ps, 'dumpsys': self.dumpsys, 'top': self.top}.get(args[0])
+        if args[0] == 'echo':
+            lines, status = [' '.join(args[1:])], 0
+        elif handler is not None:
+            lines, status = handler(args[1:])
+        else:
+            return [f"/system/bin/sh: {args[0]}: inaccessible or not found"], 127
+        for stage in stages[1:]:
+            grep = shlex.split(stage)
+            if not grep or grep[0] != 'grep':
+                return [f"/system/bin/sh: {grep[0] if grep else ''}: inaccessible or not found"], 127
+            pattern = ' '.join(arg for arg in grep[1:] if not arg.startswith('-'))
+            lines = [line for line in lines if re.search(pattern, line)]
+            status = 0 if lines else 1
+        return lines, status
+
+    def execute_line(self, line, status=0):
+        output = []
+        for command in split_outside_quotes(line, ';'):
+            lines, status = self.execute(command, status)
+            output += lines
+        return output, status
+
+
+def run_shell(device, command):
+    if command:
+        lines, status = device.execute_line(' '.join(command))
+        print("\n".join(lines))
+        return status
+    status = 0
+    for line in sys.stdin:
+        if line.strip() == 'exit':
+            break
+        lines, status = device.execute_line(line.strip(), status)
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stand-in for adb, serving fake ps/dumpsys/top output.')
+    parser.add_argument('-s', '--serial', help='Device serial, ignored')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('subcommand', choices=['shell', 'devices'])
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.subcommand == 'devices':
+        print("List of devices attached\nFAKE0001\tdevice")
+        sys.exit(0)
+    sys.exit(run_shell(FakeDevice(args.seed), args.command))
@@ -0,0 +1,193 @@
+import os
+import gzip
+import random
+import argparse
+import datetime
+
+BYTES_PER_MB = 1024 * 1024
+
+# 各类OOM adj及对应的meminfo分类
+OOM_CATEGORIES = [
+    (-1000, 'Native'), (-900, 'System'), (-800, 'Persistent'), (-700, 'PersistentService'),
+    (0, 'Foreground'), (100, 'Visible'), (200, 'Perceptible'), (250, 'PerceptibleMedium'), (900, 'Cached'),
+]
+KILL_ADJS = [0, 100, 200, 250, 300, 500, 600, 700, 800, 900, 905, 915, 925, 935, 945, 955, 999]
+LAUNCH_TYPES = [('cold', 'ca'), ('warm', 'wa'), ('hot', 'ha'), ('wp', 'ca')]
+
+NOISE_LINES = [
+    "{ts}  1234  1250 D WifiStateMachine: handleMessage what=131155 arg1=0 arg2=0",
+    "{ts}  2000  2011 I chatty  : uid=10123({pkg}) identical 4 lines",
+    "{ts}  1705  1730 W PackageManager: Failed to resolve intent for {pkg}",
+    "{ts}   612   612 E SELinux : avc:  denied  {{ find }} for pid=4001 uid=10123 name=vendor.service",
+    "{ts}  1705  3060 I am_on_resume_called: [0,{pkg}.MainActivity,RESUME_ACTIVITY]",
+    "{ts}  1402  1402 D BatteryService: level:87, scale:100, status:2, health:2, present:true, voltage: 4301",
+]
+
+
+def gen_packages(count):
+    packages = ['system', 'com.android.systemui', 'com.android.phone', 'com.android.bluetooth']
+    packages += [f"com.vendor.app{index}" for index in range(count - len(packages))]
+    return packages
+
+
+class Clock():
+    # 日志时间戳, 每行前进固定的时间
+    def __init__(self, start, step_ms):
+        self.now = start
+        self.step = datetime.timedelta(milliseconds=step_ms)
+
+    def tick(self):
+        self.now += self.step
+        return self.now.strftime('%m-%d %H:%M:%S.%f')[:-3]
+
+
+def open_output(path, compress):
+    if compress:
+        return gzip.open(path + '.gz', 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def write_until(f, target_bytes, gen_line):
+    written = 0
+    while written < target_bytes:
+        line = gen_line() + "\n"
+        f.write(line)
+        written += len(line)
+
+
+def gen_events_line(clock, packages, hit_ratio):
+    ts = clock.tick()
+    pkg = random.choice(packages)
+    if random.random() >= hit_ratio:
+        return random.choice(NOISE_LINES).format(ts=ts, pkg=pkg)
+    kind = random.random()
+    pid = random.randint(1000, 30000)
+    if kind < 0.2:
+        adj = random.choice(KILL_ADJS)
+        return (f"{ts}   723   723 I killinfo: [{pid},10448,{adj},201,173576,14,93812,638636,34000,1436,53000,4288,2664712,478784,"
+                f"584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,29268,254540,5,10,"
+                f"2.730000,1.010000,3.010000,0.650000,11.110000]")
+    if kind < 0.4:
+        return f"{ts}  1705  3060 I am_kill : [0,{pid},{pkg},{random.choice(KILL_ADJS)},empty #17]"
+    if kind < 0.8:
+        pss = random.randint(20000, 600000) * 1024
+        return f"{ts}  1705  3060 I am_pss  : [{pid},10123,{pkg},{pss},{pss // 2},0,{pss + 4096},0,0,0]"
+    if kind < 0.9:
+        return f"{ts}  1705  3060 I am_proc_died: [0,{pid},{pkg},{random.choice(KILL_ADJS)},19]"
+    return f"{ts}  1705  3060 I am_proc_start: [0,{pid},10412,{pkg},service,{{{pkg}/.Service}}]"
+
+
+def gen_system_lines(clock, packages, hit_ratio):
+    # 一次CPU统计会输出一行TOTAL和多行进程占用, 以列表返回
+    ts = clock.tick()
+    pkg = random.choice(packages)
+    if random.random() >= hit_ratio:
+        return [random.choice(NOISE_LINES).format(ts=ts, pkg=pkg)]
+    kind = random.random()
+    if kind < 0.5:
+        lines = [f"{ts}  1903  2548 I ActivityManager: {random.randint(10, 90)}% TOTAL: {random.randint(5, 50)}% user + "
+                 f"{random.randint(1, 30)}% kernel + {random.randint(0, 9)}.{random.randint(0, 9)}% iowait + 1.4% irq + 0.2% softirq"]
+        for process in random.sample(packages, min(10, len(packages))):
+            lines.append(f"{ts}  1903  2548 I ActivityManager:   {random.randint(0, 60)}% {random.randint(100, 30000)}/{process}: "
+                         f"59% user + 27% kernel / faults: 32766 minor 5353 major")
+        return lines
+    if kind < 0.8:
+        process_type, activity_type = random.choice(LAUNCH_TYPES)
+        return [f"{ts}  1784  2473 I LaunchCheckinHandler: MotoDisplayed {pkg}/{pkg}.MainActivity,"
+                f"{process_type},{activity_type},{random.randint(100, 3000)}"]
+    return [f"{ts}  2961  6067 D AppOptManager: onTopAppStateChanged pkg={pkg}, top= {random.choice(['true', 'false'])}"]
+
+
+def write_stream_files(out_dir, prefix, count, size_mb, start, packages, hit_ratio, compress, gen_lines):
+    clock = Clock(start, 50)
+    for index in range(1, count + 1):
+        path = os.path.join(out_dir, f"{prefix}_{index:04d}.txt")
+        with open_output(path, compress) as f:
+            write_until(f, size_mb * BYTES_PER_MB, lambda: "\n".join(gen_lines(clock, packages, hit_ratio)))
+
+
+def format_kb(value):
+    return f"{value:,}K"
+
+
+def write_meminfo_files(out_dir, count, interval_minutes, start, packages):
+    """
+    生成dumpsys meminfo快照, 部分进程的内存随时间增长, 用于触发异常检测
+    """
+    base = {pkg: random.randint(20000, 300000) for pkg in packages}
+    leaking = set(random.sample(packages, max(1, len(packages) // 10)))
+    groups = {}
+    for index, pkg in enumerate(packages):
+        groups.setdefault(OOM_CATEGORIES[index % len(OOM_CATEGORIES)][1], []).append(pkg)
+
+    for snapshot in range(count):
+        now = start + datetime.timedelta(minutes=snapshot * interval_minutes)
+        sizes = {pkg: base[pkg] + (snapshot * 3000 if pkg in leaking else random.randint(-5000, 5000)) for pkg in packages}
+        lines = ["Applications Memory Usage (in Kilobytes):", f"Uptime: {snapshot * 60000} Realtime: {snapshot * 60000}", "",
+                 "Total PSS by process:"]
+        for pkg in sorted(packages, key=sizes.get, reverse=True):
+            lines.append(f"    {format_kb(sizes[pkg])}: {pkg} (pid {1000 + packages.index(pkg)})")
+        lines += ["", "Total PSS by OOM adjustment:"]
+        for _, category in OOM_CATEGORIES:
+            members = groups.get(category, [])
+            lines.append(f"    {format_kb(sum(sizes[pkg] for pkg in members))}: {category}")
+            for pkg in sorted(members, key=sizes.get, reverse=True):
+                lines.append(f"        {format_kb(sizes[pkg])}: {pkg} (pid {1000 + packages.index(pkg)})")
+        total = sum(sizes.values())
+        lines += ["", "Total PSS by category:", f"    {format_kb(total // 4)}: Dalvik", "",
+                  "Total RAM: 7,777,000K (status normal)",
+                  f" Free RAM: {format_kb(2000000 - snapshot * 100)} (   30,000K cached pss +  2,000,000K cached kernel +     0K free)",
+                  f" Used RAM: {format_kb(total)} ({format_kb(total)} used pss +   1,000,000K kernel)",
+                  " Lost RAM:   100,000K",
+                  "     ZRAM:   200,000K physical used for   600,000K in swap ( 4,000,000K total swap)",
+                  "   Tuning: 256 (large 512), oom   322,560K, restore limit   107,520K (high-end-gfx)", ""]
+        path = os.path.join(out_dir, f"meminfo_{now.strftime('%Y-%m-%d_%H_%M_%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+
+def write_bugreport(out_dir, size_mb, start, packages):
+    path = os.path.join(out_dir, f"bugreport-{start.strftime('%Y-%m-%d')}.txt")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("== dumpstate: " + start.strftime('%Y-%m-%d %H:%M:%S') + "\n")
+        filler = "    [persist.sys.dalvik.vm.lib.2]: [libart.so] [ro.build.fingerprint]: [vendor/device:14/U1.0/1234:user/release-keys]\n"
+        write_until(f, size_mb * BYTES_PER_MB // 2, lambda: filler.rstrip("\n"))
+        f.write("DUMP OF SERVICE package:\n")
+        for index, pkg in enumerate(packages):
+            f.write(f"  Package [{pkg}] ({index:08x}):\n    userId={10000 + index}\n    pkg=Package{{{index:08x} {pkg}}}\n"
+                    f"    versionCode={index + 1} minSdk=28 targetSdk=34\n    versionName={1 + index % 5}.{index}.0\n")
+        write_until(f, size_mb * BYTES_PER_MB // 2, lambda: filler.rstrip("\n"))
+
+
+def gen_corpus(out_dir, stream_files=2, stream_mb=20, meminfo=100, interval=5, processes=40, bugreport_mb=10,
+               hit_ratio=0.05, compress=False, seed=0):
+    random.seed(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    start = datetime.datetime(2024, 9, 1, 0, 0, 0)
+    packages = gen_packages(processes)
+    write_stream_files(out_dir, 'Stream-e', stream_files, stream_mb, start, packages, hit_ratio, compress,
+                       lambda clock, packages, hit_ratio: [gen_events_line(clock, packages, hit_ratio)])
+    write_stream_files(out_dir, 'Stream-s', stream_files, stream_mb, start, packages, hit_ratio, compress, gen_system_lines)
+    write_meminfo_files(out_dir, meminfo, interval, start, packages)
+    write_bugreport(out_dir, bugreport_mb, start, packages)
+    with open(os.path.join(out_dir, 'version.txt'), 'w', encoding='utf-8') as f:
+        f.write("U1.0-SYNTHETIC\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic log corpus in the formats the RamUT parsers expect.')
+    parser.add_argument('out_dir', help='Output directory')
+    parser.add_argument('--stream-files', type=int, default=2, help='Number of Stream-e and Stream-s files each')
+    parser.add_argument('--stream-mb', type=int, default=20, help='Size of each Stream file in MB')
+    parser.add_argument('--meminfo', type=int, default=100, help='Number of meminfo snapshots')
+    parser.add_argument('--interval', type=int, default=5, help='Minutes between meminfo snapshots')
+    parser.add_argument('--processes', type=int, default=40, help='Number of processes')
+    parser.add_argument('--bugreport-mb', type=int, default=10, help='Size of the bugreport in MB')
+    parser.add_argument('--hit-ratio', type=float, default=0.05, help='Ratio of log lines the parsers extract')
+    parser.add_argument('--gz', action='store_true', help='Compress Stream files with gzip')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    gen_corpus(args.out_dir, args.stream_files, args.stream_mb, args.meminfo, args.interval, args.processes,
+               args.bugreport_mb, args.hit_ratio, args.gz, args.seed)
+    print(f"Corpus written to {args.out_dir}")
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_matcher import LineMatcher
+from killinfo_parser import KillCategoriesExtractor
+from launchinfo_parser import LaunchInfoExtractor
+from cpu_parser import CpuExtractor
+from pss_parser import PssExtractor
+
+SAMPLE_LINES = [
+    "01-18 17:13:33.654   723   723 I killinfo: [23908,10448,915,201,173576,14,93812,638636,34000,1436,53000,4288,2664712,478784,584484,540460,211764,374244,84116,332916,88448,119632,0,0,840,1016,104,11,0,29268,254540,5,10,2.730000,1.010000,3.010000,0.650000,11.110000]",
+    "11-26 10:08:09.369  1705  3060 I am_kill : [0,23332,com.google.android.apps.photos,200,crash]",
+    "09-02 10:00:01.123  1705  3060 I am_pss  : [4512,10123,com.android.chrome,312345600,250000000,0,330000000,0,0,0]",
+    "08-11 23:48:36.443  1903  2548 I ActivityManager: 25% TOTAL: 12% user + 10% kernel + 0.2% iowait + 1.4% irq + 0.2% softirq",
+    "09-15 13:41:42.204  2439  2857 I ActivityManager:   87% 9727/com.tencent.mm: 59% user + 27% kernel / faults: 32766 minor 5353 major",
+    "08-03 11:53:46.077  1784  2473 I LaunchCheckinHandler: MotoDisplayed com.google.android.dialer/com.android.dialer.incall.activity.ui.InCallActivity,wp,ca,261",
+]
+
+NOISE_LINES = [
+    "09-02 10:00:01.123  1234  1250 D WifiStateMachine: handleMessage what=131155 arg1=0 arg2=0",
+    "09-02 10:00:01.124  2000  2011 I chatty  : uid=10123(com.android.chrome) identical 4 lines",
+    "09-02 10:00:01.125  1705  1730 W PackageManager: Failed to resolve intent for com.example.app",
+    "09-02 10:00:01.126   612   612 E SELinux : avc:  denied  { find } for pid=4001 uid=10123 name=vendor.service",
+    "09-02 10:00:01.127  1705  3060 I am_on_resume_called: [0,com.android.launcher3.Launcher,RESUME_ACTIVITY]",
+]
+
+
+def gen_lines(count, hit_ratio):
+    random.seed(0)
+    lines = []
+    for _ in range(count):
+        if random.random() < hit_ratio:
+            lines.append(random.choice(SAMPLE_LINES) + "\n")
+        else:
+            lines.append(random.choice(NOISE_LINES) + "\n")
+    return lines
+
+
+def read_lines(paths):
+    lines = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines.extend(f)
+    return lines
+
+
+def collect_rules():
+    rules = []
+    for extractor in (KillCategoriesExtractor(), LaunchInfoExtractor(), CpuExtractor(), PssExtractor()):
+        rules.extend(extractor.rules())
+    return rules
+
+
+def run_naive(lines, rules):
+    # 旧方式: 每一行都运行所有捕获正则
+    count = 0
+    for line in lines:
+        for keyword, pattern, handler in rules:
+            if pattern.search(line):
+                count += 1
+    return count
+
+
+def run_matcher(lines, rules):
+    matched = []
+    matcher = LineMatcher((keyword, pattern, matched.append) for keyword, pattern, handler in rules).compile()
+    for line in lines:
+        matcher.feed(line)
+    return len(matched)
+
+
+def measure(name, func, lines, rules):
+    start = time.perf_counter()
+    count = func(lines, rules)
+    duration = time.perf_counter() - start
+    print(f"{name:<10} matches={count:<10} {duration:8.3f}s  {len(lines) / duration:14,.0f} lines/sec")
+    return duration
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark keyword prefilter against per-line regex search.')
+    parser.add_argument('-f', '--files', nargs='+', help='Log files to benchmark with, synthetic lines are used if omitted')
+    parser.add_argument('-n', '--lines', type=int, default=1000000, help='Number of synthetic lines')
+    parser.add_argument('-r', '--hit-ratio', type=float, default=0.01, help='Ratio of synthetic lines that can match')
+    args = parser.parse_args()
+
+    lines = read_lines(args.files) if args.files else gen_lines(args.lines, args.hit_ratio)
+    rules = collect_rules()
+    print(f"{len(lines)} lines, {len(rules)} rules")
+    naive = measure('naive', run_naive, lines, rules)
+    matcher = measure('prefilter', run_matcher, lines, rules)
+    print(f"speedup: {naive / matcher:.1f}x")
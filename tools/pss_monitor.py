@@ -1,108 +1,121 @@
-import subprocess
+import re
 import time
-import matplotlib.pyplot as plt
+import argparse
 from datetime import datetime
+from adb_session import AdbSession
+from sample_buffer import SampleRecorder
+
+# dumpsys meminfo 汇总中的一行: "    123,456K: com.foo (pid 1234 / activities)"
+TOTAL_PSS_BY_PROCESS = re.compile(r'^\s*([\d,]+)K: (\S+) \(pid (\d+)')
+
 
 class PssMonitor:
-    def __init__(self, process_name, device_id=None):
+    def __init__(self, process_names, device_id=None, adb='adb', spill_path=None, capacity=10000, spill_every=60,
+                 live=False):
         super().__init__()
-        self.process_name = process_name
+        if isinstance(process_names, str):
+            process_names = [process_names]
+        self.process_names = list(process_names)
         self.device_id = device_id
-        self.pid = self.get_pid_from_name(process_name)
-        self.total_pss_values = []
-        
-    def get_pid_from_name(self, process_name):
-        if self.device_id:
-            cmd = f"adb -s {self.device_id} shell ps -e | grep {process_name}"
-        else:
-            cmd = f"adb shell ps -e | grep {process_name}"
-        
-        # 使用 subprocess 模块执行命令
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        # 检查命令是否成功执行
-        if result.returncode != 0:
-            print(f"Error executing command: {result.stderr}")
-            return None
-        
-        # 读取命令的输出
-        lines = result.stdout.strip().split('\n')
-        
-        if not lines:
-            print(f"No output from command: {cmd}")
-            return None
-        
-        # 解析第一行的第二列
-        parts = lines[0].split()
-        if len(parts) < 2:
-            print(f"Unexpected output format: {lines[0]}")
-            return None
-        
-        pid = parts[1]
-        print(f"Process ID={pid}")
-        return pid
+        # 所有采样共用一个adb shell会话
+        self.session = AdbSession(device_id, adb)
+        self.pids = self.get_pids()
+        # 最近的采样保存在定长缓冲区中, 完整历史定期追加写入spill_path
+        if spill_path is None:
+            spill_path = f"pss_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.recorder = SampleRecorder(self.process_names, spill_path, 'Total PSS over time', 'Total PSS', capacity,
+                                       spill_every, live)
+        self.total_pss_values = self.recorder.buffer
+
+    def get_pids(self):
+        # 一次ps输出中查找所有目标进程, 优先完全匹配进程名
+        pids = {}
+        for line in self.session.iter_lines("ps -e"):
+            parts = line.split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                continue
+            for name in self.process_names:
+                if parts[-1] == name or (name not in pids and name in line):
+                    pids[name] = parts[1]
+        for name in self.process_names:
+            print(f"{name}: Process ID={pids.get(name)}")
+        return pids
+
+    def read_total_pss(self):
+        """
+        一次dumpsys meminfo调用读取所有目标进程的PSS(KB), 边读边解析
+        单个进程时只dump该进程, 多个进程时解析"Total PSS by process"汇总
+        """
+        result = {}
+        if len(self.process_names) == 1:
+            name = self.process_names[0]
+            pid = self.pids.get(name)
+            if not pid:
+                return result
+            for line in self.session.iter_lines(f"dumpsys meminfo {pid}"):
+                if "TOTAL PSS:" in line:
+                    parts = line.split()
+                    if len(parts) > 2:
+                        result[name] = int(parts[2])
+            return result
+
+        in_section = False
+        for line in self.session.iter_lines("dumpsys meminfo"):
+            if line.startswith("Total PSS by process"):
+                in_section = True
+            elif in_section and not line.strip():
+                in_section = False
+            elif in_section:
+                match = TOTAL_PSS_BY_PROCESS.match(line)
+                if match and match.group(2) in self.process_names:
+                    result[match.group(2)] = int(match.group(1).replace(',', ''))
+        return result
 
     def get_total_pss(self):
-        if not self.pid:
-            print("PID is not available")
-            return None
-        
-        if self.device_id:
-            cmd = f"adb -s {self.device_id} shell dumpsys meminfo {self.pid}"
-        else:
-            cmd = f"adb shell dumpsys meminfo {self.pid}"
-        
-        # 使用 subprocess 模块执行命令
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        # 检查命令是否成功执行
-        if result.returncode != 0:
-            print(f"Error executing command: {result.stderr}")
+        timestamp = int(time.time() * 1000)
+        current_time = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        try:
+            result = self.read_total_pss()
+        except (TimeoutError, ConnectionError) as e:
+            print(f"Error executing command: {e}")
             return None
-        
-        # 读取命令的输出
-        lines = result.stdout.strip().split('\n')
-        
-        for line in lines:
-            if "TOTAL PSS:" in line:
-                parts = line.split()
-                if len(parts) > 1:
-                    total_pss = int(parts[2])
-                    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"Total PSS={total_pss} at {current_time}")
-                    self.total_pss_values.append((current_time, total_pss))
-                    return total_pss
-        
-        print("TOTAL PSS not found in the output")
-        return None
 
-    def monitor_and_plot(self):
+        for name, total_pss in result.items():
+            print(f"{name}: Total PSS={total_pss} at {current_time}")
+        self.recorder.record(timestamp, result)
+        missing = [name for name in self.process_names if name not in result]
+        if missing:
+            # 进程可能已重启, 下次采样前重新获取PID
+            print(f"TOTAL PSS not found for {', '.join(missing)}")
+            self.pids = self.get_pids()
+        return result
+
+    def monitor(self, interval=3):
+        # 按固定节拍采样, 扣除命令本身的耗时
+        next_sample = time.monotonic()
         try:
             while True:
                 self.get_total_pss()
-                time.sleep(3)
+                next_sample += interval
+                time.sleep(max(0, next_sample - time.monotonic()))
         except KeyboardInterrupt:
             print("Monitoring stopped by user")
-        
-        if self.total_pss_values:
-            times, values = zip(*self.total_pss_values)
-            plt.plot(times, values, label=self.process_name)
-            plt.xlabel('Time')
-            plt.ylabel('Total PSS')
-            plt.title('Total PSS over time')
-            # 选择性地显示 x 轴标签
-            num_labels = 10  # 显示的标签数量
-            if len(times) > num_labels:
-                step = len(times) // num_labels
-                plt.xticks(range(0, len(times), step), times[::step], rotation=45)
-            else:
-                plt.xticks(rotation=45)
-            plt.legend()
-            plt.tight_layout()
-            plt.show()
-        else:
-            print("No data to plot")
+        finally:
+            self.session.close()
+            self.recorder.close()
 
 if __name__ == "__main__":
-    monitor = PssMonitor("com.motorola.launcher3")
-    monitor.monitor_and_plot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Monitor the total PSS of processes over one adb shell session.')
+    parser.add_argument('-p', '--processes', nargs='+', default=["com.motorola.launcher3"], help='Process names')
+    parser.add_argument('-s', '--serial', help='Device serial')
+    parser.add_argument('-i', '--interval', type=float, default=3, help='Seconds between samples')
+    parser.add_argument('-o', '--output', help='CSV file the samples are appended to')
+    parser.add_argument('--capacity', type=int, default=10000, help='Number of recent samples kept in memory')
+    parser.add_argument('--spill-every', type=int, default=60, help='Append samples to the CSV file every N samples')
+    parser.add_argument('--live', action='store_true', help='Show a live chart')
+    parser.add_argument('--adb', default='adb', help='adb command, e.g. "python tools/fake_adb.py" for local testing')
+    args = parser.parse_args()
+
+    monitor = PssMonitor(args.processes, args.serial, args.adb, args.output, args.capacity, args.spill_every,
+                         args.live)
+    monitor.monitor(args.interval)
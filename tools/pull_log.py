@@ -1,74 +1,333 @@
-
 import requests
+import io
 import os
+import sys
+import queue
+import argparse
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
-import gzip
-
-def download_file(url, destination):
-    response = requests.get(url, stream=True)
-    if response.status_code == 200:
-        with open(destination, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    file.write(chunk)
-        print(f"文件已下载: {destination}")
-    else:
-        print(f"下载失败: {url}")
-
-def download_all_files(base_url, destination_folder):
-    if not os.path.exists(destination_folder):
-        os.makedirs(destination_folder)
-    
-    response = requests.get(base_url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for link in soup.find_all('a', href=True):
-            file_url = urljoin(base_url, link['href'])
-            print(f"正在下载: {file_url}")
-            if file_url.endswith('/'):  # 如果是目录，则递归下载
-                pass
-                # dir_name = file_url.split('/')[-2]
-                # if dir_name not in exclude_dirs:
-                #     sub_folder = os.path.join(destination_folder, dir_name)
-                #     download_all_files(file_url, sub_folder, exclude_dirs)
-                # else:
-                #     print(f"跳过目录: {file_url}")
-            else:  # 如果是文件，则下载
-                file_name = file_url.split('/')[-1]
-                if 'Stream' in file_name or 'meminfo' in file_name:
-                    destination_path = os.path.join(destination_folder, file_name)
-                    download_file(file_url, destination_path)
-    else:
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 每次读取1MB, 减少小块写入的系统调用
+CHUNK_SIZE = 1024 * 1024
+# 未下载完成的文件先写入*.part, 完成后重命名, 中断后可以按Range续传
+PART_SUFFIX = '.part'
+DEFAULT_WORKERS = 8
+# 流式解析时每个文件最多预读的块数, 限制下载领先于解析时的内存占用
+STREAM_QUEUE_CHUNKS = 16
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+print_lock = threading.Lock()
+
+
+def log_message(message):
+    # 多线程下载时避免输出交错
+    with print_lock:
+        print(message)
+
+
+def create_session(pool_size=DEFAULT_WORKERS):
+    """
+    所有下载共用一个Session, 连接池中的keep-alive连接可以被复用
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods=('HEAD', 'GET'))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_remote_size(session, url):
+    try:
+        response = session.head(url, allow_redirects=True, timeout=30)
+    except requests.RequestException:
+        return None
+    # 内容被压缩传输时Content-Length不是文件大小
+    if response.status_code != 200 or response.headers.get('Content-Encoding'):
+        return None
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def get_range_total(response):
+    # Content-Range: "bytes 100-199/200"或416响应中的"bytes */200", 返回文件总大小
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+@contextlib.contextmanager
+def request_from(session, url, offset):
+    """
+    从offset开始请求url, 供下载和流式解析共用的Range续传逻辑
+
+    返回(上下文):
+        (response, offset, total): offset为实际的起始位置, 服务器不支持Range或*.part比文件大时为0;
+        total为Content-Range中的文件大小; offset处文件已经完整(416)时response为None
+    """
+    while True:
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        with session.get(url, stream=True, headers=headers, timeout=60) as response:
+            if response.status_code == 416 and offset:
+                total = get_range_total(response)
+                if total != offset:
+                    # *.part比服务器上的文件大, 从头下载
+                    log_message(f"续传位置无效: {url}, {offset}/{total} bytes, 重新下载")
+                    offset = 0
+                    continue
+                # *.part已经完整, 只是上次没有完成重命名
+                yield None, offset, total
+                return
+            if response.status_code not in (200, 206):
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            # 服务器不支持Range时返回200, 从头下载
+            if response.status_code == 206:
+                yield response, offset, get_range_total(response)
+            else:
+                yield response, 0, None
+            return
+
+
+def download_file(url, destination, session=None):
+    """
+    下载一个文件: 本地文件大小与服务器一致时跳过, 存在未完成的*.part时按Range续传
+    完整下载的文件才会从*.part重命名, 服务器没有返回大小时已存在的本地文件也视为完整
+
+    返回:
+        'skipped', 'downloaded', 'resumed' 或 'failed'
+    """
+    session = session or create_session(1)
+    remote_size = get_remote_size(session, url)
+    if os.path.exists(destination) and (remote_size is None or os.path.getsize(destination) == remote_size):
+        log_message(f"已存在, 跳过: {destination}")
+        return 'skipped'
+
+    part_path = destination + PART_SUFFIX
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if remote_size is not None and offset > remote_size:
+        offset = 0
+    try:
+        with request_from(session, url, offset) as (response, offset, total):
+            if remote_size is None:
+                remote_size = total
+            if response is not None:
+                with open(part_path, 'ab' if offset else 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+    except requests.RequestException as e:
+        log_message(f"下载失败: {url}, {e}")
+        return 'failed'
+
+    if remote_size is not None and os.path.getsize(part_path) != remote_size:
+        log_message(f"下载不完整: {url}, {os.path.getsize(part_path)}/{remote_size} bytes")
+        return 'failed'
+    os.replace(part_path, destination)
+    log_message(f"文件已下载: {destination}")
+    return 'resumed' if offset else 'downloaded'
+
+
+def list_files(base_url, session=None):
+    """
+    解析目录页面, 返回需要下载的Stream*/meminfo*文件的URL
+    """
+    session = session or create_session(1)
+    response = session.get(base_url, timeout=60)
+    if response.status_code != 200:
         print(f"无法访问目录: {base_url}")
+        return []
+    file_urls = []
+    soup = BeautifulSoup(response.text, 'html.parser')
+    for link in soup.find_all('a', href=True):
+        file_url = urljoin(base_url, link['href'])
+        if file_url.endswith('/'):  # 目录不递归下载
+            continue
+        file_name = file_url.split('/')[-1]
+        if 'Stream' in file_name or 'meminfo' in file_name:
+            file_urls.append(file_url)
+    return file_urls
+
 
+def download_all_files(base_url, destination_folder, session=None, workers=DEFAULT_WORKERS):
+    return download_tasks(list_tasks([(base_url, destination_folder)], session), session, workers)
 
 
-def unzip_all_gz_files(directory):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.gz'):
-                gz_file_path = os.path.join(root, file)
-                output_file_path = os.path.join(root, file[:-3])  # Remove the '.gz' extension
-                
-                with gzip.open(gz_file_path, 'rb') as f_in:
-                    with open(output_file_path, 'wb') as f_out:
-                        f_out.write(f_in.read())
-                
-                print(f"解压完成: {gz_file_path} -> {output_file_path}")
-                # 删除原文件
-                os.remove(gz_file_path)
-                print(f"删除原文件: {gz_file_path}")
+def list_tasks(folders, session=None):
+    # folders: (目录URL, 本地目录), 返回所有(文件URL, 本地路径)
+    session = session or create_session(1)
+    tasks = []
+    for base_url, destination_folder in folders:
+        os.makedirs(destination_folder, exist_ok=True)
+        for file_url in list_files(base_url, session):
+            tasks.append((file_url, os.path.join(destination_folder, file_url.split('/')[-1])))
+    return tasks
+
+
+def download_tasks(tasks, session=None, workers=DEFAULT_WORKERS):
+    """
+    并发下载, 返回各结果的数量
+    """
+    session = session or create_session(workers)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(download_file, file_url, destination, session) for file_url, destination in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result] = results.get(result, 0) + 1
+    return results
+
+
+class ChunkStream(io.RawIOBase):
+    """
+    由下载线程放入队列的数据块组成的只读流, 解析线程边下载边读取
+    """
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = memoryview(b'')
+        self.position = 0
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def next_chunk(self):
+        chunk = self.chunks.get()
+        if chunk is None:
+            self.finished = True
+        elif isinstance(chunk, Exception):
+            self.finished = True
+            raise OSError(f"Download failed: {chunk}")
+        else:
+            self.buffer = memoryview(chunk)
+
+    def readinto(self, b):
+        while not self.buffer and not self.finished:
+            self.next_chunk()
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        self.position += size
+        return size
+
+    def drain(self):
+        # 解析提前结束(例如出错)时读完剩余数据, 避免下载线程阻塞在已满的队列上
+        while not self.finished:
+            try:
+                self.next_chunk()
+            except OSError:
+                pass
+        self.buffer = memoryview(b'')
+
+
+def stream_file(url, session, chunks, raw_path=None):
+    """
+    下载线程: 数据块依次放入队列, 结束时放入None, 出错时放入异常;
+    raw_path不为空时同时保存原始文件, 存在未完成的*.part时按Range续传, 已保存的部分从本地读取
+    """
+    part_path = raw_path + PART_SUFFIX if raw_path else None
+    offset = os.path.getsize(part_path) if part_path and os.path.exists(part_path) else 0
+    try:
+        with request_from(session, url, offset) as (response, offset, _):
+            if offset:
+                with open(part_path, 'rb') as saved:
+                    for chunk in iter(lambda: saved.read(CHUNK_SIZE), b''):
+                        chunks.put(chunk)
+            if response is not None:
+                with open(part_path, 'ab' if offset else 'wb') if raw_path else contextlib.nullcontext() as raw:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if raw is not None:
+                            raw.write(chunk)
+                        chunks.put(chunk)
+        if raw_path:
+            os.replace(part_path, raw_path)
+        chunks.put(None)
+    except (requests.RequestException, OSError) as e:
+        log_message(f"下载失败: {url}, {e}")
+        chunks.put(e)
+
+
+def is_streamable(file_name):
+    # 由日志提取器解析的文件(Stream*等)可以边下载边解析, 其他文件(meminfo)仍需下载到本地
+    from killinfo_parser import KillCategoriesExtractor
+    from launchinfo_parser import LaunchInfoExtractor
+    from cpu_parser import CpuExtractor
+    from pss_parser import PssExtractor
+    name = file_name[:-3] if file_name.lower().endswith('.gz') else file_name
+    extractors = (KillCategoriesExtractor, LaunchInfoExtractor, CpuExtractor, PssExtractor)
+    return any(keyword in name for extractor in extractors for keyword in extractor.file_keywords)
+
+
+def feed_streams(scanner, tasks, session, workers=DEFAULT_WORKERS, keep_raw=False):
+    """
+    ramut.py的log_feed: 最多workers个文件同时下载, 按文件名顺序边下载边交给scanner解析;
+    keep_raw时原始文件同时保存到本地, 已保存过的文件直接从本地读取
+    """
+    from log_source import LogSource
+    tasks = iter(sorted(tasks, key=lambda task: task[1]))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            task = next(tasks, None)
+            if task is None:
+                return
+            file_url, destination = task
+            if keep_raw and os.path.exists(destination):
+                pending.append((file_url, destination, None))
+                return
+            chunks = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+            executor.submit(stream_file, file_url, session, chunks, destination if keep_raw else None)
+            pending.append((file_url, destination, ChunkStream(chunks)))
+
+        for _ in range(workers):
+            submit_next()
+        while pending:
+            file_url, destination, stream = pending.popleft()
+            if stream is None:
+                scanner.feed(LogSource(destination))
+            else:
+                log_message(f"正在解析: {file_url}")
+                scanner.scan_stream(os.path.basename(destination), stream, file_url)
+                stream.drain()
+            submit_next()
+
+
+def ingest_folders(tasks, session, workers=DEFAULT_WORKERS, keep_raw=False, settings=None):
+    """
+    流式解析模式: 每个本地目录对应一次ramut.py的完整流程;
+    meminfo等文件先下载到本地, 日志文件边下载边解析, 只保存解析结果(和可选的原始文件)
+
+    参数:
+        settings: 覆盖ramut.DEFAULT_SETTINGS的解析设置, 例如incremental, export_excel, jobs
+    """
+    import ramut
+    folders = {}
+    for file_url, destination in tasks:
+        folders.setdefault(os.path.dirname(destination), []).append((file_url, destination))
+    summaries = []
+    for folder, folder_tasks in folders.items():
+        stream_tasks = [task for task in folder_tasks if is_streamable(os.path.basename(task[1]))]
+        download_tasks([task for task in folder_tasks if task not in stream_tasks], session, workers)
+        folder_settings = dict(ramut.DEFAULT_SETTINGS, **(settings or {}), dir=folder)
+        log_feed = partial(feed_streams, tasks=stream_tasks, session=session, workers=workers, keep_raw=keep_raw)
+        summaries.append(ramut.run_device(folder_settings, log_feed))
+    return summaries
+
 
 if __name__ == '__main__':
-    DOWNLOAD_FOLDER = "./downloads"
-    if not os.path.exists(DOWNLOAD_FOLDER):
-        os.makedirs(DOWNLOAD_FOLDER)
-        
     url_list = [
         # Glory
         "http://stability-logger2.lenovo.com/dumpsys_meminfo/NZ4C240007/2024-09-02/",
-         
+
         "http://stability-logger2.lenovo.com/dumpsys_meminfo/NZ4C240007/2024-09-03/",
         "http://stability-logger2.lenovo.com/dumpsys_meminfo/NZ4C240007/2024-09-04/",
         "http://stability-logger2.lenovo.com/dumpsys_meminfo/NZ4C240007/2024-09-05/",
@@ -78,13 +337,34 @@ if __name__ == '__main__':
         "http://stability-logger2.lenovo.com/APlogs/NZ4C240007/2024-09-05/",
 
     ]
-    for base_url in url_list:
+    parser = argparse.ArgumentParser(description='Download Stream and meminfo logs from the log server.')
+    parser.add_argument('urls', nargs='*', default=url_list, help='Directory URLs, .../<device_id>/<date>/')
+    parser.add_argument('-o', '--output', default="./downloads", help='Download folder')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_WORKERS, help='Number of concurrent downloads')
+    parser.add_argument('--ingest', action='store_true',
+                        help='Parse logs while they download and generate the RamUT report in each folder')
+    parser.add_argument('--keep-raw', action='store_true', help='With --ingest, also save the downloaded log files')
+    parser.add_argument('-x', '--export-excel', action='store_true', help='With --ingest, also export Excel files')
+    parser.add_argument('-r', '--rebuild', action='store_true', help='With --ingest, ignore the incremental manifest')
+    parser.add_argument('-m', '--concurrent', action='store_true',
+                        help='With --ingest, run the analysis sections in parallel processes')
+    parser.add_argument('--parse-jobs', type=int, default=1, help='With --ingest, processes for parsing meminfo files')
+    args = parser.parse_args()
+
+    folders = []
+    for base_url in args.urls:
         device_id = base_url.split('/')[-3]
         date_folder = base_url.split('/')[-2]
         # 目标文件夹
-        destination_folder = os.path.join(DOWNLOAD_FOLDER, device_id, date_folder)
-
-        # 下载所有文件
-        download_all_files(base_url, destination_folder)
+        folders.append((base_url, os.path.join(args.output, device_id, date_folder)))
 
-        #unzip_all_gz_files(destination_folder)
\ No newline at end of file
+    # 所有目录的文件放入同一个下载队列
+    session = create_session(args.jobs)
+    if args.ingest:
+        settings = {'export_excel': args.export_excel, 'incremental': not args.rebuild,
+                    'concurrent': args.concurrent, 'jobs': max(1, args.parse_jobs)}
+        summaries = ingest_folders(list_tasks(folders, session), session, args.jobs, args.keep_raw, settings)
+        print(f"解析完成: {summaries}")
+    else:
+        results = download_tasks(list_tasks(folders, session), session, args.jobs)
+        print(f"下载完成: {results}")
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+
+
+class RingBuffer:
+    """
+    定长的采样环形缓冲区: 时间为epoch毫秒(int64, 与EventStore一致), 每个采样一行, 每个进程一列(float64, 缺失为NaN)
+    写满后覆盖最旧的采样, 内存占用与运行时长无关
+    """
+    def __init__(self, names, capacity=10000):
+        self.names = list(names)
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(self.names)), np.nan)
+        # 累计写入的采样数, 写入位置为total % capacity
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, values: dict):
+        index = self.total % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = [values.get(name, np.nan) for name in self.names]
+        self.total += 1
+
+    def get_range(self, start):
+        """
+        返回从第start个(累计序号)采样到最新采样的(时间, 值), 按时间顺序;
+        已被覆盖的采样不再返回
+        """
+        start = max(start, self.total - self.capacity)
+        indices = np.arange(start, self.total) % self.capacity
+        return self.times[indices], self.values[indices]
+
+    def snapshot(self):
+        return self.get_range(0)
+
+
+class SampleRecorder:
+    """
+    长时间监控的采样记录: 采样写入RingBuffer, 每spill_every个采样追加写入CSV文件(完整历史, time列为epoch毫秒),
+    可选的实时图表只更新已有曲线的数据
+    """
+    def __init__(self, names, spill_path, title, ylabel, capacity=10000, spill_every=60, live=False):
+        self.buffer = RingBuffer(names, capacity)
+        self.spill_path = spill_path
+        self.spill_every = min(spill_every, capacity)
+        self.spilled = 0
+        self.title = title
+        self.ylabel = ylabel
+        self.live = live
+        self.fig = None
+        self.lines = None
+        if not os.path.exists(spill_path) or os.path.getsize(spill_path) == 0:
+            with open(spill_path, 'w', encoding='utf-8') as f:
+                f.write(",".join(['time'] + self.buffer.names) + "\n")
+
+    def record(self, timestamp, values: dict):
+        self.buffer.append(timestamp, values)
+        if self.buffer.total - self.spilled >= self.spill_every:
+            self.spill()
+        if self.live:
+            self.update_chart()
+
+    def spill(self):
+        times, values = self.buffer.get_range(self.spilled)
+        if len(times):
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                np.savetxt(f, np.column_stack([times, values]), fmt=['%d'] + ['%.10g'] * values.shape[1], delimiter=',')
+        self.spilled = self.buffer.total
+
+    def create_chart(self):
+        self.fig, ax = plt.subplots(figsize=(12, 6))
+        self.lines = [ax.plot([], [], label=name)[0] for name in self.buffer.names]
+        ax.xaxis_date()
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M:%S'))
+        ax.set_xlabel('Time')
+        ax.set_ylabel(self.ylabel)
+        ax.set_title(self.title)
+        ax.legend()
+        ax.tick_params(axis='x', labelrotation=45)
+        self.fig.tight_layout()
+
+    def refresh_lines(self):
+        times, values = self.buffer.snapshot()
+        x_values = mdates.date2num(times.astype('datetime64[ms]'))
+        for index, line in enumerate(self.lines):
+            line.set_data(x_values, values[:, index])
+        ax = self.fig.axes[0]
+        ax.relim()
+        ax.autoscale_view()
+
+    def update_chart(self):
+        if self.fig is None:
+            plt.ion()
+            self.create_chart()
+        self.refresh_lines()
+        self.fig.canvas.draw_idle()
+        plt.pause(0.001)
+
+    def close(self):
+        """
+        写入剩余采样, 并把缓冲区中最近的采样保存为图片(完整历史在CSV中)
+        """
+        self.spill()
+        if not len(self.buffer):
+            print("No data to plot")
+            return
+        if self.fig is None:
+            self.create_chart()
+        self.refresh_lines()
+        png_path = os.path.splitext(self.spill_path)[0] + '.png'
+        self.fig.savefig(png_path)
+        plt.close(self.fig)
+        print(f"Samples saved to {self.spill_path}, chart saved to {png_path}")
@@ -1,6 +1,11 @@
 import re
 import os
-from typing import Dict, List, Optional, Tuple
+import mmap
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+from log_source import LogSource
+from parse_manifest import ParseManifest
+from perf import Perf
 
 class VersionParser:
     """
@@ -8,15 +13,67 @@ class VersionParser:
     所有方法均为类方法，无需实例化即可使用
     """
     
-    # 预编译正则表达式，提升性能
-    _VERSION_PATTERN = re.compile(
-        r'Package\s+\[([^\]]+)\].*?versionName=([^\s\n]+)',
-        re.DOTALL
-    )
+    # 预编译正则表达式，提升性能; 只匹配单行内的包名或版本号, 不会跨越大段内容回溯
+    # 两个正则分别以字面量开头, 可以快速跳过无关内容, 比合并成一个交替正则快得多
+    _PACKAGE_PATTERN = re.compile(rb'Package[ \t]+\[([^\]\r\n]+)\]')
+    _VERSION_NAME_PATTERN = re.compile(rb'versionName=(\S+)')
     
     # 默认文件编码
     DEFAULT_ENCODING = 'utf-8'
 
+    # 流式读取时每次读取的字节数
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    # 增量解析清单中的缓存键
+    CACHE_KEY = 'apk_versions'
+
+    # 本进程内已解析过的bugreport: (路径, 大小, 修改时间) -> 版本字典
+    _versions_cache: Dict[Tuple[str, int, float], Dict[str, str]] = {}
+
+    @classmethod
+    def _scan_tokens(cls, buffer, versions: Dict[str, str], package: Optional[str], encoding: str) -> Optional[str]:
+        """
+        状态机: 遇到"Package [name]"时记录当前包名, 之后遇到的第一个"versionName="即为该包的版本
+        
+        返回:
+            扫描结束时仍在等待版本号的包名
+        """
+        # 按出现位置合并两类匹配
+        matches = heapq.merge(cls._PACKAGE_PATTERN.finditer(buffer),
+                              cls._VERSION_NAME_PATTERN.finditer(buffer),
+                              key=lambda match: match.start())
+        for match in matches:
+            if match.re is cls._PACKAGE_PATTERN:
+                package = match.group(1).decode(encoding, errors='ignore').strip()
+            elif package is not None:
+                versions[package] = match.group(1).decode(encoding, errors='ignore').strip()
+                package = None
+        return package
+
+    @classmethod
+    def extract_apk_versions_from_chunks(cls, chunks: Iterable[bytes], encoding: str = DEFAULT_ENCODING) -> Dict[str, str]:
+        """
+        从按块读取的bugreport字节流中提取APK版本信息
+        每块只扫描到最后一个换行符, 剩余的半行并入下一块, 内存占用与文件大小无关
+        
+        参数:
+            chunks: bugreport的字节块
+            encoding: 包名和版本号的解码格式
+            
+        返回:
+            字典格式: {packageName: versionName}
+        """
+        versions = {}
+        package = None
+        tail = b''
+        for chunk in chunks:
+            data = tail + chunk
+            cut = data.rfind(b'\n') + 1
+            package = cls._scan_tokens(memoryview(data)[:cut], versions, package, encoding)
+            tail = data[cut:]
+        cls._scan_tokens(tail, versions, package, encoding)
+        return versions
+
     @classmethod
     def extract_apk_versions(cls, bugreport_content: str, encoding: str = DEFAULT_ENCODING) -> Dict[str, str]:
         """
@@ -24,60 +81,112 @@ class VersionParser:
         
         参数:
             bugreport_content: bugreport文件内容
-            encoding: 文件编码格式（保留参数，实际由调用方处理）
+            encoding: 文件编码格式
             
         返回:
             字典格式: {packageName: versionName}
         """
-        matches = cls._VERSION_PATTERN.findall(bugreport_content)
-        return {pkg.strip(): ver.strip() for pkg, ver in matches}
-    
+        content = bugreport_content.encode(encoding, errors='ignore')
+        return cls.extract_apk_versions_from_chunks([content], encoding)
+
     @classmethod
-    def _get_file_mtime(cls, file_path: str) -> Tuple[float, str]:
+    def read_apk_versions(cls, source: LogSource, encoding: str = DEFAULT_ENCODING, use_mmap: bool = True) -> Dict[str, str]:
+        """
+        以流的方式从bugreport文件中提取APK版本信息
+        
+        参数:
+            source: bugreport对应的日志来源
+            encoding: 文件编码格式
+            use_mmap: 普通文件是否通过mmap读取, 压缩文件始终以流的方式解压读取
+            
+        返回:
+            字典格式: {packageName: versionName}
+        """
+        if use_mmap and source.member is None and not source.compressed and source.get_size() > 0:
+            # 正则直接在mmap上扫描, 由操作系统按需换入页面
+            versions = {}
+            with open(source.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                cls._scan_tokens(mm, versions, None, encoding)
+            return versions
+        with source.open_binary() as f:
+            return cls.extract_apk_versions_from_chunks(iter(lambda: f.read(cls.CHUNK_SIZE), b''), encoding)
+
+    @classmethod
+    def _get_file_mtime(cls, source: LogSource) -> Tuple[float, str, LogSource]:
         """
         获取文件修改时间和路径的元组
         
         参数:
-            file_path: 文件路径
+            source: 日志来源（普通文件或压缩包中的成员）
             
         返回:
-            (修改时间, 文件路径) 元组
+            (修改时间, 文件路径, 日志来源) 元组
         """
-        return (os.path.getmtime(file_path), file_path)
+        return (source.get_mtime(), source.display_path, source)
 
     @classmethod
-    def find_latest_bugreport_file(cls, directory: str) -> Optional[str]:
+    def find_latest_bugreport_file(cls, directory: str) -> Optional[LogSource]:
         """
-        查找目录中最后一个（最新的）bugreport文件
+        查找目录中最后一个（最新的）bugreport文件，包括.gz和.zip中的bugreport
         
         参数:
             directory: 要搜索的目录路径
             
         返回:
-            最新的bugreport文件完整路径，如果没有找到返回None
+            最新的bugreport文件对应的LogSource，如果没有找到返回None
         """
         bugreport_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if (file.lower().startswith('bugreport') and 
-                    file.lower().endswith('.txt')):
-                    file_path = os.path.join(root, file)
-                    bugreport_files.append(cls._get_file_mtime(file_path))
+        for source in LogSource.walk(directory):
+            file = source.name
+            if (file.lower().startswith('bugreport') and 
+                file.lower().endswith('.txt')):
+                bugreport_files.append(cls._get_file_mtime(source))
         
         # 按修改时间降序排序，取最新的
         if bugreport_files:
-            bugreport_files.sort(reverse=True)
-            return bugreport_files[0][1]
+            bugreport_files.sort(key=lambda item: item[:2], reverse=True)
+            return bugreport_files[0][2]
         return None
 
     @classmethod
-    def parse_apk_versions_from_latest_bugreport(cls, directory: str, encoding: str = DEFAULT_ENCODING) -> Dict[str, str]:
+    def get_apk_versions(cls, source: LogSource, encoding: str = DEFAULT_ENCODING, manifest: ParseManifest = None) -> Dict[str, str]:
+        """
+        获取bugreport中的APK版本信息, 按(路径, 大小, 修改时间)缓存,
+        同一进程内和使用增量解析清单的后续运行都不会重复扫描同一个文件
+        
+        参数:
+            source: bugreport对应的日志来源
+            encoding: 文件编码格式
+            manifest: 增量解析清单, 为None时只使用进程内缓存
+            
+        返回:
+            字典格式: {packageName: versionName}
+        """
+        key = (source.display_path, source.get_size(), source.get_mtime())
+        if key in cls._versions_cache:
+            return dict(cls._versions_cache[key])
+
+        rows = manifest.lookup(source, cls.CACHE_KEY) if manifest is not None else None
+        if rows is not None:
+            versions = dict(rows)
+        else:
+            with Perf.stage('apk_versions'):
+                versions = cls.read_apk_versions(source, encoding)
+            Perf.count('bugreport_bytes', source.get_size())
+            if manifest is not None:
+                manifest.store(source, cls.CACHE_KEY, list(versions.items()))
+        cls._versions_cache[key] = versions
+        return dict(versions)
+
+    @classmethod
+    def parse_apk_versions_from_latest_bugreport(cls, directory: str, encoding: str = DEFAULT_ENCODING, manifest: ParseManifest = None) -> Dict[str, str]:
         """
         处理目录中最后一个（最新的）bugreport文件
         
         参数:
             directory: 要处理的目录路径
             encoding: 文件编码格式，默认为utf-8
+            manifest: 增量解析清单, 用于跨运行缓存解析结果
             
         返回:
             字典格式: {packageName: versionName}
@@ -89,11 +198,9 @@ class VersionParser:
             return {}
         
         try:
-            with open(latest_file, 'r', encoding=encoding, errors='ignore') as f:
-                content = f.read()
-            return cls.extract_apk_versions(content)
+            return cls.get_apk_versions(latest_file, encoding, manifest)
         except Exception as e:
-            print(f"Error processing file {latest_file}: {e}")
+            print(f"Error processing file {latest_file.display_path}: {e}")
             return {}
 
 # 使用示例